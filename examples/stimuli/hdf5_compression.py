@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+=======================================
+Compare HDF5 compression of stimuli
+=======================================
+
+This benchmarks writing and reading a bank of stimuli with
+:func:`expyfun.io.write_hdf5` and :func:`expyfun.io.read_hdf5` using
+different compression settings, and reports the throughput and size of
+each.
+"""
+
+import os
+from os import path as op
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from expyfun.io import read_hdf5, write_hdf5
+from expyfun.stimuli import window_edges
+
+print(__doc__)
+
+# a bank of 50 one-second, two-channel low-pass noise stimuli
+fs = 24414
+rng = np.random.RandomState(0)
+stims = np.cumsum(rng.randn(50, 2, fs), axis=-1)
+stims -= stims.mean(axis=-1, keepdims=True)
+stims = window_edges(0.01 * stims / stims.std(), fs)
+data = dict(stims=stims, fs=fs)
+n_mb = stims.nbytes / 1e6
+n_repeats = 3
+
+settings = [('none (default)', dict()),
+            ('gzip 4', dict(compression=4)),
+            ('gzip 1', dict(compression=1)),
+            ('shuffle + gzip 1', dict(compression=1, shuffle=True)),
+            ('lzf', dict(compression='lzf')),
+            ('shuffle + lzf', dict(compression='lzf', shuffle=True)),
+            ('lzf, 1 MB chunks', dict(compression='lzf', chunks=2 ** 20))]
+for _, kwargs in settings[1:]:
+    kwargs['compress_arrays'] = True
+
+tempdir = tempfile.mkdtemp()
+try:
+    fname = op.join(tempdir, 'stims.hdf5')
+    print('{0:<20} {1:>12} {2:>12} {3:>8}'.format('setting', 'write MB/s',
+                                                  'read MB/s', 'size'))
+    for name, kwargs in settings:
+        times = list()
+        for _ in range(n_repeats):  # keep the fastest of a few runs
+            t0 = time.time()
+            write_hdf5(fname, data, overwrite=True, **kwargs)
+            t1 = time.time()
+            read_hdf5(fname)
+            times.append((t1 - t0, time.time() - t1))
+        write_time, read_time = np.min(times, axis=0)
+        size = os.path.getsize(fname) / 1e6 / n_mb
+        print('{0:<20} {1:>12.0f} {2:>12.0f} {3:>7.0f}%'
+              ''.format(name, n_mb / write_time, n_mb / read_time,
+                        100 * size))
+finally:
+    shutil.rmtree(tempdir)
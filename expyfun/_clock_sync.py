@@ -0,0 +1,177 @@
+"""Models of device clocks relative to the experiment master clock"""
+
+import numpy as np
+
+from ._utils import logger, _RingBuffer
+
+
+def _robust_linear_fit(x, y, n_iter=10, c=1.345):
+    """Fit y = a + b * x using iteratively reweighted least squares
+
+    Huber weights are used, with the residual scale estimated by the
+    median absolute deviation, so that occasional slow device queries
+    do not bias the fit.
+    """
+    design = np.array([np.ones(len(x)), x]).T
+    weights = np.ones(len(x))
+    for _ in range(n_iter):
+        sqrt_w = np.sqrt(weights)
+        coef = np.linalg.lstsq(design * sqrt_w[:, np.newaxis], y * sqrt_w,
+                               rcond=-1)[0]
+        resid = y - np.dot(design, coef)
+        scale = 1.4826 * np.median(np.abs(resid - np.median(resid)))
+        if scale == 0:
+            break
+        ratio = np.abs(resid) / (c * scale)
+        weights = np.where(ratio <= 1, 1., 1. / np.maximum(ratio, 1.))
+    return coef
+
+
+class _ClockModel(object):
+    """Offset and drift of a device clock relative to the master clock
+
+    Parameters
+    ----------
+    name : str
+        Name of the clock (used for logging).
+    max_residual : float
+        Residuals (in seconds) larger than this emit a warning.
+    n_max : int
+        Number of (device, master) samples to fit.
+    min_span : float
+        Minimum duration (in seconds) spanned by the samples before drift
+        is fitted. Before that, only the offset is estimated.
+
+    Notes
+    -----
+    Device times are mapped to master times as
+    ``master = device + offset + drift * (device - ref)``, where ``ref``
+    is the mean device time of the fitted samples. Samples can be added from
+    a different thread than the one converting times.
+    """
+    def __init__(self, name, max_residual=10e-6, n_max=1000, min_span=60.):
+        self.name = name
+        self.max_residual = float(max_residual)
+        self.min_span = float(min_span)
+        self._samples = _RingBuffer(n_max, 2)
+        self._params = (0., 0., 0.)  # offset, drift, ref
+
+    @property
+    def offset(self):
+        """Offset (in seconds) of the master clock at the reference time"""
+        return self._params[0]
+
+    @property
+    def drift(self):
+        """Drift of the master clock relative to the device clock"""
+        return self._params[1]
+
+    def __call__(self, device_times):
+        """Convert device times (in seconds) to master clock times"""
+        offset, drift, ref = self._params
+        device_times = np.asarray(device_times, float)
+        return device_times + offset + drift * (device_times - ref)
+
+    def add_sample(self, device, master):
+        """Add a simultaneous pair of clock readings and refit the model
+
+        Parameters
+        ----------
+        device : float
+            The device time (in seconds).
+        master : float
+            The master clock time.
+
+        Returns
+        -------
+        residual : float
+            Error of the previous model in predicting this sample
+            (zero for the first sample).
+        """
+        residual = master - self(device) if self._samples.n_total else 0.
+        self._samples.append((device, master))
+        data = self._samples.data
+        x, y = data[:, 0], data[:, 1] - data[:, 0]
+        ref = x.mean()
+        if x[-1] - x[0] >= self.min_span:
+            offset, drift = _robust_linear_fit(x - ref, y)
+        else:
+            offset, drift = np.median(y), 0.
+        self._params = (float(offset), float(drift), float(ref))
+        if np.abs(residual) > self.max_residual:
+            logger.warning('Expyfun: drift of > {} microseconds ({}) '
+                           'between {} clock and EC master clock.'
+                           ''.format(self.max_residual * 1e6,
+                                     int(round(residual * 1e6)), self.name))
+        logger.debug('Expyfun: {} clock model residual is {:0.1f} us '
+                     '(offset {}, drift {:0.3f} ppm)'
+                     ''.format(self.name, residual * 1e6, offset, drift * 1e6))
+        return residual
+
+
+class _ClockSync(object):
+    """Sample device timebases periodically to model them
+
+    Parameters
+    ----------
+    master_clock : callable
+        The master clock.
+    interval : float
+        Minimum interval (in seconds) between samples of each clock.
+
+    Notes
+    -----
+    Sampling is done by calling :meth:`sample`, which the
+    ExperimentController does while idly waiting, because some devices
+    (e.g., the TDT ActiveX interface) cannot be queried from other threads.
+    Clocks without a timebase function must have samples added to their
+    model by their owner.
+    """
+    def __init__(self, master_clock, interval=1.):
+        self.master_clock = master_clock
+        self.interval = float(interval)
+        self._models = dict()
+        self._timebases = dict()
+        self._last_sample = dict()
+
+    def add_clock(self, name, timebase=None, max_residual=10e-6):
+        """Add (or replace) a clock
+
+        Parameters
+        ----------
+        name : str
+            The clock name.
+        timebase : callable | None
+            Function returning the current device time (in seconds). If
+            None, the clock is not sampled automatically.
+        max_residual : float
+            Residuals (in seconds) larger than this emit a warning.
+
+        Returns
+        -------
+        model : instance of _ClockModel
+            The model of the clock.
+        """
+        self._models[name] = _ClockModel(name, max_residual)
+        self._timebases.pop(name, None)
+        if timebase is not None:
+            self._timebases[name] = timebase
+            self._sample(name)
+        return self._models[name]
+
+    def __getitem__(self, name):
+        return self._models[name]
+
+    def _sample(self, name):
+        t0 = self.master_clock()
+        device = self._timebases[name]()
+        t1 = self.master_clock()
+        self._last_sample[name] = t1
+        self._models[name].add_sample(device, (t0 + t1) / 2.)
+
+    def sample(self):
+        """Sample each clock whose sampling interval has elapsed"""
+        now = self.master_clock()
+        for name in self._timebases:
+            if now - self._last_sample[name] >= self.interval:
+                self._sample(name)
@@ -0,0 +1,210 @@
+"""Background writing of data lines"""
+
+# License: BSD (3-clause)
+
+import os
+import os.path as op
+import threading
+from collections import deque
+
+import numpy as np
+
+from ._utils import logger, _sanitize, string_types, text_type
+from .io._parse import _read_records, _record_dtype, _DEFINE, _COMMENT
+
+# values that cannot change before the writer thread formats them
+_immutable_types = (string_types, text_type, bytes, int, float, bool,
+                    type(None), np.generic)
+
+
+class _RecordWriter(object):
+    """Append data lines to a compact binary record file
+
+    Parameters
+    ----------
+    fname : str
+        The record file to append to. Values are appended to the file with
+        the same name and the extension ``.val``.
+
+    Notes
+    -----
+    Each line is stored as a fixed-size record holding the timestamp
+    (float64), an event type code (uint16), and the byte offset and length
+    of its value (UTF-8, sanitized as in the ``.tab`` file) in the value
+    file. Event type names are defined by ``_DEFINE`` records, numbered in
+    the order they appear, so the whole record file can be loaded at once
+    with ``np.fromfile``.
+    """
+    def __init__(self, fname):
+        self.name = fname
+        self.val_name = op.splitext(fname)[0] + '.val'
+        self._codes = dict()
+        self._offset = 0
+        if op.isfile(fname):  # continue the existing codes and values
+            names = _read_records(fname)[1]
+            self._codes = dict((name, ii) for ii, name in enumerate(names))
+            self._offset = op.getsize(self.val_name)
+        self._rec = open(fname, 'ab')
+        self._val = open(self.val_name, 'ab')
+
+    def write(self, lines):
+        """Write a list of tuples (timestamp, event_type, value)"""
+        records = list()
+        values = list()
+        for time, code, value in self._iter_records(lines):
+            value = _sanitize(value).encode('utf-8')
+            records.append((time, code, self._offset, len(value)))
+            values.append(value)
+            self._offset += len(value)
+        np.array(records, _record_dtype).tofile(self._rec)
+        self._val.write(b''.join(values))
+
+    def _iter_records(self, lines):
+        for line in lines:
+            if not isinstance(line, tuple):
+                yield np.nan, _COMMENT, line.rstrip('\n')
+                continue
+            time, event_type, value = line
+            if isinstance(time, string_types):  # the column names
+                continue
+            event_type = _sanitize(event_type)
+            if event_type not in self._codes:
+                if len(self._codes) >= _COMMENT:
+                    raise RuntimeError('Too many event types')
+                self._codes[event_type] = len(self._codes)
+                yield np.nan, _DEFINE, event_type
+            yield float(time), self._codes[event_type], value
+
+    def flush(self, fsync):
+        for fid in (self._val, self._rec):  # values before their records
+            fid.flush()
+            if fsync:
+                os.fsync(fid.fileno())
+
+    def close(self):
+        self._val.close()
+        self._rec.close()
+
+
+class _DataWriter(object):
+    """Write data lines to a file from a background thread
+
+    Parameters
+    ----------
+    fname : str
+        The file to append to.
+    flush_interval : float
+        Maximum time (in seconds) between flushes of the file.
+    max_pending : int
+        Maximum number of lines waiting to be written. If more are
+        written, the writer has fallen behind and an error is raised.
+    fsync : bool
+        If True, each flush also forces the data to disk with ``os.fsync``
+        so that it survives crashes of the computer.
+    binary : bool
+        If True, also write the lines to a binary record file with the
+        same name and the extension ``.rec`` (see :class:`_RecordWriter`).
+
+    Notes
+    -----
+    Lines are queued by :meth:`write`, and formatted, written, and flushed
+    by the writer thread, so that the calling thread never waits on disk
+    I/O. Errors in the writer thread are raised by the next call to
+    :meth:`write` or :meth:`flush`.
+    """
+    def __init__(self, fname, flush_interval=1., max_pending=100000,
+                 fsync=True, binary=False):
+        self.name = fname
+        self.flush_interval = float(flush_interval)
+        self.max_pending = int(max_pending)
+        self.fsync = bool(fsync)
+        self._fid = open(fname, 'a')
+        self._records = None
+        if binary:
+            self._records = _RecordWriter(op.splitext(fname)[0] + '.rec')
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._closing = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        name='expyfun data writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def closed(self):
+        return self._closing
+
+    def write(self, line):
+        """Queue a line
+
+        Parameters
+        ----------
+        line : str | tuple
+            A preformatted line, or a tuple of values to be sanitized and
+            joined by tabs.
+        """
+        self._check()
+        if len(self._pending) >= self.max_pending:
+            raise RuntimeError('Expyfun: data writer fell behind ({0} lines '
+                               'pending), cannot keep writing data to {1}'
+                               ''.format(len(self._pending), self.name))
+        if isinstance(line, tuple):  # snapshot values that could change
+            line = tuple(val if isinstance(val, _immutable_types) else
+                         text_type(val) for val in line)
+        self._pending.append(line)
+        if len(self._pending) == self.max_pending // 2:
+            self._wake.set()  # do not wait for a flush to catch up
+
+    def flush(self):
+        """Request that queued lines be written and flushed (non-blocking)
+        """
+        self._check()
+        self._wake.set()
+
+    def close(self):
+        """Write all queued lines and close the file"""
+        if self._closing:
+            return
+        self._closing = True
+        self._wake.set()
+        self._thread.join()
+        self._check()
+
+    def _check(self):
+        if self._error is not None:
+            raise RuntimeError('Expyfun: writing data to {0} failed: {1}'
+                               ''.format(self.name, self._error))
+
+    def _run(self):
+        try:
+            while True:
+                # woken up by flush requests, closing, or the timer
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                if self._write_pending():
+                    self._fid.flush()
+                    if self.fsync:
+                        os.fsync(self._fid.fileno())
+                    if self._records is not None:
+                        self._records.flush(self.fsync)
+                if self._closing and not self._pending:
+                    break
+        except Exception as exp:
+            logger.error('Expyfun: data writer failed: {0}'.format(exp))
+            self._error = exp
+        finally:
+            self._fid.close()
+            if self._records is not None:
+                self._records.close()
+
+    def _write_pending(self):
+        raw = list()
+        while self._pending:
+            raw.append(self._pending.popleft())
+        self._fid.write(''.join(
+            '\t'.join(_sanitize(val) for val in line) + '\n'
+            if isinstance(line, tuple) else line for line in raw))
+        if self._records is not None and raw:
+            self._records.write(raw)
+        return len(raw)
@@ -18,15 +18,19 @@ except Exception:  # maybe we don't have a display (e.g., in terminal)
     pyglet = gl = None
 
 from ._utils import (get_config, verbose_dec, _check_pyglet_version, wait_secs,
-                     running_rms, _sanitize, logger, ZeroClock, date_str,
+                     running_rms, logger, ZeroClock, date_str,
                      check_units, set_log_file, flush_logger,
-                     string_types, _fix_audio_dims, input)
+                     string_types, _fix_audio_dims, input, _Scheduler,
+                     _pump_events, _FrameMonitor)
 from ._tdt_controller import TDTController
-from ._trigger_controllers import ParallelTrigger
+from ._trigger_controllers import ParallelTrigger, TriggerTimer
+from ._flip_strategies import _flip_strategies
+from ._data_writer import _DataWriter
+from ._clock_sync import _ClockSync
 from ._sound_controllers import PygletSoundController, SoundPlayer
 from ._input_controllers import Keyboard, CedrusBox, Mouse
 from .stimuli._filter import resample
-from .visual import Text, Rectangle, Video, _convert_color
+from .visual import Rectangle, Video, _convert_color, _TextCache
 from ._git import assert_version
 
 
@@ -144,6 +148,7 @@ class ExperimentController(object):
         self._id_call_dict = dict(ec_id=self._stamp_ec_id)
         self._ac = None
         self._data_file = None
+        self._n_trajectories = 0  # number of mouse trajectories saved
         self._playing = False  # whether or not play() was called w/o a 'stop'
         self._clock = ZeroClock()
         self._master_clock = self._clock.get_time
@@ -171,9 +176,8 @@ class ExperimentController(object):
                 assert_version(version)
             # set up timing
             # Use ZeroClock, which uses the "clock" fn but starts at zero
-            self._time_corrections = dict()
-            self._time_correction_fxns = dict()
-            self._time_correction_maxs = dict()  # optional, defaults to 10e-6
+            # and model device clocks relative to it
+            self._clock_sync = _ClockSync(self._master_clock)
 
             # dictionary for experiment metadata
             self._exp_info = {'participant': participant, 'session': session,
@@ -205,11 +209,17 @@ class ExperimentController(object):
                                              self._exp_info['date']))
                 self._output_dir = basename
                 self._log_file = self._output_dir + '.log'
-                set_log_file(self._log_file)
+                log_kwargs = dict(threaded=True)
+                if get_config('LOG_JSON', 'false').lower() == 'true':
+                    log_kwargs['output_format'] = 'json'
+                set_log_file(self._log_file, **log_kwargs)
                 closer = partial(set_log_file, None)
                 self._extra_cleanup_fun.append(closer)
                 # initialize data file
-                self._data_file = open(self._output_dir + '.tab', 'a')
+                fsync = get_config('DATA_FSYNC', 'true').lower() == 'true'
+                binary = get_config('DATA_BINARY', 'false').lower() == 'true'
+                self._data_file = _DataWriter(self._output_dir + '.tab',
+                                              fsync=fsync, binary=binary)
                 self._extra_cleanup_fun.append(self._data_file.close)
                 self._data_file.write('# ' + str(self._exp_info) + '\n')
                 self.write_data_line('event', 'value', 'timestamp')
@@ -325,6 +335,19 @@ class ExperimentController(object):
 
             # open window and setup GL config
             self._setup_window(window_size, exp_name, full_screen, screen_num)
+            # calibrate the sleep/spin waiting used by wait_until and flip
+            self._scheduler = _Scheduler(self._master_clock)
+            # laid out screen_text / screen_prompt texts
+            self._text_cache = _TextCache(self)
+            # flip times and dropped frames
+            try:
+                rate = self._win.screen.get_mode().rate
+            except Exception:
+                rate = None
+            interval = 1. / rate if rate else None
+            self._frame_monitor = _FrameMonitor(interval)
+            self.set_flip_strategy(get_config('FLIP_STRATEGY',
+                                              'conservative'))
 
             # Keyboard
             if response_device == 'keyboard':
@@ -347,10 +370,12 @@ class ExperimentController(object):
                 trigger_controller = dict(type=trigger_controller)
             logger.info('Expyfun: Initializing {} triggering mode'
                         ''.format(trigger_controller['type']))
+            self._trigger_timer = TriggerTimer(self._master_clock)
             if trigger_controller['type'] == 'tdt':
                 if not isinstance(self._ac, TDTController):
                     raise ValueError('trigger_controller can only be "tdt" if '
                                      'tdt is used for audio')
+                self._ac.timer = self._trigger_timer
                 self._stamp_ttl_triggers = self._ac.stamp_triggers
             elif trigger_controller['type'] in ['parallel', 'dummy']:
                 if 'address' not in trigger_controller['type']:
@@ -358,6 +383,7 @@ class ExperimentController(object):
                     trigger_controller['address'] = addr
                 out = ParallelTrigger(trigger_controller['type'],
                                       trigger_controller.get('address'))
+                out.timer = self._trigger_timer
                 self._stamp_ttl_triggers = out.stamp_triggers
                 self._extra_cleanup_fun.append(out.close)
             else:
@@ -375,12 +401,11 @@ class ExperimentController(object):
 
             # finish initialization
             logger.info('Expyfun: Initialization complete')
-            logger.exp('Expyfun: Subject: {0}'
-                       ''.format(self._exp_info['participant']))
-            logger.exp('Expyfun: Session: {0}'
-                       ''.format(self._exp_info['session']))
+            logger.exp('Expyfun: Subject: %s', self._exp_info['participant'])
+            logger.exp('Expyfun: Session: %s', self._exp_info['session'])
             ok_log = partial(self.write_data_line, 'trial_ok', None)
             self._on_trial_ok.append(ok_log)
+            self._on_trial_ok.append(self._frame_monitor.next_trial)
             self._on_trial_ok.append(self.flush)
             self._trial_progress = 'stopped'
             self._ofp_critical_funs = list()
@@ -437,10 +462,17 @@ class ExperimentController(object):
         See Also
         --------
         ExperimentController.screen_prompt
+
+        Notes
+        -----
+        Laid out text is cached (keyed by the text and its font, size,
+        color, wrapping, and markup settings), so repeated calls only move
+        or recolor the cached object. The returned object can thus be
+        returned again by later calls with the same text.
         """
         check_units(units)
-        scr_txt = Text(self, text, pos, color, font_name, font_size,
-                       wrap=wrap, units=units, attr=attr)
+        scr_txt = self._text_cache.get(text, pos, color, font_name, font_size,
+                                       wrap=wrap, units=units, attr=attr)
         scr_txt.draw()
         self.call_on_next_flip(partial(self.write_data_line, 'screen_text',
                                        text))
@@ -582,7 +614,7 @@ class ExperimentController(object):
                                    'the trial')
             self._trial_progress = 'started'
         extra = 'flipping screen and ' if flip else ''
-        logger.exp('Expyfun: Starting stimuli: {0}playing audio'.format(extra))
+        logger.exp('Expyfun: Starting stimuli: %splaying audio', extra)
         # ensure self._play comes first in list, followed by other critical
         # private functions (e.g., EL stamping), then user functions:
         if flip:
@@ -835,29 +867,26 @@ class ExperimentController(object):
         ExperimentController.start_stimulus
         ExperimentController.stop
         ExperimentController.trial_ok
+        ExperimentController.get_frame_timing
+        ExperimentController.set_flip_strategy
 
         Notes
         -----
         Order of operations is: screen flip, functions added with
         `call_on_next_flip`, followed by functions added with
-        `call_on_every_flip`.
+        `call_on_every_flip`. How the flip is done and timestamped is set
+        by `set_flip_strategy`.
         """
         if when is not None:
             self.wait_until(when)
+        request_time = self._master_clock()
         call_list = self._on_next_flip + self._on_every_flip
         self._win.dispatch_events()
-        self._win.switch_to()
-        gl.glFinish()
-        self._win.flip()
-        # this waits until everything is called, including last draw
-        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
-        gl.glBegin(gl.GL_POINTS)
-        if not self._enable_video:
-            gl.glColor4f(0, 0, 0, 0)
-        gl.glVertex2i(10, 10)
-        gl.glEnd()
-        gl.glFinish()
-        flip_time = self.get_time()
+        flip_time = self._flip_strategy.flip()
+        n_dropped = self._frame_monitor.add(request_time, flip_time)
+        if n_dropped:
+            logger.debug('Expyfun: %s frame(s) dropped before flip at %s',
+                         n_dropped, flip_time)
         for function in call_list:
             function()
         self.write_data_line('flip', flip_time)
@@ -880,10 +909,114 @@ class ExperimentController(object):
         -------
         screen_fs : float
             The screen refresh rate.
+
+        Notes
+        -----
+        The estimate is also used as the refresh interval for dropped
+        frame detection (see `get_frame_timing`).
         """
         n_rep = int(n_rep)
         times = [self.flip() for _ in range(n_rep)]
-        return 1. / np.median(np.diff(times[1:]))
+        interval = np.median(np.diff(times[1:]))
+        self._frame_monitor.interval = float(interval)
+        return 1. / interval
+
+    def get_frame_timing(self, per_trial=False, write=False):
+        """Get flip timing and dropped frame statistics
+
+        Parameters
+        ----------
+        per_trial : bool
+            If True, also return the number of flips and dropped frames
+            for each trial (trials are delimited by `trial_ok` calls).
+        write : bool
+            If True, also write the summary to the data file as a
+            ``frame_timing`` line. This is typically done once at the
+            end of a session.
+
+        Returns
+        -------
+        summary : dict
+            The number of flips, the refresh interval, the total number of
+            dropped frames, the times of flips that followed dropped
+            frames, and the mean, standard deviation, and maximum of the
+            interval between consecutive flips during animation (i.e.,
+            flips requested less than two refresh intervals apart), all in
+            seconds. With ``per_trial=True``, ``trials`` holds a list of
+            per-trial dicts. The ``flip_strategy`` in use is also given,
+            along with the mean, standard deviation, and maximum of its
+            overhead: the duration of the flip calls (``flip_duration_*``)
+            and the time between the flip timestamps and the calls
+            returning (``flip_lag_*``).
+
+        See Also
+        --------
+        ExperimentController.estimate_screen_fs
+        ExperimentController.flip
+        ExperimentController.set_flip_strategy
+
+        Notes
+        -----
+        The refresh interval is taken from the screen mode when available,
+        otherwise it is estimated from back-to-back flips (or set by
+        `estimate_screen_fs`). A flip is expected one refresh interval
+        after the previous flip if it was requested before then, and
+        otherwise one interval after it was requested. Each whole refresh
+        interval that a flip lands after its expected time (with half an
+        interval of tolerance) counts as a dropped frame. The most recent
+        100000 flips are kept.
+        """
+        summary = self._frame_monitor.summary(per_trial)
+        summary.update(self._flip_strategy.summary())
+        if write:
+            self.write_data_line('frame_timing', summary)
+        return summary
+
+    def set_flip_strategy(self, strategy='conservative'):
+        """Set how screen flips are done and timestamped
+
+        Parameters
+        ----------
+        strategy : str
+            Can be:
+
+                - ``'conservative'``: finish all drawing, swap buffers,
+                  then draw a single point and finish again, so that the
+                  timestamp is taken once the swap has certainly completed.
+                  This is the default and the most widely supported.
+                - ``'fence'``: swap buffers, then wait on an OpenGL fence
+                  sync object issued after the swap. This avoids the extra
+                  draw and finish calls, but requires OpenGL 3.2 or the
+                  ``GL_ARB_sync`` extension.
+                - ``'vsync'``: swap buffers and use the timestamp of the
+                  vertical retrace the swap occurred at as reported by the
+                  driver (``GLX_OML_sync_control`` on Linux), converted to
+                  the master clock. Where this is unavailable, the time a
+                  single ``glFinish`` after the swap returns is used.
+
+            The default can be set with the ``FLIP_STRATEGY`` config
+            variable.
+
+        See Also
+        --------
+        ExperimentController.flip
+        ExperimentController.get_frame_timing
+
+        Notes
+        -----
+        The lighter strategies are useful for animations that need to
+        draw every frame. Their overhead and the dropped frames can be
+        checked with `get_frame_timing` (the overhead statistics restart
+        when the strategy is changed). Whether a lighter strategy
+        timestamps flips as accurately as the conservative one depends on
+        the graphics driver, so it should be verified (e.g., with a
+        photodiode) for the system used.
+        """
+        if strategy not in _flip_strategies:
+            raise ValueError('strategy must be one of {0}, not {1}'
+                             ''.format(sorted(_flip_strategies), strategy))
+        self._flip_strategy = _flip_strategies[strategy](self)
+        logger.info('Expyfun: Using flip strategy "{0}"'.format(strategy))
 
     def set_visible(self, visible=True, flip=True):
         """Set the window visibility
@@ -901,7 +1034,7 @@ class ExperimentController(object):
             had been set to.
         """
         self._win.set_visible(visible)
-        logger.exp('Expyfun: Set screen visibility {0}'.format(visible))
+        logger.exp('Expyfun: Set screen visibility %s', visible)
         if visible and flip:
             self.flip()
 
@@ -1111,6 +1244,7 @@ class ExperimentController(object):
         See Also
         --------
         ExperimentController.get_clicks
+        ExperimentController.get_mouse_trajectory
         ExperimentController.listen_clicks
         ExperimentController.toggle_cursor
         ExperimentController.wait_one_click
@@ -1121,6 +1255,81 @@ class ExperimentController(object):
         pos = self._convert_units(pos[:, np.newaxis], 'norm', units)[:, 0]
         return pos
 
+    def start_mouse_capture(self):
+        """Start recording every mouse movement
+
+        Any previously recorded trajectory is discarded.
+
+        See Also
+        --------
+        ExperimentController.get_mouse_trajectory
+        ExperimentController.stop_mouse_capture
+        """
+        self._mouse_handler.start_capture()
+
+    def stop_mouse_capture(self):
+        """Stop recording mouse movements
+
+        See Also
+        --------
+        ExperimentController.get_mouse_trajectory
+        ExperimentController.start_mouse_capture
+        """
+        self._mouse_handler.stop_capture()
+
+    def get_mouse_trajectory(self, units='pix', relative_to=None,
+                             save=False):
+        """Get the mouse movements recorded since `start_mouse_capture`
+
+        Parameters
+        ----------
+        units : str
+            Units to return the positions in. See `check_units` for options.
+        relative_to : None | float
+            A time relative to which timestamping is done. If ``None``,
+            times are relative to when `start_mouse_capture` was called.
+        save : bool
+            If True, also save the trajectory (in pixels, with master clock
+            times) to a ``.npz`` file next to the ``.tab`` data file, and
+            write a ``mouse_trajectory`` line with its name to the data file.
+            Nothing is saved if there is no data file.
+
+        Returns
+        -------
+        times : ndarray, shape (n_samples,)
+            The time of each movement.
+        positions : ndarray, shape (n_samples, 2)
+            The mouse position after each movement.
+
+        See Also
+        --------
+        ExperimentController.get_mouse_position
+        ExperimentController.start_mouse_capture
+        ExperimentController.stop_mouse_capture
+
+        Notes
+        -----
+        Movements are recorded as they are received by the window, which
+        happens whenever events are processed (e.g., during `flip` and
+        the ``wait_*`` methods), so the recording rate is limited by how
+        often the experiment processes events as well as by the mouse.
+        Recording can continue while the trajectory is retrieved.
+        """
+        check_units(units)
+        if self._mouse_handler.capture_start is None:
+            raise RuntimeError('start_mouse_capture must be called first')
+        times, pos = self._mouse_handler.get_trajectory()
+        if save and self._output_dir is not None:
+            fname = '{0}_mouse_{1}.npz'.format(self._output_dir,
+                                               self._n_trajectories)
+            np.savez(fname, times=times, positions=pos)
+            self._n_trajectories += 1
+            self.write_data_line('mouse_trajectory', op.basename(fname))
+        if relative_to is None:
+            relative_to = self._mouse_handler.capture_start
+        pos = self._convert_units(pos.T, 'pix', units).T
+        return times - relative_to, pos
+
     def toggle_cursor(self, visibility, flip=False):
         """Show or hide the mouse
 
@@ -1363,8 +1572,7 @@ class ExperimentController(object):
         ExperimentController.stop
         """
         samples = self._validate_audio(samples) * self._stim_scaler
-        logger.exp('Expyfun: Loading {} samples to buffer'
-                   ''.format(samples.size))
+        logger.exp('Expyfun: Loading %s samples to buffer', samples.size)
         self._ac.load_buffer(samples)
 
     def play(self):
@@ -1567,35 +1775,15 @@ class ExperimentController(object):
 
         Notes
         -----
-        Writing a data line does not cause the file to be flushed.
+        Writing a data line does not cause the file to be flushed. Lines
+        are queued and written to the file by a background thread, so
+        this never waits for the disk. If lines are written faster than
+        they can be saved, or saving fails, an error is raised.
         """
         if timestamp is None:
             timestamp = self._master_clock()
-        ll = '\t'.join(_sanitize(x) for x in [timestamp, event_type,
-                                              value]) + '\n'
         if self._data_file is not None and not self._data_file.closed:
-            self._data_file.write(ll)
-
-    def _get_time_correction(self, clock_type):
-        """Clock correction (sec) for different devices (screen, bbox, etc.)
-        """
-        time_correction = (self._master_clock() -
-                           self._time_correction_fxns[clock_type]())
-        if clock_type not in self._time_corrections:
-            self._time_corrections[clock_type] = time_correction
-
-        diff = time_correction - self._time_corrections[clock_type]
-        max_dt = self._time_correction_maxs.get(clock_type, 10e-6)
-        if np.abs(diff) > max_dt:
-            logger.warning('Expyfun: drift of > {} microseconds ({}) '
-                           'between {} clock and EC master clock.'
-                           ''.format(max_dt * 1e6, int(round(diff * 1e6)),
-                                     clock_type))
-        logger.debug('Expyfun: time correction between {} clock and EC '
-                     'master clock is {}. This is a change of {}.'
-                     ''.format(clock_type, time_correction, time_correction -
-                               self._time_corrections[clock_type]))
-        return time_correction
+            self._data_file.write((timestamp, event_type, value))
 
     def wait_secs(self, secs):
         """Wait a specified number of seconds.
@@ -1645,9 +1833,34 @@ class ExperimentController(object):
                            '({}) that had already passed {} seconds prior.'
                            ''.format(timestamp, -time_left))
         else:
-            wait_secs(time_left, self)
+            self._scheduler.wait_until(timestamp, partial(_pump_events, self),
+                                       self._clock_sync.sample)
         return time_left
 
+    def get_wait_timing(self):
+        """Get statistics of how precisely waits met their deadlines
+
+        Returns
+        -------
+        summary : dict
+            The number of waits, the spin window and measured sleep
+            overshoot, and the mean, standard deviation, and maximum of the
+            wake-up error (achieved minus requested time), all in seconds.
+
+        See Also
+        --------
+        ExperimentController.wait_secs
+        ExperimentController.wait_until
+
+        Notes
+        -----
+        This covers `wait_secs`, `wait_until`, and the waits done by
+        `flip` and `start_stimulus` when ``when`` is used. Waits sleep
+        coarsely and then busy-wait during a final window that is
+        calibrated when the ExperimentController is created.
+        """
+        return self._scheduler.summary()
+
     def identify_trial(self, **ids):
         """Identify trial type before beginning the trial
 
@@ -1677,8 +1890,8 @@ class ExperimentController(object):
                            'keys required {1}'.format(passed_set, call_set))
         ll = max([len(key) for key in ids.keys()])
         for key, id_ in ids.items():
-            logger.exp('Expyfun: Stamp trial ID to {0} : {1}'
-                       ''.format(key.ljust(ll), str(id_)))
+            logger.exp('Expyfun: Stamp trial ID to %s : %s', key.ljust(ll),
+                       id_)
             if isinstance(id_, dict):
                 self._id_call_dict[key](**id_)
             else:
@@ -1749,6 +1962,7 @@ class ExperimentController(object):
 
         See Also
         --------
+        ExperimentController.get_trigger_timing
         ExperimentController.identify_trial
         """
         if check not in ('int4', 'binary'):
@@ -1763,8 +1977,51 @@ class ExperimentController(object):
                                  '1, 2, 4, or 8: {0}'.format(ids))
         self._stamp_ttl_triggers(ids, wait_for_last=wait_for_last)
 
+    def get_trigger_timing(self, write=False):
+        """Get latency and jitter statistics of the stamped triggers
+
+        Parameters
+        ----------
+        write : bool
+            If True, also write the summary to the data file as a
+            ``trigger_timing`` line. This is typically done once at the
+            end of a session.
+
+        Returns
+        -------
+        summary : dict
+            The number of triggers stamped along with the mean, standard
+            deviation (jitter), and maximum of the latency (time between
+            the requested and actual stamping of each trigger) and of the
+            duration of each stamping call, all in seconds.
+
+        See Also
+        --------
+        ExperimentController.stamp_triggers
+
+        Notes
+        -----
+        Every trigger stamped (including those from `identify_trial` and
+        `start_stimulus`) is timestamped using the master clock. The most
+        recent 10000 triggers are used to compute the statistics.
+        """
+        summary = self._trigger_timer.summary()
+        if write:
+            self.write_data_line('trigger_timing', summary)
+        return summary
+
     def flush(self):
         """Flush logs and data files
+
+        Notes
+        -----
+        This waits until all queued log messages have been written to the
+        log file. The data file is flushed by a background thread (and by
+        default also forced to disk with ``fsync``, which can be disabled
+        by setting the ``DATA_FSYNC`` config variable to ``'false'``), so
+        this returns without waiting for it. The data file is also
+        flushed at least once per second, and completely written when the
+        ExperimentController is closed.
         """
         flush_logger()
         if self._data_file is not None and not self._data_file.closed:
@@ -41,14 +41,72 @@ def _create_titled_group(root, key, title):
 
 def _create_titled_dataset(root, key, title, data, comp_kw=None):
     """Helper to create a titled dataset in h5py"""
-    comp_kw = {} if comp_kw is None else comp_kw
+    comp_kw = {} if comp_kw is None else _dataset_kw(data, comp_kw)
     out = root.create_dataset(key, data=data, **comp_kw)
     out.attrs['TITLE'] = title
     return out
 
 
+def _chunk_shape(shape, itemsize, chunk_bytes):
+    """Helper to get a chunk shape of about chunk_bytes
+
+    Chunks span whole trailing axes when possible, so that reading along
+    the first axis (e.g., one row) touches as few chunks as possible.
+    """
+    chunks = list(shape)
+    for axis in range(len(shape)):
+        row_bytes = itemsize * int(np.prod(chunks[axis + 1:]))
+        if row_bytes * chunks[axis] <= chunk_bytes:
+            break
+        chunks[axis] = max(1, chunk_bytes // row_bytes)
+        if row_bytes <= chunk_bytes:
+            break
+    return tuple(max(chunk, 1) for chunk in chunks)
+
+
+def _dataset_kw(data, comp_kw):
+    """Helper to get the compression arguments for a given dataset"""
+    data = np.asarray(data)
+    if not comp_kw or data.ndim == 0 or data.size == 0 or \
+            data.nbytes < comp_kw['min_size']:
+        return dict()
+    kw = dict((key, comp_kw[key]) for key in ('compression',
+                                              'compression_opts', 'shuffle')
+              if key in comp_kw)
+    kw['chunks'] = comp_kw['chunks']
+    if kw['chunks'] is not True:
+        kw['chunks'] = _chunk_shape(data.shape, data.dtype.itemsize,
+                                    kw['chunks'])
+    return kw
+
+
+def _get_comp_kw(compression, shuffle, chunks, min_compress_size,
+                 compress_arrays):
+    """Helper to check the compression options"""
+    if chunks is not True and (isinstance(chunks, bool) or
+                               int(chunks) < 1):
+        raise ValueError('chunks must be True or a positive int, got %s'
+                         % (chunks,))
+    if isinstance(compression, string_types):
+        if compression != 'lzf':
+            raise ValueError('compression must be an int or "lzf", got "%s"'
+                             % compression)
+        comp_kw = dict(compression='lzf')
+    elif compression > 0:
+        comp_kw = dict(compression='gzip', compression_opts=compression)
+    else:
+        return dict()
+    if shuffle:
+        comp_kw['shuffle'] = True
+    comp_kw['chunks'] = chunks if chunks is True else int(chunks)
+    comp_kw['min_size'] = int(min_compress_size)
+    comp_kw['arrays'] = bool(compress_arrays)
+    return comp_kw
+
+
 def write_hdf5(fname, data, overwrite=False, compression=4,
-               title='h5io'):
+               title='h5io', shuffle=False, chunks=True,
+               min_compress_size=0, compress_arrays=False):
     """Write python object to HDF5 format using h5py
 
     Parameters
@@ -61,11 +119,25 @@ def write_hdf5(fname, data, overwrite=False, compression=4,
         Note that dict objects must only have ``str`` keys.
     overwrite : bool
         If True, overwrite file (if it exists).
-    compression : int
-        Compression level to use (0-9) to compress data using gzip.
+    compression : int | str
+        Compression level to use (0-9) to compress data using gzip, or
+        ``'lzf'`` to use the faster (but h5py-only) LZF filter. Arrays are
+        only compressed if ``compress_arrays=True``.
     title : str
         The top-level directory name to use. Typically it is useful to make
         this your package name, e.g. ``'mnepython'``.
+    shuffle : bool
+        If True, apply the shuffle filter before compressing, which groups
+        the bytes of numbers and often improves compression of floats.
+    chunks : True | int
+        The chunking of compressed datasets. True lets h5py guess the chunk
+        shape, and an int gives the target chunk size in bytes (chunks then
+        span whole trailing axes when possible).
+    min_compress_size : int
+        Datasets smaller than this (in bytes) are stored uncompressed.
+    compress_arrays : bool
+        If True, also compress ndarrays (which are otherwise stored
+        uncompressed, as this is much faster for data that barely compress).
     """
     h5py = _check_h5py()
     if op.isfile(fname) and not overwrite:
@@ -73,9 +145,8 @@ def write_hdf5(fname, data, overwrite=False, compression=4,
                       % fname)
     if not isinstance(title, string_types):
         raise ValueError('title must be a string')
-    comp_kw = dict()
-    if compression > 0:
-        comp_kw = dict(compression='gzip', compression_opts=compression)
+    comp_kw = _get_comp_kw(compression, shuffle, chunks, min_compress_size,
+                           compress_arrays)
     with h5py.File(fname, mode='w') as fid:
         _triage_write(title, data, fid, comp_kw, str(type(data)))
 
@@ -111,7 +182,8 @@ def _triage_write(key, value, root, comp_kw, where):
             title = 'ascii'
         _create_titled_dataset(root, key, title, value, comp_kw)
     elif isinstance(value, np.ndarray):
-        _create_titled_dataset(root, key, 'ndarray', value)
+        _create_titled_dataset(root, key, 'ndarray', value,
+                               comp_kw if comp_kw.get('arrays') else None)
     elif sparse is not None and isinstance(value, sparse.csc_matrix):
         sub_root = _create_titled_group(root, key, 'csc_matrix')
         _triage_write('data', value.data, sub_root, comp_kw,
@@ -0,0 +1,172 @@
+"""Ways of flipping the screen and timestamping the flip"""
+
+# License: BSD (3-clause)
+
+import ctypes
+import sys
+
+from ._utils import logger, _RingBuffer, _stats
+
+try:
+    from time import monotonic as _monotonic
+except ImportError:  # Python 2
+    _monotonic = None
+
+
+class _FlipStrategy(object):
+    """Flip the screen and record the overhead of doing so
+
+    Subclasses implement ``_flip``, which swaps the buffers, clears the
+    back buffer, and returns the flip timestamp.
+    """
+    name = None
+
+    def __init__(self, ec, n_max=10000):
+        self._win = ec._win
+        self._clock = ec._master_clock
+        # duration of the flip call, lag between timestamp and return
+        self._timing = _RingBuffer(n_max, 2)
+
+    def flip(self):
+        """Flip the screen
+
+        Returns
+        -------
+        flip_time : float
+            The timestamp of the screen flip.
+        """
+        from pyglet import gl
+        t0 = self._clock()
+        self._win.switch_to()
+        flip_time = self._flip(gl)
+        t1 = self._clock()
+        self._timing.append((t1 - t0, t1 - flip_time))
+        return flip_time
+
+    def summary(self):
+        """Summarize the flip overhead"""
+        data = self._timing.data
+        out = dict(flip_strategy=self.name)
+        out.update(_stats(data[:, 0], 'flip_duration'))
+        out.update(_stats(data[:, 1], 'flip_lag'))
+        return out
+
+
+class _ConservativeFlip(_FlipStrategy):
+    """Finish, flip, then draw a point and finish again"""
+    name = 'conservative'
+
+    def __init__(self, ec, n_max=10000):
+        super(_ConservativeFlip, self).__init__(ec, n_max)
+        self._enable_video = ec._enable_video
+
+    def _flip(self, gl):
+        gl.glFinish()
+        self._win.flip()
+        # this waits until everything is called, including last draw
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        gl.glBegin(gl.GL_POINTS)
+        if not self._enable_video:
+            gl.glColor4f(0, 0, 0, 0)
+        gl.glVertex2i(10, 10)
+        gl.glEnd()
+        gl.glFinish()
+        return self._clock()
+
+
+class _FenceFlip(_FlipStrategy):
+    """Flip, then wait on a fence sync object placed after the swap"""
+    name = 'fence'
+
+    def __init__(self, ec, n_max=10000, timeout=0.1):
+        from pyglet.gl import gl_info
+        super(_FenceFlip, self).__init__(ec, n_max)
+        if not (gl_info.have_version(3, 2) or
+                gl_info.have_extension('GL_ARB_sync')):
+            raise RuntimeError('flip strategy "fence" requires OpenGL 3.2 '
+                               'or GL_ARB_sync')
+        self._timeout = int(timeout * 1e9)  # nanoseconds
+
+    def _flip(self, gl):
+        self._win.flip()
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        sync = gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        try:
+            while True:
+                status = gl.glClientWaitSync(
+                    sync, gl.GL_SYNC_FLUSH_COMMANDS_BIT, self._timeout)
+                if status == gl.GL_WAIT_FAILED:
+                    raise RuntimeError('Waiting for flip fence failed')
+                elif status != gl.GL_TIMEOUT_EXPIRED:
+                    return self._clock()
+        finally:
+            gl.glDeleteSync(sync)
+
+
+class _VsyncFlip(_FlipStrategy):
+    """Flip, then use the driver's timestamp of the swap
+
+    On X11 with GLX_OML_sync_control, ``glXWaitForSbcOML`` waits for the
+    swap and returns the unadjusted system time (UST, in microseconds of
+    the monotonic clock) of the vertical retrace it happened at, which is
+    mapped to the master clock by a clock model. Otherwise, the time that
+    a single ``glFinish`` after the swap returns is used.
+    """
+    name = 'vsync'
+
+    def __init__(self, ec, n_max=10000):
+        super(_VsyncFlip, self).__init__(ec, n_max)
+        self._wait_for_sbc = self._get_wait_for_sbc()
+        if self._wait_for_sbc is None:
+            logger.info('Expyfun: Swap timestamps unavailable, flip strategy '
+                        '"vsync" will timestamp when the swap finishes')
+            self._model = None
+        else:
+            self._model = ec._clock_sync.add_clock('vsync', _monotonic,
+                                                   max_residual=1e-3)
+
+    def _get_wait_for_sbc(self):
+        """Get a function waiting for pending swaps, returning UST"""
+        if not sys.platform.startswith('linux') or _monotonic is None:
+            return None
+        try:
+            from pyglet.gl import glxext_arb
+            context = self._win.context
+            if not context.config.glx_info.have_extension(
+                    'GLX_OML_sync_control'):
+                return None
+            display = context.x_display
+            drawable = (getattr(context, 'glx_window', None) or
+                        context.canvas.x_window)
+        except Exception:
+            return None
+        ust, msc, sbc = ctypes.c_int64(), ctypes.c_int64(), ctypes.c_int64()
+
+        def wait_for_sbc():
+            if not glxext_arb.glXWaitForSbcOML(
+                    display, drawable, 0, ctypes.byref(ust),
+                    ctypes.byref(msc), ctypes.byref(sbc)):
+                raise RuntimeError('glXWaitForSbcOML failed')
+            return ust.value / 1e6
+        return wait_for_sbc
+
+    def _flip(self, gl):
+        self._win.flip()
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        if self._wait_for_sbc is None:
+            gl.glFinish()
+            return self._clock()
+        gl.glFlush()
+        ust = self._wait_for_sbc()
+        if abs(ust - _monotonic()) > 1.:  # UST is not the monotonic clock
+            logger.warning('Expyfun: Swap timestamps do not use the '
+                           'monotonic clock, flip strategy "vsync" will '
+                           'timestamp when the swap finishes')
+            self._wait_for_sbc = None
+            gl.glFinish()
+            return self._clock()
+        return float(self._model(ust))
+
+
+_flip_strategies = dict((s.name, s) for s in (_ConservativeFlip, _FenceFlip,
+                                              _VsyncFlip))
@@ -7,11 +7,12 @@
 # License: BSD (3-clause)
 
 import numpy as np
-from functools import partial
+import threading
 
 from .visual import (Triangle, Rectangle, Circle, Diamond, ConcentricCircles,
                      FixationDot)
-from ._utils import wait_secs, clock, string_types
+from ._utils import (wait_secs, clock, string_types, _wait_for_events,
+                     _GrowBuffer, _RingBuffer, logger)
 
 
 class Keyboard(object):
@@ -33,12 +34,12 @@ class Keyboard(object):
 
     def __init__(self, ec, force_quit_keys):
         self.master_clock = ec._master_clock
+        self._scheduler = ec._scheduler
         self.log_presses = ec._log_presses
         self.force_quit_keys = force_quit_keys
         self.listen_start = None
-        ec._time_correction_fxns['keypress'] = self._get_timebase
-        self.get_time_corr = partial(ec._get_time_correction, 'keypress')
-        self.time_correction = self.get_time_corr()
+        self._clock_model = ec._clock_sync.add_clock('keypress',
+                                                     self._get_timebase)
         self.win = ec._win
         # always init pyglet response handler for error (and non-error) keys
         self.win.on_key_press = self._on_pyglet_keypress
@@ -87,7 +88,6 @@ class Keyboard(object):
     def listen_presses(self):
         """Start listening for keypresses.
         """
-        self.time_correction = self.get_time_corr()
         self.listen_start = self.master_clock()
         self._clear_events()
 
@@ -115,6 +115,10 @@ class Keyboard(object):
         while (not len(pressed) and
                self.master_clock() - start_time < max_wait):
             pressed = self._retrieve_events(live_keys)
+            if not len(pressed):
+                _wait_for_events(max_wait -
+                                 (self.master_clock() - start_time),
+                                 self._scheduler.spin)
 
         # handle non-presses
         if len(pressed):
@@ -135,6 +139,8 @@ class Keyboard(object):
         pressed = []
         while (self.master_clock() - start_time < max_wait):
             pressed = self._retrieve_events(live_keys)
+            _wait_for_events(max_wait - (self.master_clock() - start_time),
+                             self._scheduler.spin)
         return self._correct_presses(pressed, timestamp, relative_to)
 
     def check_force_quit(self, keys=None):
@@ -160,7 +166,7 @@ class Keyboard(object):
     def _correct_presses(self, pressed, timestamp, relative_to):
         """Correct timing of presses and check for quit press"""
         if len(pressed):
-            pressed = [(k, s + self.time_correction) for k, s in pressed]
+            pressed = [(k, float(self._clock_model(s))) for k, s in pressed]
             self.log_presses(pressed)
             keys = [k for k, _ in pressed]
             self.check_force_quit(keys)
@@ -217,15 +223,20 @@ class Mouse(object):
         self.win = ec._win
         self.set_visible(visible)
         self.master_clock = ec._master_clock
+        self._scheduler = ec._scheduler
         self.log_clicks = ec._log_clicks
         self.listen_start = None
-        ec._time_correction_fxns['mouseclick'] = self._get_timebase
-        self.get_time_corr = partial(ec._get_time_correction, 'mouseclick')
-        self.time_correction = self.get_time_corr()
+        self.capture_start = None
+        self._clock_model = ec._clock_sync.add_clock('mouseclick',
+                                                     self._get_timebase)
         self.win = ec._win
         self._check_force_quit = ec.check_force_quit
         self.win.on_mouse_press = self._on_pyglet_mouse_click
+        self.win.on_mouse_motion = self._on_pyglet_mouse_motion
+        self.win.on_mouse_drag = self._on_pyglet_mouse_drag
         self._mouse_buffer = []
+        self._motion_buffer = _GrowBuffer(3)  # time, x, y
+        self._capturing = False
         self._button_names = {mouse.LEFT: 'left', mouse.MIDDLE: 'middle',
                               mouse.RIGHT: 'right'}
         self._button_ids = {'left': mouse.LEFT, 'middle': mouse.MIDDLE,
@@ -287,10 +298,40 @@ class Mouse(object):
         this_button = self._button_names[button]
         self._mouse_buffer.append((this_button, x, y, button_time))
 
+    def _on_pyglet_mouse_motion(self, x, y, dx, dy):
+        """Handler for on_mouse_motion pyglet events"""
+        if self._capturing:
+            self._motion_buffer.append((clock(), x, y))
+
+    def _on_pyglet_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        """Handler for on_mouse_drag pyglet events"""
+        self._on_pyglet_mouse_motion(x, y, dx, dy)
+
+    def start_capture(self):
+        """Start recording mouse motion (discarding earlier samples)
+        """
+        self.win.dispatch_events()  # discard stale events
+        self._motion_buffer.clear()
+        self._capturing = True
+        self.capture_start = self.master_clock()
+
+    def stop_capture(self):
+        """Stop recording mouse motion
+        """
+        self.win.dispatch_events()
+        self._capturing = False
+
+    def get_trajectory(self):
+        """Get the recorded motion times (master clock) and pixel positions
+        """
+        if self._capturing:
+            self.win.dispatch_events()
+        data = self._motion_buffer.data
+        return self._clock_model(data[:, 0]), data[:, 1:]
+
     def listen_clicks(self):
         """Start listening for mouse clicks.
         """
-        self.time_correction = self.get_time_corr()
         self.listen_start = self.master_clock()
         self._clear_events()
 
@@ -318,6 +359,10 @@ class Mouse(object):
         while (not len(clicked) and
                self.master_clock() - start_time < max_wait):
             clicked = self._retrieve_events(live_buttons)
+            if not len(clicked):
+                _wait_for_events(max_wait -
+                                 (self.master_clock() - start_time),
+                                 self._scheduler.spin)
 
         # handle non-clicks
         if len(clicked):
@@ -338,6 +383,8 @@ class Mouse(object):
         clicked = []
         while (self.master_clock() - start_time < max_wait):
             clicked = self._retrieve_events(live_buttons)
+            _wait_for_events(max_wait - (self.master_clock() - start_time),
+                             self._scheduler.spin)
         return self._correct_clicks(clicked, timestamp, relative_to)
 
     def wait_for_click_on(self, objects, max_wait, min_wait,
@@ -347,18 +394,19 @@ class Mouse(object):
         relative_to, start_time, was_visible = self._init_wait_click(
             max_wait, min_wait, live_buttons, timestamp, relative_to, True)
 
+        hit_index = _HitIndex(objects)
         index = None
         ci = 0
         while (self.master_clock() - start_time < max_wait and
                index is None):
             clicked = self._retrieve_events(live_buttons)
             while ci < len(clicked) and index is None:  # clicks first
-                oi = 0
-                while oi < len(objects) and index is None:  # then objects
-                    if self._point_in_object(clicked[ci][1:3], objects[oi]):
-                        index = oi
-                    oi += 1
+                index = hit_index(clicked[ci][1:3])  # then objects
                 ci += 1
+            if index is None:
+                _wait_for_events(max_wait -
+                                 (self.master_clock() - start_time),
+                                 self._scheduler.spin)
 
         # handle non-clicks
         if index is not None:
@@ -375,7 +423,7 @@ class Mouse(object):
     def _correct_clicks(self, clicked, timestamp, relative_to):
         """Correct timing of clicks"""
         if len(clicked):
-            clicked = [(b, x, y, s + self.time_correction) for
+            clicked = [(b, x, y, float(self._clock_model(s))) for
                        b, x, y, s in clicked]
             self.log_clicks(clicked)
             buttons = [(b, x, y) for b, x, y, _ in clicked]
@@ -409,33 +457,237 @@ class Mouse(object):
             self.set_visible(visible)
         return relative_to, start_time, was_visible
 
-    # Define some functions for determining if a click point is in an object
-    def _point_in_object(self, pos, obj):
-        """Determine if a point is within a visual objec
-        """
-        if isinstance(obj, (Rectangle, Circle, Diamond, Triangle)):
-            return self._point_in_tris(pos, obj)
-        elif isinstance(obj, (ConcentricCircles, FixationDot)):
-            return np.any([self._point_in_tris(pos, c) for c in obj._circles])
 
-    def _point_in_tris(self, pos, obj):
-        """Check to see if a point is in any of the triangles
+# Define some functions for determining if click points are in objects
+def _points_in_tris(pos, points, tris):
+    """Determine which points are within any of the triangles
+
+    Parameters
+    ----------
+    pos : array, shape (n_pos, 2)
+        The points to test.
+    points : array, shape (n_points, 2)
+        The triangle vertices.
+    tris : array, shape (n_tris, 3)
+        The vertex indices of each triangle.
+
+    Returns
+    -------
+    inside : array of bool, shape (n_pos,)
+        Whether each point is strictly inside at least one triangle.
+
+    Notes
+    -----
+    A point is inside a triangle if the cross products of each edge with
+    the vector from the edge start to the point all have the same sign
+    (i.e., its barycentric coordinates are all positive). All points and
+    triangles are tested at once.
+    """
+    pos = np.atleast_2d(np.asarray(pos, float))
+    points = np.asarray(points, float)
+    tris = np.asarray(tris).reshape(-1, 3)
+    signs = list()
+    for start, stop in ((0, 1), (1, 2), (2, 0)):
+        p0 = points[tris[:, start]]
+        edge = points[tris[:, stop]] - p0
+        signs.append(np.sign(edge[:, 0] * (pos[:, 1:2] - p0[:, 1]) -
+                             edge[:, 1] * (pos[:, 0:1] - p0[:, 0])))
+    inside = (signs[0] != 0) & (signs[0] == signs[1]) & (signs[1] == signs[2])
+    return inside.any(axis=-1)
+
+
+def _points_in_object(pos, obj):
+    """Determine which points are within a visual object
+
+    Circles and rectangles are tested analytically, other shapes using
+    their triangles.
+    """
+    pos = np.atleast_2d(np.asarray(pos, float))
+    if isinstance(obj, (ConcentricCircles, FixationDot)):
+        return np.any([_points_in_object(pos, c) for c in obj._circles],
+                      axis=0)
+    elif not isinstance(obj, (Rectangle, Circle, Diamond, Triangle)):
+        return np.zeros(len(pos), bool)
+    if isinstance(obj, Rectangle):  # axis-aligned, so its own bounds
+        xmin, ymin, xmax, ymax = _object_bounds(obj)
+        return ((xmin < pos[:, 0]) & (pos[:, 0] < xmax) &
+                (ymin < pos[:, 1]) & (pos[:, 1] < ymax))
+    elif isinstance(obj, Circle):
+        # the polygon lies between its inscribed and circumscribed ellipses
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.sum(((pos - obj._offset) / obj._scale) ** 2, axis=1)
+        inside = r2 <= np.cos(np.pi / obj._n_edges) ** 2
+        check = ~inside & (r2 <= 1)
+        if check.any():
+            inside[check] = _points_in_tris(
+                pos[check], obj._get_points('fill'), obj._tris['fill'])
+        return inside
+    return _points_in_tris(pos, obj._get_points('fill'), obj._tris['fill'])
+
+
+def _object_bounds(obj):
+    """Get the (xmin, ymin, xmax, ymax) bounding box of an object"""
+    if isinstance(obj, (ConcentricCircles, FixationDot)):
+        bounds = np.array([_object_bounds(c) for c in obj._circles])
+        return np.r_[bounds[:, :2].min(0), bounds[:, 2:].max(0)]
+    elif not isinstance(obj, (Rectangle, Circle, Diamond, Triangle)):
+        return np.array([np.inf, np.inf, -np.inf, -np.inf])
+    points = obj._get_points('fill')
+    return np.r_[points.min(0), points.max(0)].astype(float)
+
+
+class _HitIndex(object):
+    """Find the first of a set of objects that contains a point
+
+    Parameters
+    ----------
+    objects : list
+        The visual objects, which should not move while the index is used.
+
+    Notes
+    -----
+    The bounding boxes of all objects are compared to the point at once,
+    and only the objects whose boxes contain it are tested exactly.
+    """
+    def __init__(self, objects):
+        self.objects = objects
+        self._bounds = np.array([_object_bounds(obj) for obj in objects],
+                                float).reshape(-1, 4)
+
+    def __call__(self, pos):
+        """Get the index of the first object containing the point, or None
         """
-        these_tris = obj._tris['fill'].reshape(-1, 3)
-        for tri in these_tris:
-            if self._point_in_tri(pos, obj._points['fill'][tri]):
-                return True
-        return False
-
-    def _point_in_tri(self, pos, tri):
-        """Check to see if a point is in a single triangle
+        x, y = pos
+        bounds = self._bounds
+        candidates = np.where((bounds[:, 0] < x) & (x < bounds[:, 2]) &
+                              (bounds[:, 1] < y) & (y < bounds[:, 3]))[0]
+        for oi in candidates:
+            if _points_in_object(pos, self.objects[oi])[0]:
+                return int(oi)
+        return None
+
+
+class _CedrusReader(object):
+    """Drain a Cedrus device continuously from a background thread
+
+    Parameters
+    ----------
+    dev : instance of pyxid.ResponseDevice
+        The device. After creation, it must only be used by this reader.
+    clock_model : instance of _ClockModel
+        The model that device timer samples are added to, and that is used
+        to convert press times to the master clock.
+    clock : callable
+        The master clock.
+    n_max : int
+        Number of presses that can be buffered between reads.
+    sync_interval : float
+        Interval between (device, master) timer samples.
+    poll : float
+        Time to sleep between polls when no responses are pending.
+    max_round_trip : float
+        Timer samples whose query took longer than this (or than three
+        times the median of recent queries, if that is larger than 1 ms)
+        are discarded.
+
+    Notes
+    -----
+    Presses are written by the reader thread into preallocated arrays and
+    published by incrementing a counter after each write, so the main thread
+    can copy new presses without locking (single producer, single consumer).
+    Timer queries are done by the reader thread right after a poll that
+    found no pending responses, so they do not require clearing the device
+    queue.
+    """
+    def __init__(self, dev, clock_model, clock, n_max=10000,
+                 sync_interval=1., poll=1e-3, max_round_trip=5e-3):
+        self._dev = dev
+        self._clock_model = clock_model
+        self._clock = clock
+        self._keys = np.zeros(int(n_max), int)
+        self._times = np.zeros(int(n_max))  # device times
+        self._n_written = 0  # only modified by the reader thread
+        self._n_read = 0  # only modified by the reading (main) thread
+        self.sync_interval = float(sync_interval)
+        self.poll = float(poll)
+        self.max_round_trip = float(max_round_trip)
+        self._round_trips = _RingBuffer(50, 1)  # of accepted samples
+        self._last_sync = -np.inf
+        self._sync()  # anchor the conversion before any press arrives
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name='expyfun-cedrus')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        dev = self._dev
+        while not self._stop.is_set():
+            dev.poll_for_response()
+            if dev.response_queue_size() == 0:
+                if self._clock() - self._last_sync >= self.sync_interval:
+                    self._sync()
+                self._stop.wait(self.poll)
+                continue
+            while dev.response_queue_size() > 0:
+                key = dev.get_next_response()
+                if key['pressed']:
+                    self._write(key['key'], key['time'] / 1000.)
+
+    def _write(self, key, time):
+        n_max = len(self._keys)
+        idx = self._n_written % n_max
+        self._keys[idx] = key
+        self._times[idx] = time
+        self._n_written += 1  # publish only after the row is written
+
+    def _sync(self):
+        """Sample the device timer against the master clock"""
+        t0 = self._clock()
+        try:
+            dev_time = self._dev.query_base_timer() / 1000.
+        except Exception as exp:  # a response arrived mid-query
+            logger.debug('Expyfun: Cedrus timer query failed ({0})'
+                         ''.format(exp))
+            return
+        t1 = self._clock()
+        limit = self.max_round_trip
+        if self._round_trips.n_total >= 5:
+            limit = min(limit, max(3 * np.median(self._round_trips.data),
+                                   1e-3))
+        if t1 - t0 > limit:  # e.g., a response arrived mid-query
+            logger.debug('Expyfun: Cedrus timer query took {0:0.2f} ms, '
+                         'discarding it'.format(1000 * (t1 - t0)))
+            return
+        self._round_trips.append(t1 - t0)
+        self._last_sync = t1
+        self._clock_model.add_sample(dev_time, (t0 + t1) / 2.)
+
+    def read(self):
+        """Get the presses that arrived since the last read
+
+        Returns
+        -------
+        keys : array of int
+            The zero-based keys pressed.
+        times : array of float
+            The device times of the presses (in seconds).
         """
-        signs = np.sign([np.cross(tri[np.mod(i + 1, 3)] - tri[i],
-                                  pos - tri[i]) for i in range(3)])
-        if np.all(signs[1:] == signs[0]):
-            return True
-        else:
-            return False
+        n_written = self._n_written
+        n_max = len(self._keys)
+        if n_written - self._n_read > n_max:
+            logger.warning('Expyfun: {0} Cedrus presses were dropped because '
+                           'the buffer was full'
+                           ''.format(n_written - self._n_read - n_max))
+            self._n_read = n_written - n_max
+        idx = np.arange(self._n_read, n_written) % n_max
+        self._n_read = n_written
+        return self._keys[idx], self._times[idx]
+
+    def close(self):
+        """Stop the reader thread"""
+        self._stop.set()
+        self._thread.join()
 
 
 class CedrusBox(Keyboard):
@@ -450,24 +702,16 @@ class CedrusBox(Keyboard):
         dev = pyxid.get_xid_devices()[0]
         dev.reset_base_timer()
         assert dev.is_response_device()
-        self._dev = dev
         self._keyboard_buffer = []
         super(CedrusBox, self).__init__(ec, force_quit_keys)
-        ec._time_correction_maxs['keypress'] = 1e-3  # higher tolerance
-
-    def _get_timebase(self):
-        """WARNING: For now this will clear the event queue!"""
-        self._retrieve_events(None)
-        self._dev.con.read_nonblocking(65536)
-        t = self._dev.query_base_timer()
-        # This drift correction has been empirically determined, see:
-        #  https://github.com/cedrus-opensource/pyxid/issues/2
-        #  https://gist.github.com/Eric89GXL/c245574a1eaea65348a3
-        t *= 0.00100064206973
-        return t
+        # the reader samples the device timer itself (higher tolerance)
+        self._clock_model = ec._clock_sync.add_clock('keypress',
+                                                     max_residual=1e-3)
+        self._reader = _CedrusReader(dev, self._clock_model, ec._master_clock)
+        ec._extra_cleanup_fun.append(self._reader.close)
 
     def _clear_events(self):
-        self._retrieve_events(None)
+        self._reader.read()
         self._keyboard_buffer = []
 
     def _retrieve_events(self, live_keys):
@@ -475,14 +719,10 @@ class CedrusBox(Keyboard):
         if live_keys is not None:
             live_keys = [str(x) for x in live_keys]  # accept ints
             live_keys.extend(self.force_quit_keys)
-        # pump for events
-        self._dev.poll_for_response()
-        while self._dev.response_queue_size() > 0:
-            key = self._dev.get_next_response()
-            if key['pressed']:
-                key = [str(key['key'] + 1), key['time'] / 1000.]
-                self._keyboard_buffer.append(key)
-            self._dev.poll_for_response()
+        # copy presses collected by the reader thread
+        keys, times = self._reader.read()
+        self._keyboard_buffer.extend((str(key + 1), time)
+                                     for key, time in zip(keys, times))
         # check to see if we have matches
         targets = []
         for key in self._keyboard_buffer:
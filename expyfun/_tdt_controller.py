@@ -97,6 +97,7 @@ class TDTController(Keyboard):
             if k not in legal_keys:
                 raise KeyError('Unrecognized key in tdt_params: {0}'.format(k))
         self._model = tdt_params['TDT_MODEL']
+        self.timer = None  # optionally set to a TriggerTimer by the EC
 
         if tdt_params['TDT_CIRCUIT_PATH'] is None and self._model != 'dummy':
             cl = dict(RM1='RM1', RP2='RM1', RZ6='RZ6')
@@ -268,9 +269,14 @@ class TDTController(Keyboard):
         wait_for_last : bool
             If True, wait for last trigger to be stamped before returning.
         """
+        t0 = None if self.timer is None else self.timer.clock()
         for ti, trig in enumerate(triggers):
+            if self.timer is not None:
+                self.timer.start(trig, t0 + ti * delay)
             self.rpcox.SetTagVal('trgname', trig)
             self._trigger(6)
+            if self.timer is not None:
+                self.timer.stop()
             if ti < len(triggers) - 1 or wait_for_last:
                 wait_secs(delay)
 
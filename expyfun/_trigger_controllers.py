@@ -7,7 +7,7 @@
 
 import numpy as np
 
-from ._utils import wait_secs, verbose_dec
+from ._utils import wait_secs, verbose_dec, clock, _RingBuffer, _stats
 
 
 class ParallelTrigger(object):
@@ -86,6 +86,7 @@ class ParallelTrigger(object):
         else:  # mode == 'dummy':
             self._stamp_trigger = self._dummy_trigger
         self.high_duration = high_duration
+        self.timer = None
 
     def _dummy_trigger(self, trig):
         """Fake stamping"""
@@ -110,8 +111,13 @@ class ParallelTrigger(object):
         wait_for_last : bool
             If True, wait for last trigger to be stamped before returning.
         """
+        t0 = None if self.timer is None else self.timer.clock()
         for ti, trig in enumerate(triggers):
+            if self.timer is not None:
+                self.timer.start(trig, t0 + ti * delay)
             self._stamp_trigger(trig)
+            if self.timer is not None:
+                self.timer.stop()
             if ti < len(triggers) - 1 or wait_for_last:
                 wait_secs(delay - self.high_duration)
 
@@ -122,6 +128,67 @@ class ParallelTrigger(object):
             del self._port
 
 
+class TriggerTimer(object):
+    """Record when each trigger was requested and actually stamped
+
+    Parameters
+    ----------
+    clock : callable
+        Function returning the current time (usually the EC master clock).
+    n_max : int
+        Number of triggers to keep. Once the buffer is full, the oldest
+        entries are overwritten.
+
+    Notes
+    -----
+    Each entry stores the trigger value, the requested time (the start of
+    the ``stamp_triggers`` call plus the inter-trigger delays), the time the
+    stamping call was made, and the time it returned. The latency is the
+    difference between the call and the requested time, and the jitter is
+    its standard deviation.
+    """
+    def __init__(self, clock=clock, n_max=10000):
+        self.clock = clock
+        # value, requested, sent, returned
+        self._stamps = _RingBuffer(n_max, 4)
+        self._current = None
+
+    def start(self, value, requested):
+        """Mark the start of stamping a single trigger"""
+        self._current = (value, requested, self.clock())
+
+    def stop(self):
+        """Mark the end of stamping the current trigger"""
+        self._stamps.append(self._current + (self.clock(),))
+        self._current = None
+
+    @property
+    def n_stamped(self):
+        """Total number of triggers stamped"""
+        return self._stamps.n_total
+
+    @property
+    def data(self):
+        """Array of (value, requested, sent, returned) in stamping order"""
+        return self._stamps.data
+
+    def summary(self):
+        """Summarize trigger latency and jitter
+
+        Returns
+        -------
+        summary : dict
+            Contains ``n_stamped``, ``n_kept`` (entries still in the buffer),
+            and the ``latency_*`` and ``duration_*`` (time spent in the
+            stamping call) mean, std, and max values in seconds.
+        """
+        data = self.data
+        out = dict(n_stamped=self.n_stamped, n_kept=len(data))
+        out.update(_stats(data[:, 2] - data[:, 1], 'latency'))
+        out.update(_stats(data[:, 3] - data[:, 2], 'duration'))
+        return out
+
+
 def decimals_to_binary(decimals, n_bits):
     """Convert a sequence of decimal numbers to a sequence of binary numbers
 
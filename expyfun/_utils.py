@@ -25,6 +25,11 @@ import logging
 import datetime
 from timeit import default_timer as clock
 from threading import Timer
+try:
+    from logging.handlers import QueueHandler, QueueListener
+    from queue import Queue
+except ImportError:  # Python 2
+    QueueHandler = QueueListener = None
 
 from ._externals import decorator
 
@@ -86,11 +91,85 @@ logger = logging.getLogger('expyfun')
 
 
 def flush_logger():
-    """Flush expyfun logger"""
+    """Flush expyfun logger
+
+    With a threaded log file, this waits until all queued messages have
+    been written.
+    """
     for handler in logger.handlers:
         handler.flush()
 
 
+class _JSONFormatter(logging.Formatter):
+    """Format log records as JSON objects, one per line"""
+    def format(self, record):
+        out = dict(time=record.created, level=record.levelname,
+                   name=record.name, thread=record.threadName,
+                   message=record.getMessage())
+        if record.exc_info:
+            out['exception'] = self.formatException(record.exc_info)
+        return json.dumps(out, sort_keys=True)
+
+
+# log arguments that cannot change before a listener thread formats them
+_log_immutable_types = (string_types, text_type, bytes, int, float, bool,
+                        type(None), np.generic)
+
+
+def _snapshot_log_arg(arg):
+    """Convert a log argument to text unless it is immutable"""
+    return arg if isinstance(arg, _log_immutable_types) else text_type(arg)
+
+
+if QueueHandler is not None:
+    class _DeferredQueueHandler(QueueHandler):
+        """Queue records for a listener thread without formatting them
+
+        Only arguments that could change before the listener formats the
+        message are converted to text here.
+        """
+        def prepare(self, record):
+            if isinstance(record.args, tuple):
+                record.args = tuple(_snapshot_log_arg(arg)
+                                    for arg in record.args)
+            elif isinstance(record.args, dict):
+                record.args = dict((key, _snapshot_log_arg(val))
+                                   for key, val in record.args.items())
+            return record
+
+        def flush(self):
+            """Wait for the listener to write all queued records"""
+            listener = getattr(self, 'listener', None)
+            if listener is not None:
+                self.queue.join()
+                for sub_handler in listener.handlers:
+                    sub_handler.flush()
+
+
+# queue handlers whose listener threads are still running
+_log_queue_handlers = list()
+
+
+def _stop_log_queue(handler):
+    """Write all queued records and stop the thread of a queue handler"""
+    listener, handler.listener = handler.listener, None
+    if handler in _log_queue_handlers:
+        _log_queue_handlers.remove(handler)
+    if listener is not None:
+        listener.stop()
+        for sub_handler in listener.handlers:
+            sub_handler.close()
+
+
+def _stop_log_queues():
+    """Stop all running queue handlers (at exit)"""
+    for handler in list(_log_queue_handlers):
+        _stop_log_queue(handler)
+
+
+atexit.register(_stop_log_queues)
+
+
 def set_log_level(verbose=None, return_old_level=False):
     """Convenience function for setting the logging level
 
@@ -126,7 +205,7 @@ def set_log_level(verbose=None, return_old_level=False):
 
 def set_log_file(fname=None,
                  output_format='%(asctime)s - %(levelname)-5s - %(message)s',
-                 overwrite=None):
+                 overwrite=None, threaded=False):
     """Convenience function for setting the log to print to a file
 
     Parameters
@@ -138,14 +217,30 @@ def set_log_file(fname=None,
         Format of the output messages. See the following for examples:
             http://docs.python.org/dev/howto/logging.html
         e.g., "%(asctime)s - %(levelname)s - %(message)s".
+        Use "json" to write each message as a JSON object (with the
+        ``time``, ``level``, ``name``, ``thread``, and ``message``) per line.
     overwrite : bool, or None
         Overwrite the log file (if it exists). Otherwise, statements
         will be appended to the log (default). None is the same as False,
         but additionally raises a warning to notify the user that log
         entries will be appended.
+    threaded : bool
+        If True, messages are queued and formatted and written by a
+        background thread, so that logging does not wait on I/O (requires
+        Python 3.2+, otherwise messages are written directly). Use
+        ``flush_logger`` to wait until queued messages are written, which
+        also happens when the log file is changed again, e.g. by
+        ``set_log_file(None)``.
+
+    Notes
+    -----
+    Messages given with arguments, e.g. ``logger.exp('Played %s', name)``,
+    are only formatted if they are logged (and with ``threaded=True``, in
+    the background thread).
     """
-    handlers = logger.handlers
-    for h in handlers:
+    for h in list(logger.handlers):
+        if getattr(h, 'listener', None) is not None:
+            _stop_log_queue(h)
         if isinstance(h, logging.FileHandler):
             h.close()
         logger.removeHandler(h)
@@ -163,7 +258,17 @@ def set_log_file(fname=None,
         """
         lh = logging.StreamHandler(WrapStdOut())
 
-    lh.setFormatter(logging.Formatter(output_format))
+    if output_format == 'json':
+        lh.setFormatter(_JSONFormatter())
+    else:
+        lh.setFormatter(logging.Formatter(output_format))
+    if threaded and QueueHandler is not None:
+        queue = Queue()
+        listener = QueueListener(queue, lh)
+        lh = _DeferredQueueHandler(queue)
+        lh.listener = listener
+        listener.start()
+        _log_queue_handlers.append(lh)
     # actually add the stream handler
     logger.addHandler(lh)
 
@@ -221,6 +326,85 @@ class ZeroClock(object):
         return clock() - self._start_time
 
 
+class _RingBuffer(object):
+    """Preallocated buffer of float rows that overwrites the oldest rows
+
+    Parameters
+    ----------
+    n_max : int
+        Number of rows to keep.
+    n_cols : int
+        Number of values per row.
+    """
+    def __init__(self, n_max, n_cols):
+        n_max = int(n_max)
+        if n_max <= 0:
+            raise ValueError('n_max must be positive, got {0}'.format(n_max))
+        self._data = np.zeros((n_max, int(n_cols)))
+        self._n = 0
+
+    def append(self, row):
+        self._data[self._n % len(self._data)] = row
+        self._n += 1
+
+    @property
+    def n_total(self):
+        """Number of rows ever appended"""
+        return self._n
+
+    @property
+    def data(self):
+        """Copy of the kept rows, oldest first"""
+        n_max = len(self._data)
+        if self._n <= n_max:
+            return self._data[:self._n].copy()
+        idx = self._n % n_max
+        return np.concatenate((self._data[idx:], self._data[:idx]))
+
+
+class _GrowBuffer(object):
+    """Preallocated buffer of float rows that doubles in size when full
+
+    Parameters
+    ----------
+    n_cols : int
+        Number of values per row.
+    n_init : int
+        Number of rows to preallocate.
+    """
+    def __init__(self, n_cols, n_init=1024):
+        self._data = np.zeros((max(int(n_init), 1), int(n_cols)))
+        self._n = 0
+
+    def append(self, row):
+        if self._n == len(self._data):
+            self._data = np.concatenate((self._data,
+                                         np.zeros_like(self._data)))
+        self._data[self._n] = row
+        self._n += 1
+
+    def clear(self):
+        """Remove all rows (keeping the allocated memory)"""
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def data(self):
+        """Copy of the rows"""
+        return self._data[:self._n].copy()
+
+
+def _stats(vals, pre):
+    """Helper to compute mean, std, and max of a set of values"""
+    out = dict()
+    for name, func in (('mean', np.mean), ('std', np.std), ('max', np.max)):
+        out['{0}_{1}'.format(pre, name)] = \
+            float(func(vals)) if len(vals) else np.nan
+    return out
+
+
 def date_str():
     """Produce a date string for the current date and time
 
@@ -531,6 +715,10 @@ known_config_types = ('RESPONSE_DEVICE',
                       'SCREEN_DISTANCE',
                       'SCREEN_SIZE_PIX',
                       'EXPYFUN_LOGGING_LEVEL',
+                      'FLIP_STRATEGY',
+                      'DATA_FSYNC',
+                      'DATA_BINARY',
+                      'LOG_JSON',
                       )
 
 # These allow for partial matches: 'NAME_1' is okay key if 'NAME' is listed
@@ -676,6 +864,270 @@ def _check_pyglet_version(raise_error=False):
     return is_usable
 
 
+# Waiting loops block on the window event source for at most _WAIT_POLL
+# seconds at a time (waking up early if an event arrives) instead of spinning,
+# and only spin for the final _WAIT_SPIN seconds before a deadline
+_WAIT_POLL = 1e-3
+_WAIT_SPIN = 1e-3
+
+
+def _wait_for_events(time_left, spin=_WAIT_SPIN):
+    """Block until window events arrive or the spin window is reached
+
+    Parameters
+    ----------
+    time_left : float
+        Time remaining until the caller's deadline (can be ``np.inf``).
+        If it is within the spin window, this returns immediately so the
+        caller can busy-wait for the remaining time.
+    spin : float
+        The spin window, typically the calibrated ``_Scheduler.spin``.
+    """
+    if time_left <= spin:
+        return
+    import pyglet
+    pyglet.app.platform_event_loop.step(min(_WAIT_POLL, time_left - spin))
+
+
+def _pump_events(ec=None):
+    """Dispatch events on all windows and (optionally) check for force quit"""
+    import pyglet
+    wins = pyglet.window.get_platform().get_default_display().get_windows()
+    for win in wins:
+        win.dispatch_events()
+    if ec is not None:
+        ec.check_force_quit()
+
+
+class _Scheduler(object):
+    """Wait until deadlines by coarsely sleeping, then spinning
+
+    Parameters
+    ----------
+    clock : callable
+        The clock that deadlines are evaluated against.
+    max_block : float
+        Maximum time to block on the window event source between calls
+        to the waiting callback.
+    n_max : int
+        Number of (requested, achieved) wake-up times to keep.
+
+    Notes
+    -----
+    On creation, the overshoot of blocking on the window event source is
+    measured, and the final ``spin`` seconds before a deadline (twice the
+    worst overshoot, and at least one millisecond) are spent busy-waiting.
+    """
+    def __init__(self, clock=clock, max_block=0.01, n_max=10000):
+        self.clock = clock
+        self.max_block = float(max_block)
+        self._wakes = _RingBuffer(n_max, 2)
+        self.calibrate()
+
+    def calibrate(self, n_rep=10, duration=_WAIT_POLL):
+        """Measure the overshoot of blocking for a short duration
+
+        Parameters
+        ----------
+        n_rep : int
+            Number of measurements to make.
+        duration : float
+            Duration to block for in each measurement.
+
+        Returns
+        -------
+        spin : float
+            The new spin window.
+        """
+        import pyglet
+        step = pyglet.app.platform_event_loop.step
+        overshoot = np.zeros(int(n_rep))
+        for ii in range(len(overshoot)):
+            t0 = clock()
+            step(duration)
+            overshoot[ii] = clock() - t0 - duration
+        self.overshoot = max(float(overshoot.max()), 0.)
+        self.spin = max(_WAIT_SPIN, 2 * self.overshoot)
+        logger.debug('Expyfun: Blocking overshoot is {0:0.2f} ms, spinning '
+                     'for the last {1:0.2f} ms of each wait'
+                     ''.format(1000 * self.overshoot, 1000 * self.spin))
+        return self.spin
+
+    def wait_until(self, deadline, callback=None, idle=None):
+        """Wait until the given time is reached
+
+        Parameters
+        ----------
+        deadline : float
+            Time to wait until (evaluated against ``clock``).
+        callback : callable | None
+            Function to call repeatedly while waiting (e.g., to dispatch
+            events).
+        idle : callable | None
+            Function to call while waiting when more than ``max_block``
+            remains before the spin window (e.g., for housekeeping).
+
+        Returns
+        -------
+        error : float
+            Difference between the time the wait ended and the deadline.
+        """
+        import pyglet
+        step = pyglet.app.platform_event_loop.step
+        while True:
+            if callback is not None:
+                callback()
+            time_left = deadline - self.clock()
+            if time_left <= 0:
+                break
+            if idle is not None and time_left > self.max_block + self.spin:
+                idle()
+                time_left = deadline - self.clock()
+            if time_left > self.spin:
+                step(min(self.max_block, time_left - self.spin))
+        achieved = self.clock()
+        self._wakes.append((deadline, achieved))
+        return achieved - deadline
+
+    def summary(self):
+        """Summarize the wake-up errors of the waits
+
+        Returns
+        -------
+        summary : dict
+            Contains ``n_waits``, the ``spin`` window and measured blocking
+            ``overshoot``, and the wake-up ``error_*`` mean, std, and max
+            values, all in seconds.
+        """
+        data = self._wakes.data
+        out = dict(n_waits=self._wakes.n_total, spin=self.spin,
+                   overshoot=self.overshoot)
+        out.update(_stats(data[:, 1] - data[:, 0], 'error'))
+        return out
+
+
+class _FrameMonitor(object):
+    """Record flip times and detect dropped frames
+
+    Parameters
+    ----------
+    interval : float | None
+        Expected refresh interval (in seconds). If None, it is estimated
+        from the first flips that are requested right after the previous one.
+    tolerance : float
+        Fraction of a refresh interval that a flip can be late before it is
+        counted as having dropped a frame.
+    n_max : int
+        Number of flips to keep.
+
+    Notes
+    -----
+    If a flip is requested less than one interval after the previous flip,
+    it is expected one interval after the previous flip (continuous
+    animation); otherwise it is expected within one interval of the request.
+    Flips landing one or more intervals after this are counted as dropped
+    frames.
+    """
+    def __init__(self, interval=None, tolerance=0.5, n_max=100000):
+        self.interval = None if interval is None else float(interval)
+        self.tolerance = float(tolerance)
+        # request time, flip time, n_dropped, trial number
+        self._flips = _RingBuffer(n_max, 4)
+        self._candidates = list()
+        self._last = None
+        self._trial = 0
+        self._n_dropped = 0
+
+    def next_trial(self):
+        """Mark the end of a trial"""
+        self._trial += 1
+
+    def add(self, request_time, flip_time):
+        """Add a flip
+
+        Parameters
+        ----------
+        request_time : float
+            Time the flip was requested.
+        flip_time : float
+            Time the flip completed.
+
+        Returns
+        -------
+        n_dropped : int
+            The number of frames dropped before this flip.
+        """
+        last, self._last = self._last, flip_time
+        n_dropped = 0
+        if last is not None and self.interval is None:
+            if request_time - last < _WAIT_SPIN:  # back-to-back flips
+                self._candidates.append(flip_time - last)
+                if len(self._candidates) >= 10:
+                    self.interval = float(np.median(self._candidates))
+                    logger.debug('Expyfun: Estimated refresh interval is '
+                                 '{0:0.2f} ms'.format(1000 * self.interval))
+        elif last is not None:
+            if request_time - last < self.interval:
+                expected = last + self.interval
+            else:
+                expected = request_time + self.interval
+            n_dropped = int(max(np.floor((flip_time - expected) /
+                                         self.interval + self.tolerance), 0))
+            self._n_dropped += n_dropped
+        self._flips.append((request_time, flip_time, n_dropped, self._trial))
+        return n_dropped
+
+    def summary(self, per_trial=False):
+        """Summarize frame timing
+
+        Parameters
+        ----------
+        per_trial : bool
+            If True, include per-trial statistics.
+
+        Returns
+        -------
+        summary : dict
+            Contains ``n_flips``, the refresh ``interval``, the total
+            number of ``n_dropped`` frames, a list of the times of the
+            flips that followed dropped frames (``dropped_times``), and the
+            ``interval_*`` mean, std, and max of the intervals between
+            flips requested less than two refresh intervals apart. If
+            ``per_trial``, ``trials`` is a list of dicts with the ``trial``
+            number (counted by ``trial_ok`` calls), ``n_flips``, and
+            ``n_dropped`` for each trial with flips.
+        """
+        data = self._flips.data
+        late = data[:, 2] > 0
+        out = dict(n_flips=self._flips.n_total, interval=self.interval,
+                   n_dropped=self._n_dropped,
+                   dropped_times=data[late, 1].tolist())
+        intervals = np.diff(data[:, 1])
+        if self.interval is not None:
+            intervals = intervals[np.diff(data[:, 0]) < 2 * self.interval]
+        out.update(_stats(intervals, 'interval'))
+        if per_trial:
+            trials = list()
+            for trial in np.unique(data[:, 3]):
+                mask = data[:, 3] == trial
+                trials.append(dict(trial=int(trial), n_flips=int(mask.sum()),
+                                   n_dropped=int(data[mask, 2].sum())))
+            out['trials'] = trials
+        return out
+
+
+_scheduler = list()  # populated on first use
+
+
+def _get_scheduler(ec=None):
+    """Get the scheduler for an EC, or the default one"""
+    if getattr(ec, '_scheduler', None) is not None:
+        return ec._scheduler
+    if not _scheduler:
+        _scheduler.append(_Scheduler())
+    return _scheduler[0]
+
+
 def wait_secs(secs, ec=None):
     """Wait a specified number of seconds.
 
@@ -687,18 +1139,16 @@ def wait_secs(secs, ec=None):
 
     Notes
     -----
-    This function uses a while loop. Although this slams the CPU, it will
-    guarantee that events (keypresses, etc.) are processed.
+    This function blocks on the window event source for short periods, and
+    only busy-waits during the last moments before the deadline (the spin
+    window is calibrated based on how much blocking overshoots on the
+    current system). This guarantees that events (keypresses, etc.) are
+    processed and timing is precise without pinning the CPU.
     """
-    # hog the cpu, checking time
-    import pyglet
-    t0 = clock()
-    wins = pyglet.window.get_platform().get_default_display().get_windows()
-    while (clock() - t0) < secs:
-        for win in wins:
-            win.dispatch_events()
-        if ec is not None:
-            ec.check_force_quit()
+    scheduler = _get_scheduler(ec)
+    idle = getattr(ec, '_clock_sync', None)
+    scheduler.wait_until(scheduler.clock() + secs, partial(_pump_events, ec),
+                         None if idle is None else idle.sample)
 
 
 def running_rms(signal, win_length):
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""HDF5 file IO functions
+"""
+
+from os import path as op
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+from .._utils import string_types
+from .._externals._h5io import (read_hdf5 as _read_hdf5,
+                                write_hdf5 as _write_hdf5,
+                                _triage_read, _check_h5py)
+
+_title = 'expyfun'
+
+
+def _node_type(node):
+    """Get the type of data stored in an HDF5 node"""
+    type_str = node.attrs['TITLE']
+    if isinstance(type_str, bytes):
+        type_str = type_str.decode()
+    return type_str
+
+
+class _HDF5Dict(Mapping):
+    """Read-only view of a dict stored in an open HDF5 file
+
+    Values are read on access: arrays as ``h5py.Dataset`` objects (which
+    read only the parts that are sliced), dicts as other ``_HDF5Dict``
+    objects, and anything else as the stored object.
+    """
+    def __init__(self, node, keys=None):
+        self._node = node
+        if keys is None:
+            keys = [key[4:] for key in node.keys()]  # strip 'key_'
+        self._keys = keys
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        node = self._node['key_' + key]
+        type_str = _node_type(node)
+        if type_str == 'dict':
+            return _HDF5Dict(node)
+        elif type_str == 'ndarray':
+            return node
+        return _triage_read(node)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return '<HDF5 dict with keys {0} from {1}>'.format(
+            self._keys, self._node.file.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def load(self):
+        """Read all of the values
+
+        Returns
+        -------
+        data : dict
+            The data, as returned by ``read_hdf5`` with ``lazy=False``.
+        """
+        return dict((key, _triage_read(self._node['key_' + key]))
+                    for key in self._keys)
+
+    def close(self):
+        """Close the file (values read lazily become unusable)"""
+        self._node.file.close()
+
+
+def read_hdf5(fname, keys=None, lazy=False):
+    """Read python object from HDF5 format using h5io/h5py
+
+    Parameters
+    ----------
+    fname : str
+        File to load.
+    keys : str | list of str | None
+        If not None, only read these keys of the stored dict.
+    lazy : bool
+        If True, return a read-only dict-like object that keeps the file
+        open and reads values when they are accessed. Arrays are then
+        ``h5py.Dataset`` objects that only read the parts that are sliced
+        (e.g., ``data['brir'][10, :, :256]``), and ``np.array`` loads them
+        fully. Call its ``close`` method (or use it as a context manager)
+        when done.
+
+    Returns
+    -------
+    data : object
+        The loaded data. Can be of any type supported by ``write_hdf5``.
+
+    Notes
+    -----
+    ``keys`` and ``lazy`` require the stored object to be a dict.
+    """
+    if keys is None and not lazy:
+        return _read_hdf5(fname, title=_title)
+    h5py = _check_h5py()
+    if not op.isfile(fname):
+        raise IOError('file "%s" not found' % fname)
+    fid = h5py.File(fname, mode='r')
+    try:
+        if _title not in fid.keys():
+            raise ValueError('no "%s" data found' % _title)
+        root = fid[_title]
+        if _node_type(root) != 'dict':
+            raise TypeError('keys and lazy can only be used when the stored '
+                            'data are a dict, not a %s' % _node_type(root))
+        if keys is not None:
+            keys = [keys] if isinstance(keys, string_types) else list(keys)
+            for key in keys:
+                if not isinstance(key, string_types) or \
+                        'key_' + key not in root:
+                    raise KeyError('key %r not found in %s' % (key, fname))
+        data = _HDF5Dict(root, keys)
+        if not lazy:
+            data = data.load()
+    except Exception:
+        fid.close()
+        raise
+    if not lazy:
+        fid.close()
+    return data
+
+
+def write_hdf5(fname, data, overwrite=False, compression=4, shuffle=False,
+               chunks=True, min_compress_size=0, compress_arrays=False):
+    """Write python object to HDF5 format using h5io/h5py
+
+    Parameters
+    ----------
+    fname : str
+        Filename to use.
+    data : object
+        Object to write. Can be of any of these types:
+            {ndarray, dict, list, tuple, int, float, str}
+        Note that dict objects must only have ``str`` keys.
+    overwrite : bool
+        If True, overwrite file (if it exists).
+    compression : int | str
+        Compression level to use (0-9) to compress data using gzip, or
+        ``'lzf'`` to use the faster (but h5py-only) LZF filter. Arrays are
+        only compressed if ``compress_arrays=True``.
+    shuffle : bool
+        If True, apply the shuffle filter before compressing, which groups
+        the bytes of numbers and often improves compression of floats.
+    chunks : True | int
+        The chunking of compressed datasets. True lets h5py guess the chunk
+        shape, and an int gives the target chunk size in bytes (chunks then
+        span whole trailing axes when possible, which suits reading rows).
+    min_compress_size : int
+        Datasets smaller than this (in bytes) are stored uncompressed.
+    compress_arrays : bool
+        If True, also compress ndarrays, which are otherwise stored
+        uncompressed.
+
+    Notes
+    -----
+    Noisy float arrays (e.g., stimuli) barely compress, so storing them
+    uncompressed (the default) is by far the fastest. When arrays do
+    compress well, use ``compress_arrays=True``, ideally with
+    ``compression='lzf'`` or ``shuffle=True`` and a low gzip level, which
+    write and read faster; see the ``hdf5_compression`` example.
+    """
+    return _write_hdf5(fname, data, overwrite, compression, title=_title,
+                       shuffle=shuffle, chunks=chunks,
+                       min_compress_size=min_compress_size,
+                       compress_arrays=compress_arrays)
@@ -2,22 +2,235 @@
 """File parsing functions
 """
 
+import ast
+import glob
+import os.path as op
+
 import numpy as np
-import csv
+
+from .._utils import string_types, logger
+from .._parallel import parallel_func
+
+# Binary record files (see ExperimentController DATA_BINARY config) store
+# one fixed-size record per line, with values in a separate .val file
+_record_dtype = np.dtype([('time', '<f8'), ('code', '<u2'),
+                          ('offset', '<u8'), ('length', '<u4')])
+_DEFINE = 65535  # record defining the name (value) of the next event code
+_COMMENT = 65534  # record holding a comment (header) line
+
+
+def _read_records(fname):
+    """Read a binary record file
+
+    Returns the data records, the event type names (indexed by code), the
+    comment lines, and the bytes of the value file.
+    """
+    records = np.fromfile(fname, _record_dtype)
+    with open(op.splitext(fname)[0] + '.val', 'rb') as fid:
+        values = fid.read()
+
+    def _decode(record):
+        start = int(record['offset'])
+        return values[start:start + int(record['length'])].decode('utf-8')
+
+    codes = records['code']
+    names = [_decode(r) for r in records[codes == _DEFINE]]
+    comments = [_decode(r) for r in records[codes == _COMMENT]]
+    records = records[codes < _COMMENT]
+    return records, names, comments, values
+
+
+def _read_events(fname):
+    """Tokenize a .tab (or .rec) file in one pass"""
+    if fname.endswith('.rec'):
+        records, names, comments, values = _read_records(fname)
+        starts = records['offset'].astype(np.int64)
+        stops = starts + records['length'].astype(np.int64)
+
+        def get_values(idx):
+            return [values[starts[ii]:stops[ii]].decode('utf-8')
+                    for ii in idx]
+        info = _parse_info(comments[0] if comments else '')
+        return _Events(records['time'], records['code'].astype(np.intp),
+                       names, get_values, info)
+    with open(fname, 'r') as fid:
+        text = fid.read()
+    # first two lines are headers
+    lines = text.split('\n', 2)
+    assert lines[0][:1] == '#' and '\t' not in lines[0]
+    assert lines[1].split('\t') == ['timestamp', 'event', 'value']
+    body = lines[2] if len(lines) > 2 else ''
+    # values are sanitized, so each line has exactly two tabs
+    tokens = body.rstrip('\n').replace('\n', '\t').split('\t')
+    if body.strip() == '':
+        tokens = []
+    if len(tokens) % 3 != 0:
+        raise RuntimeError('Malformed data lines in {0}'.format(fname))
+    names, codes = np.unique(tokens[1::3], return_inverse=True)
+    values = tokens[2::3]
+    return _Events(np.array(tokens[0::3], float), codes.astype(np.intp),
+                   [str(name) for name in names],
+                   lambda idx: [values[ii] for ii in idx],
+                   _parse_info(lines[0]))
+
+
+def _parse_info(line):
+    """Parse the experiment info from a '# {...}' header line"""
+    try:
+        info = ast.literal_eval(line[1:].strip())
+    except (ValueError, SyntaxError):
+        info = None
+    return info if isinstance(info, dict) else dict()
+
+
+class _Events(object):
+    """Timestamps, event type codes, and values of a data file
+
+    Parameters
+    ----------
+    times : ndarray of float
+        The timestamps.
+    codes : ndarray of int
+        The index of the event type (in ``names``) of each event.
+    names : list of str
+        The event type names.
+    get_values : callable
+        Function taking event indices and returning their values.
+    info : dict | None
+        The experiment info from the file header.
+    """
+    def __init__(self, times, codes, names, get_values, info=None):
+        self.times = times
+        self.codes = codes
+        self.names = names
+        self.get_values = get_values
+        self.info = dict() if info is None else info
+        # per-event-type index: positions of each event type, in order
+        order = np.argsort(codes, kind='mergesort')
+        counts = np.bincount(codes, minlength=len(names))
+        self.index = dict((name, idx) for name, idx in
+                          zip(names, np.split(order, np.cumsum(counts)[:-1]))
+                          if len(idx))
+
+    def bounds(self, group_start, group_end):
+        """Get the start and (exclusive) stop index of each trial"""
+        if group_start not in self.index:
+            raise ValueError('group_start "{0}" not in header: {1}'
+                             ''.format(group_start, sorted(self.index)))
+        if group_end == group_start:
+            raise ValueError('group_start cannot equal group_end, use '
+                             'group_end=None')
+        b1s = self.index[group_start]
+        if group_end is None:
+            b2s = np.concatenate((b1s[1:], [len(self.codes)]))
+        else:  # group_end is not None
+            if group_end not in self.index:
+                raise ValueError('group_end "{0}" not in header ({1})'
+                                 ''.format(group_end, sorted(self.index)))
+            b2s = self.index[group_end]
+        if len(b1s) != len(b2s) or not np.all(b1s < b2s):
+            raise RuntimeError('bad bounds:\n{0}\n{1}'.format(b1s, b2s))
+        if group_end is not None:
+            b2s = b2s + 1  # include the end
+        return b1s, b2s
+
+    def header(self, group_start, group_end, event_types):
+        """Get the sorted event types, group_start first, group_end last"""
+        header = sorted(self.index)
+        if event_types is not None:
+            header = [key for key in header if key in event_types or
+                      key in (group_start, group_end)]
+        header = [header.pop(header.index(group_start))] + header
+        if group_end is not None:
+            header.append(header.pop(header.index(group_end)))
+        return header
+
+
+def _check_event_types(event_types):
+    if event_types is not None:
+        if isinstance(event_types, string_types):
+            event_types = [event_types]
+        event_types = set(event_types)
+    return event_types
+
+
+def iter_tab(fname, group_start='trial_id', group_end='trial_ok',
+             event_types=None):
+    """Iterate over the trials of a .tab file from expyfun output
+
+    Parameters
+    ----------
+    fname : str
+        Input filename. Can also be a ``.rec`` binary record file, which
+        is written next to the ``.tab`` file when the ``DATA_BINARY``
+        config variable is ``'true'`` and loads much faster.
+    group_start : str
+        Key to use to start a trial/row.
+    group_end : str | None
+        Key to use to end a trial/row. If None, the next ``group_start``
+        will end the current group.
+    event_types : list of str | None
+        Event types to include (``group_start`` and ``group_end`` are
+        always included). If None, all event types are included.
+
+    Returns
+    -------
+    trials : generator of dict
+        Generator yielding a dict for each trial. Each value in the dict
+        is a list of tuples (event, time) for each occurrence of that
+        key.
+
+    See Also
+    --------
+    read_tab
+    read_tab_columns
+
+    Notes
+    -----
+    The file is read and checked at once, but the trials are only built
+    as they are iterated over.
+    """
+    event_types = _check_event_types(event_types)
+    events = _read_events(fname)
+    header = events.header(group_start, group_end, event_types)
+    b1s, b2s = events.bounds(group_start, group_end)
+    return _iter_trials(events, header, b1s, b2s)
 
 
-def read_tab(fname, group_start='trial_id', group_end='trial_ok'):
+def _iter_trials(events, header, b1s, b2s):
+    # locate each trial's events of each type at once
+    los, his = dict(), dict()
+    for key in header:
+        idx = events.index[key]
+        los[key] = np.searchsorted(idx, b1s)
+        his[key] = np.searchsorted(idx, b2s)
+    for ti in range(len(b1s)):
+        d = dict()
+        for key in header:
+            idx = events.index[key][los[key][ti]:his[key][ti]]
+            d[key] = list(zip(events.get_values(idx),
+                              events.times[idx].tolist()))
+        yield d
+
+
+def read_tab(fname, group_start='trial_id', group_end='trial_ok',
+             event_types=None):
     """Read .tab file from expyfun output
 
     Parameters
     ----------
     fname : str
-        Input filename.
+        Input filename. Can also be a ``.rec`` binary record file, which
+        is written next to the ``.tab`` file when the ``DATA_BINARY``
+        config variable is ``'true'`` and loads much faster.
     group_start : str
         Key to use to start a trial/row.
     group_end : str | None
         Key to use to end a trial/row. If None, the next ``group_start``
         will end the current group.
+    event_types : list of str | None
+        Event types to include (``group_start`` and ``group_end`` are
+        always included). If None, all event types are included.
 
     Returns
     -------
@@ -25,51 +238,198 @@ def read_tab(fname, group_start='trial_id', group_end='trial_ok'):
         The data, with a dict for each trial. Each value in the dict
         is a list of tuples (event, time) for each occurrence of that
         key.
+
+    See Also
+    --------
+    iter_tab
+    read_tab_columns
     """
-    # load everything into memory for ease of use
-    with open(fname, 'r') as f:
-        csvr = csv.reader(f, delimiter='\t')
-        lines = [c for c in csvr]
+    return list(iter_tab(fname, group_start, group_end, event_types))
 
-    # first two lines are headers
-    assert (len(lines[0]) == 1 and lines[0][0][0] == '#')
-    #metadata = ast.literal_eval(lines[0][0][2:])
-    assert lines[1] == ['timestamp', 'event', 'value']
-    lines = lines[2:]
-
-    # determine the event fields
-    header = list(set([l[1] for l in lines]))
-    header.sort()
-    if group_start not in header:
-        raise ValueError('group_start "{0}" not in header: {1}'
-                         ''.format(group_start, header))
-    if group_end == group_start:
-        raise ValueError('group_start cannot equal group_end, use '
-                         'group_end=None')
-    header = [header.pop(header.index(group_start))] + header
-    b1s = np.where([line[1] == group_start for line in lines])[0]
-    if group_end is None:
-        b2s = np.concatenate((b1s[1:], [len(lines)]))
-    else:  # group_end is not None
-        if group_end not in header:
-            raise ValueError('group_end "{0}" not in header ({1})'
-                             ''.format(group_end, header))
-        header.append(header.pop(header.index(group_end)))
-        b2s = np.where([line[1] == group_end for line in lines])[0]
-    if len(b1s) != len(b2s) or not np.all(b1s < b2s):
-        raise RuntimeError('bad bounds:\n{0}\n{1}'.format(b1s, b2s))
-    data = []
-    for b1, b2 in zip(b1s, b2s):
-        assert lines[b1][1] == group_start  # prevent stupidity
-        if group_end is not None:
-            b2 = b2 + 1  # include the end
-            assert lines[b2 - 1][1] == group_end
-        d = dict()
-        these_times = [float(line[0]) for line in lines[b1:b2]]
-        these_keys = [line[1] for line in lines[b1:b2]]
-        these_vals = [line[2] for line in lines[b1:b2]]
-        for ki, key in enumerate(header):
-            idx = np.where(key == np.array(these_keys))[0]
-            d[key] = [(these_vals[ii], these_times[ii]) for ii in idx]
-        data.append(d)
+
+def read_tab_columns(fname, group_start='trial_id', group_end='trial_ok',
+                     event_types=None, return_pandas=False):
+    """Read the events of a .tab file from expyfun output as columns
+
+    Parameters
+    ----------
+    fname : str
+        Input filename. Can also be a ``.rec`` binary record file, which
+        is written next to the ``.tab`` file when the ``DATA_BINARY``
+        config variable is ``'true'`` and loads much faster.
+    group_start : str
+        Key to use to start a trial/row.
+    group_end : str | None
+        Key to use to end a trial/row. If None, the next ``group_start``
+        will end the current group.
+    event_types : list of str | None
+        Event types to include. If None, all event types are included.
+    return_pandas : bool
+        If True, return a ``pandas.DataFrame`` instead of a dict.
+
+    Returns
+    -------
+    columns : dict | instance of pandas.DataFrame
+        The ``timestamp`` (float), ``event`` (str), ``value`` (str), and
+        ``trial`` (int) of each event, in file order. ``trial`` is the
+        index of the trial containing the event (as grouped by
+        `read_tab`), or -1 for events outside of trials.
+
+    See Also
+    --------
+    iter_tab
+    read_tab
+    """
+    columns = _events_columns(_read_events(fname), group_start, group_end,
+                              _check_event_types(event_types))
+    if return_pandas:
+        columns = _to_pandas(columns, _column_names)
+    return columns
+
+
+_column_names = ['timestamp', 'event', 'value', 'trial']
+
+
+def _to_pandas(columns, names):
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError('pandas is required for return_pandas=True')
+    return pd.DataFrame(columns, columns=names)
+
+
+def _events_columns(events, group_start, group_end, event_types):
+    """Get the columns of the (selected) events"""
+    b1s, b2s = events.bounds(group_start, group_end)
+    # trial of each event
+    n_events = len(events.codes)
+    change = np.zeros(n_events + 1, int)
+    np.add.at(change, b1s, np.arange(1, len(b1s) + 1))
+    np.add.at(change, b2s, -np.arange(1, len(b2s) + 1))
+    trial = np.cumsum(change[:-1]) - 1
+    if event_types is None:
+        idx = np.arange(n_events)
+    else:
+        keep = [ii for ii, name in enumerate(events.names)
+                if name in event_types]
+        idx = np.where(np.in1d(events.codes, keep))[0]
+    names = np.array(events.names + [''])  # str dtype even if empty
+    columns = dict(timestamp=events.times[idx],
+                   event=names[events.codes[idx]],
+                   value=np.array(events.get_values(idx), object),
+                   trial=trial[idx])
+    return columns
+
+
+def _load_events(fname, cache):
+    """Read the events of a file (or load them from its cache)"""
+    fname = op.abspath(fname)
+    key = [fname, str(op.getsize(fname)), repr(op.getmtime(fname))]
+    if fname.endswith('.rec'):  # the values are in the .val file
+        val_fname = op.splitext(fname)[0] + '.val'
+        key += [str(op.getsize(val_fname)), repr(op.getmtime(val_fname))]
+    key = np.array(key)
+    cache_fname = fname + '.npz'
+    if cache and op.isfile(cache_fname):
+        try:
+            npz = np.load(cache_fname)
+            try:
+                if np.array_equal(npz['key'], key):
+                    values = str(npz['values']).split('\n')
+                    return dict(times=npz['times'], codes=npz['codes'],
+                                names=[str(name) for name in npz['names']],
+                                values=values if len(npz['times']) else [],
+                                info=_parse_info('#' + str(npz['info'])))
+            finally:
+                npz.close()
+        except Exception as exp:
+            logger.warning('Could not load cache {0}: {1}'
+                           ''.format(cache_fname, exp))
+    events = _read_events(fname)
+    data = dict(times=events.times, codes=events.codes, names=events.names,
+                values=events.get_values(range(len(events.codes))),
+                info=events.info)
+    if cache:
+        # values are sanitized, so they cannot contain newlines
+        try:
+            np.savez(cache_fname, key=key, times=data['times'],
+                     codes=data['codes'], names=np.array(data['names'], str),
+                     values=np.array('\n'.join(data['values'])),
+                     info=np.array(repr(data['info'])))
+        except (IOError, OSError) as exp:
+            logger.warning('Could not write cache {0}: {1}'
+                           ''.format(cache_fname, exp))
     return data
+
+
+def read_tabs(fnames, group_start='trial_id', group_end='trial_ok',
+              event_types=None, n_jobs=1, cache=True, return_pandas=False):
+    """Read the events of many .tab files from expyfun output as columns
+
+    Parameters
+    ----------
+    fnames : str | list of str
+        A glob pattern (e.g., ``'data/*.tab'``) or a list of filenames.
+        Files can also be ``.rec`` binary record files.
+    group_start : str
+        Key to use to start a trial/row.
+    group_end : str | None
+        Key to use to end a trial/row. If None, the next ``group_start``
+        will end the current group.
+    event_types : list of str | None
+        Event types to include. If None, all event types are included.
+    n_jobs : int
+        Number of files to parse in parallel (requires joblib if not 1).
+    cache : bool
+        If True, the parsed contents of each file are saved next to it
+        (with ``.npz`` appended to its name) and reused while the path,
+        size, and modification time of the file are unchanged.
+    return_pandas : bool
+        If True, return a ``pandas.DataFrame`` instead of a dict.
+
+    Returns
+    -------
+    columns : dict | instance of pandas.DataFrame
+        The columns returned by `read_tab_columns` for all files, with the
+        ``participant`` and ``session`` (from the header of each file) and
+        the ``fname`` of each event added. ``trial`` is counted from zero
+        within each file.
+
+    See Also
+    --------
+    read_tab
+    read_tab_columns
+    """
+    if isinstance(fnames, string_types):
+        pattern, fnames = fnames, sorted(glob.glob(fnames))
+        if len(fnames) == 0:
+            raise IOError('No files found matching "{0}"'.format(pattern))
+    if len(fnames) == 0:
+        raise ValueError('fnames must not be empty')
+    event_types = _check_event_types(event_types)
+    parallel, p_fun, _ = parallel_func(_load_events, n_jobs)
+    loaded = parallel(p_fun(fname, cache) for fname in fnames)
+    names = _column_names + ['participant', 'session', 'fname']
+    all_columns = dict((name, list()) for name in names)
+    for fname, data in zip(fnames, loaded):
+        values = data['values']
+        events = _Events(data['times'], data['codes'], data['names'],
+                         lambda idx, values=values: [values[ii]
+                                                     for ii in idx],
+                         data['info'])
+        columns = _events_columns(events, group_start, group_end,
+                                  event_types)
+        columns['participant'] = str(events.info.get('participant', ''))
+        columns['session'] = str(events.info.get('session', ''))
+        columns['fname'] = fname
+        n_events = len(columns['timestamp'])
+        for name in names:
+            value = columns[name]
+            if name in ('participant', 'session', 'fname'):
+                value = np.repeat([value], n_events)
+            all_columns[name].append(value)
+    columns = dict((name, np.concatenate(all_columns[name]))
+                   for name in names)
+    if return_pandas:
+        columns = _to_pandas(columns, names)
+    return columns
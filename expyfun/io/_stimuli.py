@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Stimulus library loading functions
+"""
+
+import glob
+import hashlib
+import json
+import os
+import os.path as op
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from ._wav import read_wav
+from .._utils import verbose_dec, logger
+from .._parallel import parallel_func
+
+_CACHE_MAGIC = b'EXPYSTIM'
+_CACHE_VERSION = 1
+_CACHE_ALIGN = 64  # bytes
+
+
+def _hash_file(fname, block_size=1 << 20):
+    """Get the SHA1 hash of the contents of a file"""
+    sha1 = hashlib.sha1()
+    with open(fname, 'rb') as fid:
+        block = fid.read(block_size)
+        while block:
+            sha1.update(block)
+            block = fid.read(block_size)
+    return sha1.hexdigest()
+
+
+def _process_stimulus(fname, fs, window_dur, rms):
+    """Read a WAV file and apply the preprocessing chain to it"""
+    from ..stimuli import resample, window_edges
+    data, file_fs = read_wav(fname, verbose=False)
+    if fs is not None and fs != file_fs:
+        data = resample(data, fs, file_fs)
+        file_fs = fs
+    if window_dur is not None:
+        data = window_edges(data, file_fs, window_dur)
+    if rms is not None:
+        data_rms = np.sqrt(np.mean(data * data))
+        if data_rms > 0:
+            data *= rms / data_rms
+        else:
+            logger.warning('Cannot normalize the RMS of silent stimulus {0}'
+                           ''.format(fname))
+    return data.astype(np.float32), file_fs
+
+
+def _read_cache(fname):
+    """Read the header and a memory map of the samples of a cache file"""
+    with open(fname, 'rb') as fid:
+        if fid.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+            raise IOError('not a stimulus cache file')
+        n_header = struct.unpack('<Q', fid.read(8))[0]
+        header = json.loads(fid.read(n_header).decode('utf-8'))
+    n_samples = sum(n_ch * n for n_ch, n in header['shapes'])
+    samples = np.memmap(fname, '<f4', 'r', header['data_offset'],
+                        (n_samples,)) if n_samples else np.zeros(0, '<f4')
+    return header, samples
+
+
+def _write_cache(fname, key, fs, names, stims):
+    """Write processed stimuli to a cache file (replacing it at the end)"""
+    shapes = [list(stim.shape) for stim in stims]
+    # the header holds the data offset, so size it with the widest offset
+    header = dict(version=_CACHE_VERSION, key=key, fs=fs, names=names,
+                  shapes=shapes, data_offset=10 ** 12)
+    n_header = len(json.dumps(header).encode('utf-8'))
+    data_offset = len(_CACHE_MAGIC) + 8 + n_header
+    data_offset += -data_offset % _CACHE_ALIGN
+    header['data_offset'] = data_offset
+    header = json.dumps(header).encode('utf-8')
+    header += b' ' * (n_header - len(header))
+    tmp_fname = fname + '.tmp'
+    try:
+        with open(tmp_fname, 'wb') as fid:
+            fid.write(_CACHE_MAGIC + struct.pack('<Q', n_header) + header)
+            fid.write(b'\x00' * (data_offset - fid.tell()))
+            for stim in stims:
+                stim.astype('<f4').tofile(fid)
+        _replace_file(tmp_fname, fname)
+    finally:
+        if op.isfile(tmp_fname):
+            os.remove(tmp_fname)
+
+
+def _replace_file(src, dst):
+    """Atomically replace a file (where the OS and Python allow it)"""
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:  # Python 2
+        if op.isfile(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def _split_cache(header, samples):
+    """Get the stimuli of a cache as views of its samples"""
+    stims = OrderedDict()
+    offset = 0
+    for name, (n_ch, n) in zip(header['names'], header['shapes']):
+        stims[name] = samples[offset:offset + n_ch * n].reshape(n_ch, n)
+        offset += n_ch * n
+    return stims
+
+
+@verbose_dec
+def read_stimuli(path, fs=None, window_dur=None, rms=None, pattern='*.wav',
+                 n_jobs=1, cache=True, verbose=None):
+    """Read and preprocess a directory of WAV files
+
+    Parameters
+    ----------
+    path : str
+        The directory containing the WAV files.
+    fs : float | None
+        The sample rate to resample the stimuli to (requires mne-python).
+        If None, the stimuli are not resampled and must all have the same
+        sample rate.
+    window_dur : float | None
+        If not None, the duration (in seconds) of the window applied to each
+        edge of the stimuli with `expyfun.stimuli.window_edges`.
+    rms : float | None
+        If not None, scale each stimulus to have this RMS (computed across
+        all of its channels) after windowing.
+    pattern : str
+        The glob pattern of the files to load within ``path``.
+    n_jobs : int
+        Number of files to read and process in parallel (requires joblib).
+    cache : bool | str
+        If True, the processed stimuli are stored in the file
+        ``expyfun_stimuli.cache`` in ``path`` (a str gives another file
+        name) and loaded from it as long as the contents of the files and
+        the preprocessing parameters are unchanged.
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see expyfun.verbose).
+
+    Returns
+    -------
+    stimuli : OrderedDict
+        The float32 stimuli (each n_channels x n_samples), keyed by their
+        file names relative to ``path`` without extension, in sorted order.
+        When cached, these are read-only views of the memory-mapped cache.
+    fs : float
+        The sample rate of the stimuli.
+
+    See Also
+    --------
+    read_wav
+    """
+    fnames = sorted(glob.glob(op.join(path, pattern)))
+    if len(fnames) == 0:
+        raise IOError('No files found matching "{0}" in {1}'
+                      ''.format(pattern, path))
+    names = [op.splitext(op.relpath(fname, path))[0] for fname in fnames]
+    if cache is True:
+        cache = op.join(path, 'expyfun_stimuli.cache')
+    fs, window_dur, rms = [None if val is None else float(val)
+                           for val in (fs, window_dur, rms)]
+    chain = dict(fs=fs, window_dur=window_dur, rms=rms)
+    if cache:
+        key = dict(sources=[[name, _hash_file(fname)]
+                            for name, fname in zip(names, fnames)],
+                   chain=chain)
+        if op.isfile(cache):
+            try:
+                header, samples = _read_cache(cache)
+                if header['version'] == _CACHE_VERSION and \
+                        header['key'] == key:
+                    logger.info('Loaded {0} stimuli from cache {1}'
+                                ''.format(len(names), cache))
+                    return _split_cache(header, samples), header['fs']
+            except Exception as exp:
+                logger.warning('Could not load cache {0}: {1}'
+                               ''.format(cache, exp))
+    parallel, p_fun, _ = parallel_func(_process_stimulus, n_jobs)
+    processed = parallel(p_fun(fname, fs, window_dur, rms)
+                         for fname in fnames)
+    stims = [stim for stim, _ in processed]
+    rates = sorted(set(stim_fs for _, stim_fs in processed))
+    if len(rates) != 1:
+        raise ValueError('Stimuli have different sample rates {0}, fs must '
+                         'be given to resample them'.format(rates))
+    out_fs = rates[0]
+    logger.info('Processed {0} stimuli from {1}'.format(len(names), path))
+    if cache:
+        try:
+            _write_cache(cache, key, out_fs, names, stims)
+            return _split_cache(*_read_cache(cache)), out_fs
+        except (IOError, OSError) as exp:
+            logger.warning('Could not write cache {0}: {1}'
+                           ''.format(cache, exp))
+    return OrderedDict(zip(names, stims)), out_fs
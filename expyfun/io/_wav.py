@@ -5,36 +5,79 @@
 import numpy as np
 from scipy.io import wavfile
 from os import path as op
+import struct
 import warnings
 
 from .._utils import verbose_dec, logger, _has_scipy_version
 
 
 @verbose_dec
-def read_wav(fname, verbose=None):
+def read_wav(fname, start=None, stop=None, channels=None, dtype=np.float64,
+             mmap=False, verbose=None):
     """Read in a WAV file
 
     Parameters
     ----------
     fname : str
         Filename to load.
+    start : int | None
+        First sample to read. None (default) reads from the beginning.
+    stop : int | None
+        Sample to stop reading at (exclusive). None (default) reads to
+        the end.
+    channels : list of int | int | None
+        Channels to read. None (default) reads all channels.
+    dtype : numpy dtype
+        The floating point output dtype, typically np.float64 (default)
+        or np.float32.
+    mmap : bool
+        If True, memory-map the file so that only the requested samples
+        and channels are read from disk. Requires scipy >= 0.12, and is
+        not supported for 24-bit files.
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see expyfun.verbose).
 
     Returns
     -------
     data : array
-        The WAV file data. Will be of datatype np.float64. If the data
+        The WAV file data. Will be of datatype `dtype`. If the data
         had been saved as integers (typical), this function will
         automatically rescale the data to be between -1 and +1.
         The result will have dimension n_channels x n_samples.
     fs : int
         The wav sample rate
+
+    Notes
+    -----
+    The selected samples are scaled and converted to `dtype` in a single
+    pass directly into the (C-contiguous) output array.
     """
-    fs, data = wavfile.read(fname)
-    data = np.atleast_2d(data.T)
-    orig_dtype = data.dtype
-    max_val = _get_dtype_norm(orig_dtype)
-    data = np.ascontiguousarray(data.astype(np.float64) / max_val)
-    _print_wav_info('Read', data, orig_dtype)
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise TypeError('dtype must be a floating point type, got {0}'
+                        ''.format(dtype))
+    kwargs = dict()
+    if mmap:
+        if not _has_scipy_version('0.12'):
+            raise RuntimeError('mmap=True requires scipy >= 0.12')
+        kwargs['mmap'] = True
+    fs, raw = wavfile.read(fname, **kwargs)
+    raw = raw.reshape(len(raw), -1)  # n_samples x n_channels (a view)
+    orig_dtype = raw.dtype
+    start, stop, _ = slice(start, stop).indices(len(raw))
+    raw = raw[start:max(start, stop)]
+    if channels is not None:
+        channels = np.atleast_1d(np.array(channels, int))
+        if channels.ndim != 1 or np.any(channels >= raw.shape[1]) or \
+                np.any(channels < -raw.shape[1]):
+            raise ValueError('channels must be a list of channel indices '
+                             'less than {0}'.format(raw.shape[1]))
+        raw = raw[:, channels]
+    data = np.empty(raw.shape[::-1], dtype)
+    np.true_divide(raw.T, _get_dtype_norm(orig_dtype), out=data,
+                   casting='unsafe')
+    del raw  # release the memory map
+    _print_wav_info('Read', data.shape[0], data.shape[1], orig_dtype)
     return data, fs
 
 
@@ -54,38 +97,172 @@ def write_wav(fname, data, fs, dtype=np.int16, overwrite=False, verbose=None):
         The output format to use. np.int16 is standard for many wav files,
         but np.float32 or np.float64 has higher dynamic range.
     """
-    if not overwrite and op.isfile(fname):
-        raise IOError('File {} exists, overwrite=True must be '
-                      'used'.format(op.basename(fname)))
-    if not np.dtype(type(fs)).kind == 'i':
-        fs = int(fs)
-        warnings.warn('Warning: sampling rate is being cast to integer and '
-                      'may be truncated.')
     data = np.atleast_2d(data)
-    if np.dtype(dtype).kind not in ['i', 'f']:
-        raise TypeError('dtype must be integer or float')
+    data = data.reshape(-1, data.shape[-1])  # n_channels x n_samples
     if np.dtype(dtype).kind == 'f':
         if not _has_scipy_version('0.13'):
             raise RuntimeError('cannot write float datatype unless '
                                'scipy >= 0.13 is installed')
-    elif np.dtype(dtype).itemsize == 8:
-        raise RuntimeError('Writing 64-bit integers is not supported')
     if np.dtype(data.dtype).kind == 'f':
         if np.dtype(dtype).kind == 'i' and np.max(np.abs(data)) > 1.:
             raise ValueError('Data must be between -1 and +1 when saving '
                              'with an integer dtype')
-    _print_wav_info('Writing', data, data.dtype)
-    max_val = _get_dtype_norm(dtype)
-    data = (data * max_val).astype(dtype)
-    wavfile.write(fname, fs, data.T)
+    with WavWriter(fname, fs, data.shape[0], dtype, overwrite) as writer:
+        writer.write(data)
+
+
+class WavWriter(object):
+    """Write a WAV file block by block
+
+    Parameters
+    ----------
+    fname : str
+        Filename to save as.
+    fs : int
+        The sample rate of the data.
+    n_channels : int
+        The number of channels.
+    dtype : numpy dtype
+        The output format to use. np.int16 is standard for many wav files,
+        but np.float32 or np.float64 has higher dynamic range.
+    overwrite : bool
+        If True, overwrite the file if it exists.
+    block_size : int
+        Maximum number of samples converted at once, which bounds the
+        temporary memory used by :meth:`write`.
+    verbose : bool, str, int, or None
+        If not None, override default verbose level (see expyfun.verbose).
+
+    Notes
+    -----
+    Use as a context manager (or call :meth:`close`) so that the sizes in
+    the RIFF header are filled in once all blocks have been written::
+
+        >>> with WavWriter('out.wav', 44100, 2) as writer:  # doctest:+SKIP
+        ...     for block in blocks:
+        ...         writer.write(block)
+
+    With an integer ``dtype``, samples outside of -1 and +1 are clipped,
+    and a warning reports how many were.
+
+    WAV files are limited to 4 GiB of data (RF64 is not supported), and
+    :meth:`write` raises an error before writing a block that would exceed
+    this limit, so that the file written so far remains valid.
+    """
+    def __init__(self, fname, fs, n_channels, dtype=np.int16,
+                 overwrite=False, block_size=65536, verbose=None):
+        if not overwrite and op.isfile(fname):
+            raise IOError('File {} exists, overwrite=True must be '
+                          'used'.format(op.basename(fname)))
+        if not np.dtype(type(fs)).kind == 'i':
+            fs = int(fs)
+            warnings.warn('Warning: sampling rate is being cast to integer '
+                          'and may be truncated.')
+        dtype = np.dtype(dtype)
+        if dtype.kind not in ['i', 'f']:
+            raise TypeError('dtype must be integer or float')
+        if dtype.kind == 'i' and dtype.itemsize == 8:
+            raise RuntimeError('Writing 64-bit integers is not supported')
+        if int(n_channels) < 1:
+            raise ValueError('n_channels must be at least 1, got {0}'
+                             ''.format(n_channels))
+        self.fname = fname
+        self.fs = fs
+        self.n_channels = int(n_channels)
+        self.dtype = dtype
+        self.n_samples = 0
+        self.verbose = verbose
+        self._block_size = int(block_size)
+        self._max_val = _get_dtype_norm(dtype)
+        self._file_dtype = dtype.newbyteorder('<')
+        self._n_clipped = 0
+        self._fid = open(fname, 'wb')
+        header_size = self._write_header()
+        # the RIFF size (everything after its own field) must fit 32 bits
+        max_data_size = 2 ** 32 - 1 - (header_size - 8) - 1  # - pad byte
+        self._max_samples = max_data_size // (self.n_channels *
+                                              dtype.itemsize)
+
+    @property
+    def closed(self):
+        return self._fid.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def _write_header(self):
+        """Write the header, with sizes as of the samples written so far"""
+        block_align = self.n_channels * self.dtype.itemsize
+        data_size = self.n_samples * block_align
+        fmt = struct.pack('<HHIIHH', 3 if self.dtype.kind == 'f' else 1,
+                          self.n_channels, self.fs, self.fs * block_align,
+                          block_align, 8 * self.dtype.itemsize)
+        chunks = b''
+        if self.dtype.kind == 'f':  # non-PCM: extension size and fact chunk
+            fmt += struct.pack('<H', 0)
+            chunks = b'fact' + struct.pack('<II', 4, self.n_samples)
+        chunks = (b'fmt ' + struct.pack('<I', len(fmt)) + fmt + chunks +
+                  b'data' + struct.pack('<I', data_size))
+        riff_size = 4 + len(chunks) + data_size + data_size % 2
+        header = b'RIFF' + struct.pack('<I', riff_size) + b'WAVE' + chunks
+        self._fid.seek(0)
+        self._fid.write(header)
+        return len(header)
+
+    def write(self, data):
+        """Append a block of samples
+
+        Parameters
+        ----------
+        data : array, shape (n_channels, n_samples)
+            The samples to write, between -1 and +1 for integer formats.
+            One-dimensional arrays are treated as a single channel.
+        """
+        if self.closed:
+            raise RuntimeError('Cannot write to a closed WavWriter')
+        data = np.atleast_2d(data)
+        if data.ndim != 2 or data.shape[0] != self.n_channels:
+            raise ValueError('data must have shape ({0}, n_samples), got {1}'
+                             ''.format(self.n_channels, data.shape))
+        if self.n_samples + data.shape[1] > self._max_samples:
+            raise RuntimeError('Cannot write {0} more samples to {1}: WAV '
+                               'files are limited to 4 GiB ({2} samples), '
+                               'and RF64 is not supported'
+                               ''.format(data.shape[1], self.fname,
+                                         self._max_samples))
+        for start in range(0, data.shape[1], self._block_size):
+            block = data[:, start:start + self._block_size].T * self._max_val
+            if self.dtype.kind == 'i':
+                over = np.abs(block) > self._max_val
+                if over.any():
+                    self._n_clipped += np.count_nonzero(over)
+                    np.clip(block, -self._max_val, self._max_val, out=block)
+            block.astype(self._file_dtype).tofile(self._fid)
+        self.n_samples += data.shape[1]
+
+    @verbose_dec
+    def close(self):
+        """Fill in the header sizes and close the file"""
+        if self.closed:
+            return
+        if (self.n_samples * self.n_channels * self.dtype.itemsize) % 2:
+            self._fid.write(b'\x00')  # chunks are padded to even sizes
+        self._write_header()
+        self._fid.close()
+        if self._n_clipped > 0:
+            warnings.warn('{0} samples were outside of -1 and +1 and have '
+                          'been clipped'.format(self._n_clipped))
+        _print_wav_info('Wrote', self.n_channels, self.n_samples, self.dtype)
 
 
-def _print_wav_info(pre, data, dtype):
+def _print_wav_info(pre, n_channels, n_samples, dtype):
     """Helper to print WAV info"""
     logger.info('{0} WAV file with {1} channel{3} and {2} samples '
-                '(format {4})'.format(pre, data.shape[0], data.shape[1],
-                                      's' if data.shape[0] != 1 else '',
-                                      dtype))
+                '(format {4})'.format(pre, n_channels, n_samples,
+                                      's' if n_channels != 1 else '', dtype))
 
 
 def _get_dtype_norm(dtype):
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from nose.tools import assert_equal, assert_raises, assert_true
+from numpy.testing import assert_array_equal
+from os import path as op
+import warnings
+
+from expyfun._utils import _TempDir, requires_h5py
+from expyfun._externals._h5io import _chunk_shape
+from expyfun.io import read_hdf5, write_hdf5
+
+warnings.simplefilter('always')
+tempdir = _TempDir()
+
+
+@requires_h5py
+def test_hdf5_partial_lazy():
+    """Test partial and lazy HDF5 reads
+    """
+    fname = op.join(tempdir, 'test.hdf5')
+    data = dict(brir=np.random.rand(10, 2, 100), fs=44100, name=u'foo',
+                sub=dict(x=np.arange(5), y=[1, 2]))
+    write_hdf5(fname, data)
+    data_read = read_hdf5(fname, keys=['fs', 'sub'])
+    assert_equal(sorted(data_read.keys()), ['fs', 'sub'])
+    assert_equal(data_read['fs'], 44100)
+    assert_array_equal(data_read['sub']['x'], np.arange(5))
+    assert_equal(list(read_hdf5(fname, keys='name').keys()), ['name'])
+    assert_raises(KeyError, read_hdf5, fname, keys=['foo'])
+    with read_hdf5(fname, lazy=True) as lazy:
+        assert_equal(sorted(lazy), sorted(data))
+        assert_equal(len(lazy), 4)
+        assert_equal(lazy['name'], u'foo')
+        assert_equal(lazy['brir'].shape, (10, 2, 100))
+        assert_array_equal(lazy['brir'][3, :, :10], data['brir'][3, :, :10])
+        assert_array_equal(np.array(lazy['brir']), data['brir'])
+        assert_array_equal(lazy['sub']['x'][1:3], [1, 2])
+        assert_equal(lazy['sub']['y'], [1, 2])
+        assert_raises(KeyError, lazy.__getitem__, 'foo')
+        assert_true('fs' in repr(lazy))
+    lazy = read_hdf5(fname, keys=['brir'], lazy=True)
+    assert_equal(list(lazy), ['brir'])
+    assert_raises(KeyError, lazy.__getitem__, 'fs')
+    assert_array_equal(lazy.load()['brir'], data['brir'])
+    lazy.close()
+    # only dicts can be read partially
+    write_hdf5(fname, [1, 2], overwrite=True)
+    assert_raises(TypeError, read_hdf5, fname, lazy=True)
+    assert_equal(read_hdf5(fname), [1, 2])
+
+
+@requires_h5py
+def test_hdf5_compression():
+    """Test HDF5 compression options
+    """
+    import h5py
+    fname = op.join(tempdir, 'test_comp.hdf5')
+    data = dict(big=np.random.rand(100, 2, 50), small=np.arange(10.))
+    for kwargs, comp in ((dict(), None), (dict(compression=0), None),
+                         (dict(compress_arrays=True), 'gzip'),
+                         (dict(compression='lzf'), 'lzf'),
+                         (dict(compression=1, shuffle=True, chunks=1000),
+                          'gzip')):
+        if comp is not None:
+            kwargs.update(compress_arrays=True, min_compress_size=4096)
+        write_hdf5(fname, data, overwrite=True, **kwargs)
+        data_read = read_hdf5(fname)
+        for key in data:
+            assert_array_equal(data_read[key], data[key])
+        with h5py.File(fname, 'r') as fid:
+            big = fid['expyfun/key_big']
+            assert_true(fid['expyfun/key_small'].compression is None)
+            if comp is None:
+                assert_true(big.compression is None)
+            else:
+                assert_equal(big.compression, comp)
+            assert_equal(big.shuffle, kwargs.get('shuffle', False))
+            if 'chunks' in kwargs:
+                assert_equal(big.chunks, (1, 2, 50))
+    # strings are still compressed by default, as they always were
+    write_hdf5(fname, 'x' * 10000, overwrite=True)
+    with h5py.File(fname, 'r') as fid:
+        assert_equal(fid['expyfun'].compression, 'gzip')
+    # empty data are stored unchunked
+    data = dict(name=u'', empty=np.zeros((0, 10)), empty_2=np.zeros((3, 0)))
+    for kwargs in (dict(), dict(chunks=2 ** 20, compress_arrays=True)):
+        write_hdf5(fname, data, overwrite=True, **kwargs)
+        data_read = read_hdf5(fname)
+        assert_equal(data_read['name'], u'')
+        for key in ('empty', 'empty_2'):
+            assert_array_equal(data_read[key], data[key])
+    assert_raises(ValueError, write_hdf5, fname, data, overwrite=True,
+                  compression='foo')
+    assert_raises(ValueError, write_hdf5, fname, data, overwrite=True,
+                  chunks=0)
+    assert_equal(_chunk_shape((100, 2, 50), 8, 1000), (1, 2, 50))
+    assert_equal(_chunk_shape((100, 2, 50), 8, 400), (1, 1, 50))
+    assert_equal(_chunk_shape((100, 2, 50), 8, 100), (1, 1, 12))
+    assert_equal(_chunk_shape((100, 2, 50), 8, 10 ** 6), (100, 2, 50))
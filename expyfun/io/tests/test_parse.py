@@ -1,9 +1,13 @@
 import warnings
-from nose.tools import assert_equal, assert_in, assert_raises
+import os
+import os.path as op
+import numpy as np
+from nose.tools import assert_equal, assert_in, assert_raises, assert_true
 
 from expyfun import ExperimentController
-from expyfun.io import read_tab
-from expyfun._utils import _TempDir, _hide_window
+from expyfun.io import read_tab, iter_tab, read_tab_columns, read_tabs
+from expyfun._utils import _TempDir, _hide_window, requires_pandas
+from expyfun._data_writer import _DataWriter
 
 warnings.simplefilter('always')
 
@@ -46,3 +50,77 @@ def test_parse():
     data = read_tab(ec.data_fname, group_end=None)
     assert_equal(len(data[0]['misc']), 2)  # includes between-trials stuff
     assert_equal(len(data[1]['misc']), 2)
+    # filtering and iterating
+    data = read_tab(ec.data_fname, event_types=['misc'])
+    assert_equal(list(data[0].keys()), ['trial_id', 'misc', 'trial_ok'])
+    assert_equal(data[1]['misc'][0][0], 'trial two')
+    trials = iter_tab(ec.data_fname)
+    assert_equal(next(trials), read_tab(ec.data_fname)[0])
+    # columns
+    columns = read_tab_columns(ec.data_fname, event_types='misc')
+    assert_equal(list(columns['value']), ['trial one', 'between trials',
+                                          'trial two', 'end of experiment'])
+    assert_equal(list(columns['trial']), [0, -1, 1, -1])
+    columns = read_tab_columns(ec.data_fname, group_end=None)
+    assert_true(np.all(np.diff(columns['timestamp']) >= 0))
+    assert_equal(columns['trial'][-1], 1)
+
+
+@requires_pandas
+@_hide_window
+def test_parse_pandas():
+    """Test .tab parsing to pandas
+    """
+    with ExperimentController(*std_args, stim_fs=44100, **std_kwargs) as ec:
+        ec.identify_trial(ec_id='one', ttl_id=[0])
+        ec.start_stimulus()
+        ec.stop()
+        ec.trial_ok()
+    df = read_tab_columns(ec.data_fname, return_pandas=True)
+    assert_equal(list(df.columns), ['timestamp', 'event', 'value', 'trial'])
+    assert_equal(df['trial'].max(), 0)
+
+
+def _write_tab(fname, participant, n_trials):
+    with open(fname, 'w') as fid:
+        fid.write("# {{'participant': '{0}', 'session': '01'}}\n"
+                  "timestamp\tevent\tvalue\n".format(participant))
+        for ti in range(n_trials):
+            for event in ('trial_id', 'flip', 'trial_ok'):
+                fid.write('{0}\t{1}\t{2}\n'.format(ti, event, ti))
+
+
+def test_read_tabs():
+    """Test reading many .tab files
+    """
+    tempdir = _TempDir()
+    for pi, n_trials in enumerate((2, 3)):
+        _write_tab(op.join(tempdir, 'p{0}.tab'.format(pi)), pi, n_trials)
+    assert_raises(IOError, read_tabs, op.join(tempdir, '*.foo'))
+    assert_raises(ValueError, read_tabs, [])
+    for cache in (False, True, True):  # uncached, write cache, read cache
+        columns = read_tabs(op.join(tempdir, '*.tab'), cache=cache)
+        assert_equal(list(columns['participant']), ['0'] * 6 + ['1'] * 9)
+        assert_equal(list(columns['trial']), [0] * 3 + [1] * 3 +
+                     [0] * 3 + [1] * 3 + [2] * 3)
+        assert_equal(columns['value'][-1], '2')
+    assert_true(op.isfile(op.join(tempdir, 'p0.tab.npz')))
+    _write_tab(op.join(tempdir, 'p0.tab'), 'foo', 1)  # cache is stale
+    columns = read_tabs([op.join(tempdir, 'p0.tab')], event_types='flip')
+    assert_equal(list(columns['participant']), ['foo'])
+    assert_equal(list(columns['session']), ['01'])
+    # record files also depend on their value files
+    fname = op.join(tempdir, 'p2.tab')
+    writer = _DataWriter(fname, binary=True)
+    writer.write((0., 'trial_id', 'aaa'))
+    writer.close()
+    fname = op.join(tempdir, 'p2.rec')
+    assert_equal(list(read_tabs([fname], group_end=None)['value']), ['aaa'])
+    val_fname = op.join(tempdir, 'p2.val')
+    with open(val_fname, 'rb') as fid:
+        values = fid.read()
+    with open(val_fname, 'wb') as fid:
+        fid.write(values.replace(b'aaa', b'bbb'))
+    mtime = op.getmtime(val_fname) + 10
+    os.utime(val_fname, (mtime, mtime))
+    assert_equal(list(read_tabs([fname], group_end=None)['value']), ['bbb'])
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from nose.tools import assert_equal, assert_raises, assert_true
+from numpy.testing import assert_allclose, assert_array_equal
+import os
+from os import path as op
+import warnings
+
+from expyfun._utils import _TempDir, requires_joblib
+from expyfun.io import read_stimuli, write_wav
+from expyfun.io._stimuli import _write_cache
+
+warnings.simplefilter('always')
+
+
+def _write_stimuli(path, fs=44100):
+    """Write some stimuli to read back"""
+    rng = np.random.RandomState(0)
+    data = dict(a=rng.rand(1, 1000) - 0.5, b=rng.rand(2, 500) - 0.5)
+    for name, stim in data.items():
+        write_wav(op.join(path, name + '.wav'), stim, fs, dtype=np.float32,
+                  overwrite=True)
+    return data
+
+
+def test_read_stimuli():
+    """Test reading and caching stimulus libraries
+    """
+    tempdir = _TempDir()
+    data = _write_stimuli(tempdir)
+    assert_raises(IOError, read_stimuli, tempdir, pattern='*.foo')
+    stims, fs = read_stimuli(tempdir, cache=False)
+    assert_equal(fs, 44100)
+    assert_equal(list(stims.keys()), ['a', 'b'])
+    for name in stims:
+        assert_equal(stims[name].dtype, np.float32)
+        assert_allclose(stims[name], data[name], rtol=1e-6)
+    assert_true(not op.isfile(op.join(tempdir, 'expyfun_stimuli.cache')))
+    # processing, then loading from the cache
+    kwargs = dict(window_dur=0.001, rms=0.01)
+    stims, fs = read_stimuli(tempdir, **kwargs)
+    cache = op.join(tempdir, 'expyfun_stimuli.cache')
+    assert_true(op.isfile(cache))
+    for name in stims:
+        assert_true(isinstance(stims[name], np.memmap))
+        assert_allclose(np.sqrt(np.mean(stims[name] ** 2)), 0.01, rtol=1e-5)
+        assert_array_equal(stims[name][:, 0], 0)
+    mtime = op.getmtime(cache)
+    stims_2, fs_2 = read_stimuli(tempdir, **kwargs)
+    assert_equal(fs_2, fs)
+    assert_equal(op.getmtime(cache), mtime)
+    for name in stims:
+        assert_array_equal(stims_2[name], stims[name])
+    # changed parameters or files invalidate the cache
+    stims = read_stimuli(tempdir, rms=0.1)[0]
+    assert_allclose(np.sqrt(np.mean(stims['a'] ** 2)), 0.1, rtol=1e-5)
+    write_wav(op.join(tempdir, 'a.wav'), data['b'], fs, dtype=np.float32,
+              overwrite=True)
+    stims = read_stimuli(tempdir, rms=0.1)[0]
+    assert_equal(stims['a'].shape, (2, 500))
+    # corrupt caches are rebuilt
+    with open(cache, 'wb') as fid:
+        fid.write(b'foo')
+    stims = read_stimuli(tempdir, rms=0.1)[0]
+    assert_equal(stims['a'].shape, (2, 500))
+    # failed writes keep the old cache and leave no temporary file
+    assert_raises(AttributeError, _write_cache, cache, dict(), 44100.,
+                  ['a', 'b'], [stims['a'], None])
+    assert_true(not op.isfile(cache + '.tmp'))
+    assert_array_equal(read_stimuli(tempdir, rms=0.1)[0]['a'], stims['a'])
+    # mixed rates need resampling
+    os.remove(op.join(tempdir, 'a.wav'))
+    write_wav(op.join(tempdir, 'c.wav'), data['a'], 22050, overwrite=True)
+    assert_raises(ValueError, read_stimuli, tempdir, cache=False)
+
+
+@requires_joblib
+def test_read_stimuli_parallel():
+    """Test reading stimulus libraries in parallel
+    """
+    tempdir = _TempDir()
+    _write_stimuli(tempdir)
+    stims = read_stimuli(tempdir, cache=False)[0]
+    stims_2 = read_stimuli(tempdir, n_jobs=2, cache=False)[0]
+    for name in stims:
+        assert_array_equal(stims_2[name], stims[name])
@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from nose.tools import assert_equal, assert_raises
+from nose.tools import assert_equal, assert_raises, assert_true
 from numpy.testing import assert_array_almost_equal, assert_array_equal
 from os import path as op
 import warnings
 
 from expyfun._utils import _TempDir, _has_scipy_version
-from expyfun.io import read_wav, write_wav
+from expyfun.io import read_wav, write_wav, WavWriter
 
 warnings.simplefilter('always')
 tempdir = _TempDir()
@@ -69,3 +69,73 @@ def test_read_write_wav():
 
     # Make sure our bound check works
     assert_raises(ValueError, write_wav, fname, data * 2, fs, overwrite=True)
+
+
+def test_read_wav_partial():
+    """Test reading parts of WAV files
+    """
+    fname = op.join(tempdir, 'temp_partial.wav')
+    data = np.random.rand(3, 1000) * 2 - 1
+    fs = 44100
+    write_wav(fname, data, fs, overwrite=True)
+    full, _ = read_wav(fname)
+    assert_true(full.flags['C_CONTIGUOUS'])
+    for mmap in (False, True):
+        data_read, fs_read = read_wav(fname, start=100, stop=200,
+                                      channels=[2, 0], mmap=mmap)
+        assert_equal(fs_read, fs)
+        assert_true(data_read.flags['C_CONTIGUOUS'])
+        assert_array_equal(data_read, full[[2, 0], 100:200])
+        data_read = read_wav(fname, start=-10, channels=1, dtype=np.float32,
+                             mmap=mmap)[0]
+        assert_equal(data_read.dtype, np.float32)
+        assert_array_equal(data_read, full[[1], -10:].astype(np.float32))
+    assert_equal(read_wav(fname, start=500, stop=100)[0].shape, (3, 0))
+    assert_raises(TypeError, read_wav, fname, dtype=np.int16)
+    assert_raises(ValueError, read_wav, fname, channels=[3])
+
+
+def test_wav_writer():
+    """Test writing WAV files block by block
+    """
+    fname = op.join(tempdir, 'temp_stream.wav')
+    data = np.random.rand(2, 1001) * 2 - 1
+    fs = 44100
+    dtypes = [np.int16, np.int32]
+    if _has_scipy_version('0.13'):
+        dtypes += [np.float32, np.float64]
+    for dtype in dtypes:
+        with WavWriter(fname, fs, 2, dtype, overwrite=True,
+                       block_size=100) as writer:
+            writer.write(data[:, :500])
+            writer.write(data[:, 500:])
+        assert_true(writer.closed)
+        assert_equal(writer.n_samples, 1001)
+        data_read, fs_read = read_wav(fname)
+        assert_equal(fs_read, fs)
+        assert_array_almost_equal(data, data_read, 4)
+        write_wav(fname, data, fs, dtype=dtype, overwrite=True)
+        assert_array_equal(read_wav(fname)[0], data_read)
+    assert_raises(RuntimeError, writer.write, data)
+    # odd number of bytes, clipping
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        with WavWriter(fname, fs, 1, overwrite=True) as writer:
+            assert_raises(ValueError, writer.write, data)
+            writer.write(np.array([0.5, 2., -2.]))
+        assert_equal(len(w), 1)
+    assert_array_almost_equal(read_wav(fname)[0], [[0.5, 1., -1.]], 4)
+    # the 32-bit RIFF sizes limit the file size
+    with WavWriter(fname, fs, 2, np.float32, overwrite=True) as writer:
+        writer.write(data[:, :10])
+        n_samples = writer.n_samples
+        writer.n_samples = writer._max_samples - 7  # pretend to be large
+        assert_true(writer._max_samples * 8 > 2 ** 32 - 100)
+        assert_raises(RuntimeError, writer.write, data[:, :10])
+        writer.write(data[:, :5])  # still fits
+        writer.n_samples = n_samples + 5
+    assert_array_almost_equal(read_wav(fname)[0],
+                              np.c_[data[:, :10], data[:, :5]], 6)
+    assert_raises(IOError, WavWriter, fname, fs, 1)
+    assert_raises(TypeError, WavWriter, fname, fs, 1, 'S1', overwrite=True)
+    assert_raises(ValueError, WavWriter, fname, fs, 0, overwrite=True)
@@ -0,0 +1,50 @@
+import numpy as np
+import warnings
+from nose.tools import assert_equal, assert_true
+from numpy.testing import assert_allclose
+
+from expyfun._clock_sync import _ClockModel, _ClockSync
+
+warnings.simplefilter('always')
+
+
+def test_clock_model():
+    """Test robust fitting of device clock offset and drift"""
+    rng = np.random.RandomState(0)
+    model = _ClockModel('test', max_residual=1e-3, min_span=10.)
+    device = np.arange(100.)
+    master = 5. + device * (1 + 20e-6) + 1e-5 * rng.randn(len(device))
+    master[::10] += 5e-3  # slow queries
+    with warnings.catch_warnings(record=True):
+        residuals = [model.add_sample(d, m) for d, m in zip(device, master)]
+    assert_equal(residuals[0], 0.)
+    assert_true(np.abs(residuals[50]) > 1e-3)
+    assert_allclose(model.drift, 20e-6, atol=2e-6)
+    assert_allclose(model([0., 50.]), [5., 50.001 + 5.], atol=1e-4)
+    # before the minimum span is reached, only the offset is fitted
+    model = _ClockModel('test', min_span=10.)
+    model.add_sample(0., 2.)
+    model.add_sample(1., 3.1)
+    assert_equal(model.drift, 0.)
+    assert_allclose(model(1.), 3.05)
+
+
+def test_clock_sync():
+    """Test periodic sampling of device clocks"""
+    times = [0.]
+    sync = _ClockSync(lambda: times[0], interval=1.)
+    model = sync.add_clock('test', lambda: times[0] - 2.)
+    assert_true(sync['test'] is model)
+    assert_equal(model._samples.n_total, 1)
+    times[0] = 0.5
+    sync.sample()
+    assert_equal(model._samples.n_total, 1)
+    times[0] = 1.5
+    sync.sample()
+    assert_equal(model._samples.n_total, 2)
+    assert_allclose(model(0.), 2.)
+    # clocks without timebases are not sampled
+    sync.add_clock('test')
+    times[0] = 3.
+    sync.sample()
+    assert_equal(sync['test']._samples.n_total, 0)
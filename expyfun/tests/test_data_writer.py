@@ -0,0 +1,75 @@
+import os.path as op
+import threading
+import warnings
+from nose.tools import assert_equal, assert_raises, assert_true
+
+from expyfun._utils import _TempDir
+from expyfun._data_writer import _DataWriter
+from expyfun.io import read_tab
+from expyfun.io._parse import _read_records
+
+warnings.simplefilter('always')
+
+
+def test_data_writer():
+    """Test background data writing"""
+    tempdir = _TempDir()
+    fname = op.join(tempdir, 'data.tab')
+    writer = _DataWriter(fname, max_pending=3)
+    value = dict(a=1)
+    writer.write('# header\n')
+    writer.write((0.5, 'foo', 'bar\tbar'))
+    writer.write((1, 'dict', value))
+    value['b'] = 2  # lines keep the value they were written with
+    writer.flush()
+    writer.close()
+    assert_true(writer.closed)
+    writer.close()  # no-op
+    with open(fname) as fid:
+        lines = fid.readlines()
+    assert_equal(lines, ['# header\n', '0.5\tfoo\tbar\\tbar\n',
+                         "1\tdict\t{'a': 1}\n"])
+    # fail fast when the writer falls behind
+    writer = _DataWriter(fname, flush_interval=10., max_pending=2)
+    release = threading.Event()
+    write_pending = writer._write_pending
+    writer._write_pending = lambda: release.wait() and write_pending()
+    writer.write('foo\n')
+    writer.write('bar\n')
+    assert_raises(RuntimeError, writer.write, 'baz\n')
+    release.set()
+    writer.close()
+    # errors in the writer thread are raised
+    writer = _DataWriter(fname, flush_interval=10.)
+    writer._fid.close()
+    writer.write('foo\n')
+    assert_raises(RuntimeError, writer.close)
+    assert_raises(RuntimeError, writer.write, 'bar\n')
+
+
+def test_record_writer():
+    """Test binary record files"""
+    tempdir = _TempDir()
+    fname = op.join(tempdir, 'data.tab')
+    for ii in range(2):  # second time appends with the same codes
+        writer = _DataWriter(fname, binary=True)
+        if ii == 0:
+            writer.write("# {'participant': 'foo'}\n")
+            writer.write(('timestamp', 'event', 'value'))
+        for time in range(3):
+            writer.write((10 * ii + time, 'trial_id', 'id\t{0}'.format(time)))
+            writer.write((10 * ii + time + 0.25, 'flip', None))
+            writer.write((10 * ii + time + 0.5, 'trial_ok', dict(a=ii)))
+        writer.write((10 * ii + 4, 'trial_id', 'extra'))
+        writer.write((10 * ii + 5, 'trial_ok' if ii else 'misc', None))
+        writer.close()
+    records, names, comments, _ = _read_records(op.join(tempdir, 'data.rec'))
+    assert_equal(names, ['trial_id', 'flip', 'trial_ok', 'misc'])
+    assert_equal(comments, ["# {'participant': 'foo'}"])
+    assert_equal(len(records), 22)
+    data = read_tab(fname, group_end=None)
+    assert_equal(read_tab(op.join(tempdir, 'data.rec'), group_end=None),
+                 data)
+    assert_equal(len(data), 8)
+    assert_equal(data[0]['trial_id'], [('id\\t0', 0.)])
+    assert_equal(data[3]['misc'], [('None', 5.)])
@@ -185,6 +185,9 @@ def test_ec(ac=None, rd=None):
         stamp = ec.current_time
         ec.write_data_line('hello')
         ec.wait_until(stamp + 0.02)
+        timing = ec.get_wait_timing()
+        assert_true(timing['n_waits'] >= 1)
+        assert_true(timing['error_max'] >= 0)
         ec.screen_prompt('test', 0.01, 0, None)
         ec.screen_prompt('test', 0.01, 0, ['1'])
         ec.screen_prompt(['test', 'ing'], 0.01, 0, ['1'])
@@ -216,6 +219,9 @@ def test_ec(ac=None, rd=None):
         ec.stamp_triggers(3, check='int4')
         ec.stamp_triggers(2)
         ec.stamp_triggers([2, 4, 8])
+        timing = ec.get_trigger_timing(write=True)
+        assert_true(timing['n_stamped'] >= 5)
+        assert_true(timing['latency_max'] >= timing['latency_mean'])
         assert_raises(ValueError, ec.load_buffer, np.zeros((100, 3)))
         assert_raises(ValueError, ec.load_buffer, np.zeros((3, 100)))
         assert_raises(ValueError, ec.load_buffer, np.zeros((1, 1, 1)))
@@ -283,6 +289,23 @@ def test_ec(ac=None, rd=None):
 
         ec.flip(-np.inf)
         ec.estimate_screen_fs()
+        timing = ec.get_frame_timing(per_trial=True)
+        assert_true(timing['interval'] > 0)
+        assert_true(timing['n_flips'] >= 10)
+        assert_true(timing['n_dropped'] >= 0)
+        assert_true(len(timing['trials']) >= 2)
+        assert_equal(timing['flip_strategy'], 'conservative')
+        assert_raises(ValueError, ec.set_flip_strategy, 'foo')
+        for strategy in ('fence', 'vsync'):
+            try:
+                ec.set_flip_strategy(strategy)
+            except RuntimeError:  # fence sync objects not supported
+                continue
+            ec.flip()
+            timing = ec.get_frame_timing()
+            assert_equal(timing['flip_strategy'], strategy)
+            assert_true(timing['flip_duration_max'] >= 0)
+        ec.set_flip_strategy('conservative')
         ec.play()
         ec.call_on_every_flip(None)
         ec.call_on_next_flip(ec.start_noise())
@@ -351,6 +374,23 @@ def test_mouse_clicks():
         assert_equal(ec.wait_for_click_on(rect, 1.5, timestamp=False)[0],
                      ('left', 1, 2))
         assert_raises(TypeError, ec.wait_for_click_on, (rect, rect), 1.5)
+        circ = visual.Circle(ec, 1, units='pix', pos=[1, 2])
+        fake_mouse_click(ec, [1, 2], delay=0.3)
+        out = ec.wait_for_click_on([circ, rect], 1.5, timestamp=False)
+        assert_equal(out, (('left', 1, 2), 0))
+        assert_raises(RuntimeError, ec.get_mouse_trajectory)
+        ec.start_mouse_capture()
+        for pos in ([1, 2], [3, 4]):
+            ec._mouse_handler._on_pyglet_mouse_motion(pos[0], pos[1], 1, 1)
+        ec.stop_mouse_capture()
+        ec._mouse_handler._on_pyglet_mouse_motion(5, 6, 1, 1)  # ignored
+        times, pos = ec.get_mouse_trajectory(save=True)
+        assert_equal(len(times), 2)
+        assert_true(np.all(np.diff(times) >= 0))
+        assert_allclose(pos, [[1, 2], [3, 4]])
+        pos_norm = ec.get_mouse_trajectory('norm')[1]
+        assert_allclose(pos_norm[0],
+                        ec._convert_units([[1], [2]], 'pix', 'norm')[:, 0])
         fake_mouse_click(ec, [2, 1], 'middle', delay=0.3)
         out = ec.wait_one_click(1.5, 0., ['middle'], timestamp=True)
         assert_true(out[3] < 1.5)
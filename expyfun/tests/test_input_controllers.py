@@ -0,0 +1,87 @@
+import time
+import numpy as np
+from nose.tools import assert_equal, assert_true
+from numpy.testing import assert_allclose, assert_array_equal
+
+from expyfun._utils import clock
+from expyfun._clock_sync import _ClockModel
+from expyfun._input_controllers import _CedrusReader, _points_in_tris
+
+
+class _FakeCedrus(object):
+    """Fake pyxid response device with a drifting millisecond timer"""
+    def __init__(self, rate):
+        self.rate = rate
+        self.t0 = clock()
+        self.pending = list()
+        self.response_queue = list()
+
+    def query_base_timer(self):
+        return int(round((clock() - self.t0) / self.rate))
+
+    def press(self, key):
+        self.pending.append(dict(pressed=True, key=key,
+                                 time=self.query_base_timer()))
+        self.pending.append(dict(pressed=False, key=key,
+                                 time=self.query_base_timer()))
+
+    def poll_for_response(self):
+        if self.pending:
+            self.response_queue.append(self.pending.pop(0))
+
+    def response_queue_size(self):
+        return len(self.response_queue)
+
+    def get_next_response(self):
+        return self.response_queue.pop(0)
+
+
+def test_cedrus_reader():
+    """Test threaded Cedrus reading"""
+    dev = _FakeCedrus(1.05e-3)
+    model = _ClockModel('keypress', max_residual=1., min_span=0.05)
+    reader = _CedrusReader(dev, model, clock, n_max=3, sync_interval=0.01)
+    try:
+        keys, times = reader.read()
+        assert_equal(len(keys), 0)
+        t0 = clock()
+        dev.press(1)
+        dev.press(4)
+        while len(dev.pending):
+            reader._stop.wait(0.01)
+        reader._stop.wait(0.3)  # let the drift be fitted
+        keys, times = reader.read()
+        assert_array_equal(keys, [1, 4])
+        assert_allclose(model(times), t0, atol=0.01)
+        assert_allclose(model.drift, 0.05, atol=0.01)
+        # overflowing the buffer drops the oldest presses
+        for key in range(5):
+            dev.press(key)
+        reader._stop.wait(0.1)
+        keys, _ = reader.read()
+        assert_array_equal(keys, [2, 3, 4])
+        # slow timer queries are not used to fit the clock
+        n_samples = model._samples.n_total
+        query = dev.query_base_timer
+        dev.query_base_timer = lambda: (time.sleep(0.01), query())[1]
+        reader._stop.wait(0.1)
+        assert_equal(model._samples.n_total, n_samples)
+        dev.query_base_timer = query
+        reader._stop.wait(0.1)
+        assert_true(model._samples.n_total > n_samples)
+    finally:
+        reader.close()
+    assert_true(not reader._thread.is_alive())
+
+
+def test_points_in_tris():
+    """Test vectorized point-in-triangle tests"""
+    points = np.array([[0., 0.], [2., 0.], [0., 2.], [2., 2.]])
+    tris = np.array([[0, 1, 2], [1, 3, 2]])
+    pos = [[0.5, 0.5], [1.5, 1.5], [3., 1.], [-0.5, 0.5], [1., 1.]]
+    # the last point lies on the shared edge, so is in neither triangle
+    assert_array_equal(_points_in_tris(pos, points, tris),
+                       [True, True, False, False, False])
+    assert_array_equal(_points_in_tris(pos, points, tris[::-1, ::-1]),
+                       [True, True, False, False, False])
+    assert_array_equal(_points_in_tris([0.5, 0.5], points, tris[1]), [False])
@@ -1,7 +1,11 @@
+import json
 import os
+from os import path as op
 import warnings
+from nose.tools import assert_equal, assert_true
 
-from expyfun._utils import _TempDir, _hide_window
+from expyfun._utils import (_TempDir, _hide_window, logger, set_log_file,
+                            flush_logger, _log_queue_handlers)
 from expyfun import ExperimentController
 
 warnings.simplefilter('always')
@@ -52,3 +56,36 @@ def test_logging_tdt():
     """Test logging to file (TDT)
     """
     test_logging('tdt')
+
+
+def test_log_file_threaded():
+    """Test threaded and JSON log files
+    """
+    tempdir = _TempDir()
+    fname = op.join(tempdir, 'test.log')
+    values = [1, 2]
+    try:
+        set_log_file(fname, output_format='json', overwrite=True,
+                     threaded=True)
+        logger.warning('Values %s, %s', values, 'foo')
+        logger.warning('Dict %(values)s', dict(values=values))
+        values.append(3)  # must not change the logged messages
+        logger.debug('Not logged %s', 'bar')
+        flush_logger()  # waits for the queue to be written
+        with open(fname) as fid:
+            assert_equal(len(fid.readlines()), 2)
+        set_log_file(fname, overwrite=False, threaded=True)
+        assert_equal(len(_log_queue_handlers), 1)
+        logger.warning('Plain %s', 'text')
+    finally:
+        set_log_file(None)
+    assert_equal(len(_log_queue_handlers), 0)
+    with open(fname) as fid:
+        lines = fid.readlines()
+    assert_equal(len(lines), 3)
+    record = json.loads(lines[0])
+    assert_equal(record['message'], 'Values [1, 2], foo')
+    assert_equal(record['level'], 'WARNING')
+    assert_true(isinstance(record['time'], float))
+    assert_equal(json.loads(lines[1])['message'], 'Dict [1, 2]')
+    assert_true(lines[2].strip().endswith('Plain text'))
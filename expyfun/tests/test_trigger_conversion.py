@@ -1,7 +1,9 @@
+import numpy as np
 from numpy.testing import assert_array_equal
-from nose.tools import assert_raises
+from nose.tools import assert_raises, assert_equal, assert_true
 
 from expyfun import decimals_to_binary, binary_to_decimals
+from expyfun._trigger_controllers import ParallelTrigger, TriggerTimer
 
 
 def test_conversion():
@@ -36,3 +38,29 @@ def test_conversion():
     for d, n, b in zip(decs, bits, bins):
         assert_array_equal(decimals_to_binary(d, n), b)
         assert_array_equal(binary_to_decimals(b, n), d)
+
+
+def test_trigger_timer():
+    """Test trigger timing recording
+    """
+    assert_raises(ValueError, TriggerTimer, n_max=0)
+    timer = TriggerTimer(n_max=3)
+    summary = timer.summary()
+    assert_equal(summary['n_stamped'], 0)
+    assert_true(np.isnan(summary['latency_mean']))
+    trig = ParallelTrigger('dummy')
+    trig.timer = timer
+    trig.stamp_triggers([1, 2], delay=0.01)
+    data = timer.data
+    assert_equal(data.shape, (2, 4))
+    assert_array_equal(data[:, 0], [1, 2])
+    assert_true(np.all(data[:, 3] >= data[:, 2]))
+    assert_true(np.all(data[:, 2] - data[:, 1] > -1e-3))
+    # ring buffer wraps, keeping the newest entries in order
+    trig.stamp_triggers([4, 8], delay=0.01)
+    data = timer.data
+    assert_array_equal(data[:, 0], [2, 4, 8])
+    summary = timer.summary()
+    assert_equal(summary['n_stamped'], 4)
+    assert_equal(summary['n_kept'], 3)
+    assert_true(summary['latency_max'] >= summary['latency_mean'])
@@ -1,8 +1,17 @@
 from nose.tools import assert_true, assert_raises, assert_equal
+import numpy as np
+from numpy.testing import assert_array_equal
 import os
+from os import path as op
+import re
 import warnings
 
-from expyfun._utils import get_config, set_config, deprecated, _fix_audio_dims
+from expyfun._utils import (get_config, set_config, deprecated,
+                            _fix_audio_dims, wait_secs, clock, _RingBuffer,
+                            _Scheduler, _FrameMonitor, _GrowBuffer,
+                            _wait_for_events, _TempDir)
+from expyfun._data_writer import _DataWriter
+from expyfun.io import read_tab
 
 warnings.simplefilter('always')
 
@@ -72,3 +81,111 @@ def test_audio_dims():
     assert_raises(ValueError, _fix_audio_dims, y1, 3)
     from numpy import zeros
     assert_raises(ValueError, _fix_audio_dims, zeros((2, 2, 2)))
+
+
+def test_wait_secs():
+    """Test that waiting is accurate without hogging the CPU"""
+    secs = 0.2
+    cpu_0, wall_0 = sum(os.times()[:2]), clock()
+    wait_secs(secs)
+    cpu, wall = sum(os.times()[:2]) - cpu_0, clock() - wall_0
+    assert_true(wall >= secs)
+    assert_true(cpu < 0.5 * wall)
+
+
+def test_ring_buffer():
+    """Test preallocated ring buffer"""
+    assert_raises(ValueError, _RingBuffer, 0, 2)
+    buf = _RingBuffer(3, 2)
+    assert_equal(buf.data.shape, (0, 2))
+    for ii in range(5):
+        buf.append((ii, -ii))
+    assert_equal(buf.n_total, 5)
+    assert_array_equal(buf.data[:, 0], [2, 3, 4])
+
+
+def test_grow_buffer():
+    """Test growable preallocated buffer"""
+    buf = _GrowBuffer(2, n_init=2)
+    assert_equal(buf.data.shape, (0, 2))
+    for ii in range(5):
+        buf.append((ii, -ii))
+    assert_equal(len(buf), 5)
+    assert_array_equal(buf.data[:, 1], [0, -1, -2, -3, -4])
+    buf.clear()
+    assert_equal(len(buf), 0)
+
+
+def test_scheduler():
+    """Test sleep/spin scheduling of waits"""
+    scheduler = _Scheduler(n_max=2)
+    assert_true(scheduler.spin >= scheduler.overshoot)
+    calls = list()
+    for _ in range(3):
+        error = scheduler.wait_until(clock() + 0.02,
+                                     lambda: calls.append(None))
+        assert_true(error >= 0)
+    assert_true(len(calls) >= 3)
+    summary = scheduler.summary()
+    assert_equal(summary['n_waits'], 3)
+    assert_true(summary['error_max'] >= summary['error_mean'] >= 0)
+    assert_true(np.isnan(_Scheduler().summary()['error_mean']))
+
+
+def test_wait_for_events():
+    """Test blocking for events outside of the spin window"""
+    import pyglet
+    loop = pyglet.app.platform_event_loop
+    steps = list()
+    orig_step, loop.step = loop.step, steps.append
+    try:
+        _wait_for_events(0.004, spin=0.005)  # within the spin window
+        assert_equal(steps, [])
+        _wait_for_events(0.0055, spin=0.005)
+        assert_equal(len(steps), 1)
+        assert_true(steps[0] <= 0.0005 + 1e-9)
+    finally:
+        loop.step = orig_step
+
+
+def test_frame_monitor():
+    """Test dropped frame detection"""
+    monitor = _FrameMonitor(n_max=100)
+    # back-to-back flips at 100 Hz estimate the interval
+    flips = 0.01 * np.arange(12)
+    for last, flip in zip(flips[:-1], flips[1:]):
+        assert_equal(monitor.add(last, flip), 0)
+    assert_true(np.allclose(monitor.interval, 0.01))
+    monitor.next_trial()
+    assert_equal(monitor.add(0.11, 0.12), 0)  # on time
+    assert_equal(monitor.add(0.12, 0.14), 1)  # one frame late
+    assert_equal(monitor.add(0.20, 0.2101), 0)  # requested after a pause
+    assert_equal(monitor.add(0.30, 0.3301), 2)
+    summary = monitor.summary(per_trial=True)
+    assert_equal(summary['n_flips'], 15)
+    assert_equal(summary['n_dropped'], 3)
+    assert_array_equal(summary['dropped_times'], [0.14, 0.3301])
+    assert_true(summary['interval_max'] >= 0.02)
+    assert_equal([t['n_dropped'] for t in summary['trials']], [0, 3])
+    assert_equal(_FrameMonitor(0.01).add(0., 0.02), 0)  # first flip
+
+
+def test_frame_monitor_write():
+    """Test writing the frame timing summary to a data file"""
+    monitor = _FrameMonitor(0.01, n_max=2000)
+    flips = 12.3456789 + 0.0300001 * np.arange(1500)  # each drops a frame
+    for last, flip in zip(flips[:-1], flips[1:]):
+        monitor.add(last, flip)
+    summary = monitor.summary()
+    assert_equal(len(summary['dropped_times']), 1498)
+    fname = op.join(_TempDir(), 'data.tab')
+    writer = _DataWriter(fname)
+    writer.write('# {}\n')
+    writer.write(('timestamp', 'event', 'value'))
+    writer.write((0., 'trial_id', 'x'))
+    writer.write((1., 'frame_timing', summary))
+    writer.close()
+    value = read_tab(fname, group_end=None)[0]['frame_timing'][0][0]
+    times = re.search(r"'dropped_times': \[([^]]*)\]", value).group(1)
+    assert_equal([float(t) for t in times.split(',')],
+                 summary['dropped_times'])
@@ -1,3 +1,4 @@
 from ._visual import (Text, Line, Triangle, Rectangle, Circle, RawImage,
                       Diamond, ConcentricCircles, FixationDot, _convert_color,
-                      _Triangular, Video)
+                      _Triangular, Video, DrawBatch, _TextCache,
+                      TextureImage, Grating, Gabor, NoisePatch)
@@ -10,9 +10,11 @@
 
 from ctypes import (cast, pointer, POINTER, create_string_buffer, c_char,
                     c_int, c_float)
+from collections import OrderedDict
 from functools import partial
 
 import warnings
+import weakref
 import numpy as np
 from matplotlib.colors import colorConverter
 
@@ -89,8 +91,7 @@ class Text(object):
                  width='auto', anchor_x='center', anchor_y='center',
                  units='norm', wrap=False, attr=True):
         import pyglet
-        pos = np.array(pos)[:, np.newaxis]
-        pos = ec._convert_units(pos, units, 'pix')
+        self._ec = ec
         if width == 'auto':
             width = float(ec.window_size_pix[0]) * 0.8
         elif isinstance(width, string_types):
@@ -112,10 +113,31 @@ class Text(object):
             self._text.color = _convert_color(color)
             self._text.font_name = font_name
             self._text.font_size = font_size
-        self._text.x = pos[0]
-        self._text.y = pos[1]
+        self._color = _convert_color(color)
         self._text.anchor_x = anchor_x
         self._text.anchor_y = anchor_y
+        self.set_pos(pos, units)
+
+    def set_pos(self, pos, units='norm'):
+        """Set the text position
+
+        Parameters
+        ----------
+        pos : array-like
+            2-element array-like with X, Y positions.
+        units : str
+            Units to use. See ``check_units`` for options.
+
+        Notes
+        -----
+        This moves the existing glyphs without laying out the text again.
+        """
+        pos = np.array(pos, float)
+        if pos.ndim != 1 or pos.size != 2:
+            raise ValueError('pos must be a 2-element array')
+        pos = self._ec._convert_units(pos[:, np.newaxis], units, 'pix')[:, 0]
+        self._text.x = pos[0]
+        self._text.y = pos[1]
 
     def set_color(self, color):
         """Set the text color
@@ -125,6 +147,7 @@ class Text(object):
         color : matplotlib Color | None
             The color. Use None for no color.
         """
+        self._color = _convert_color(color)
         if self._attr:
             self._text.document.set_style(0, len(self._text.document.text),
                                           {'color': _convert_color(color)})
@@ -136,6 +159,50 @@ class Text(object):
         self._text.draw()
 
 
+class _TextCache(object):
+    """Least-recently-used cache of laid out Text objects
+
+    Parameters
+    ----------
+    ec : instance of ExperimentController
+        Parent EC.
+    n_max : int
+        Maximum number of Text objects to keep.
+
+    Notes
+    -----
+    Cached objects are moved to the requested position with ``set_pos``.
+    Without attributed markup the color is also updated in place; with it,
+    the color is part of the markup, so it is part of the cache key.
+    """
+    def __init__(self, ec, n_max=32):
+        self._ec = ec
+        self.n_max = int(n_max)
+        self._texts = OrderedDict()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def get(self, text, pos=(0, 0), color='white', font_name='Arial',
+            font_size=24, width='auto', wrap=False, units='norm', attr=True):
+        """Get a Text object, laying it out only if it is not cached"""
+        gl_color = _convert_color(color)
+        key = (text, font_name, font_size, gl_color if attr else None, width,
+               wrap, attr)
+        obj = self._texts.pop(key, None)
+        if obj is None or (attr and obj._color != gl_color):
+            obj = Text(self._ec, text, pos, color, font_name, font_size,
+                       width=width, units=units, wrap=wrap, attr=attr)
+        else:
+            obj.set_pos(pos, units)
+            if obj._color != gl_color:
+                obj.set_color(color)
+        self._texts[key] = obj
+        while len(self._texts) > self.n_max:
+            self._texts.popitem(last=False)
+        return obj
+
+
 ##############################################################################
 # Triangulations
 
@@ -144,10 +211,12 @@ tri_vert = """
 
 attribute vec2 a_position;
 uniform mat4 u_view;
+uniform vec2 u_scale;
+uniform vec2 u_offset;
 
 void main()
 {
-    gl_Position = u_view * vec4(a_position, 0.0, 1.0);
+    gl_Position = u_view * vec4(a_position * u_scale + u_offset, 0.0, 1.0);
 }
 """
 
@@ -172,6 +241,98 @@ def _check_log(obj, func):
         raise RuntimeError(message)
 
 
+def _compile_shader(kind, source):
+    """Helper to compile a shader"""
+    from pyglet import gl
+    shader = gl.glCreateShader(kind)
+    buf = create_string_buffer(source.encode('ASCII'))
+    ptr = cast(pointer(pointer(buf)), POINTER(POINTER(c_char)))
+    gl.glShaderSource(shader, 1, ptr, None)
+    gl.glCompileShader(shader)
+    _check_log(shader, gl.glGetShaderInfoLog)
+    return shader
+
+
+class _Program(object):
+    """A linked shader program with cached attribute and uniform locations
+
+    Use ``_get_program`` to get a program shared within the current context.
+    """
+    def __init__(self, vert, frag):
+        from pyglet import gl
+        self.id = gl.glCreateProgram()
+        shaders = [_compile_shader(gl.GL_VERTEX_SHADER, vert),
+                   _compile_shader(gl.GL_FRAGMENT_SHADER, frag)]
+        for shader in shaders:
+            gl.glAttachShader(self.id, shader)
+        gl.glLinkProgram(self.id)
+        _check_log(self.id, gl.glGetProgramInfoLog)
+        for shader in shaders:  # the linked program keeps what it needs
+            gl.glDetachShader(self.id, shader)
+            gl.glDeleteShader(shader)
+        self._attribs = dict()
+        self._uniforms = dict()
+        self._view_size = None
+
+    def attrib(self, name):
+        """Get the (cached) location of an attribute"""
+        if name not in self._attribs:
+            from pyglet import gl
+            self._attribs[name] = gl.glGetAttribLocation(
+                self.id, name.encode('ASCII'))
+        return self._attribs[name]
+
+    def uniform(self, name):
+        """Get the (cached) location of a uniform"""
+        if name not in self._uniforms:
+            from pyglet import gl
+            self._uniforms[name] = gl.glGetUniformLocation(
+                self.id, name.encode('ASCII'))
+        return self._uniforms[name]
+
+    def set_view(self, size):
+        """Set the pixel-to-normalized view matrix for a window size"""
+        size = tuple(float(s) for s in size)
+        if size == self._view_size:
+            return
+        from pyglet import gl
+        view = np.diag([2. / size[0], 2. / size[1], 1., 1.])
+        view[-1, :2] = -1
+        view = view.astype(np.float32).ravel()
+        gl.glUseProgram(self.id)
+        gl.glUniformMatrix4fv(self.uniform('u_view'), 1, False,
+                              (c_float * 16)(*view))
+        gl.glUseProgram(0)
+        self._view_size = size
+
+
+# programs linked in each GL context, keyed by their shader sources
+_programs = weakref.WeakKeyDictionary()
+
+
+def _get_program(vert, frag):
+    """Get a program for the current GL context, linking it if necessary"""
+    from pyglet import gl
+    programs = _programs.setdefault(gl.current_context, dict())
+    if (vert, frag) not in programs:
+        programs[(vert, frag)] = _Program(vert, frag)
+    return programs[(vert, frag)]
+
+
+def _upload(target, data, nbytes):
+    """Upload data to the bound buffer, in place if the size is unchanged
+
+    Returns the new size of the buffer in bytes.
+    """
+    from pyglet import gl
+    if nbytes == data.nbytes:
+        gl.glBufferSubData(target, 0, data.nbytes, data.tostring())
+    else:
+        gl.glBufferData(target, data.nbytes, data.tostring(),
+                        gl.GL_DYNAMIC_DRAW)
+    return data.nbytes
+
+
 class _Triangular(object):
     """Super class for objects that use trianglulations and/or lines"""
     def __init__(self, ec, fill_color, line_color, line_width, line_loop):
@@ -179,44 +340,19 @@ class _Triangular(object):
         self._line_width = line_width
         self._line_loop = line_loop  # whether or not lines drawn are looped
 
-        # initialize program and shaders
+        # get the (shared) program and set up the view
         from pyglet import gl
-        self._program = gl.glCreateProgram()
-
-        vertex = gl.glCreateShader(gl.GL_VERTEX_SHADER)
-        buf = create_string_buffer(tri_vert.encode('ASCII'))
-        ptr = cast(pointer(pointer(buf)), POINTER(POINTER(c_char)))
-        gl.glShaderSource(vertex, 1, ptr, None)
-        gl.glCompileShader(vertex)
-        _check_log(vertex, gl.glGetShaderInfoLog)
-
-        fragment = gl.glCreateShader(gl.GL_FRAGMENT_SHADER)
-        buf = create_string_buffer(tri_frag.encode('ASCII'))
-        ptr = cast(pointer(pointer(buf)), POINTER(POINTER(c_char)))
-        gl.glShaderSource(fragment, 1, ptr, None)
-        gl.glCompileShader(fragment)
-        _check_log(fragment, gl.glGetShaderInfoLog)
-
-        gl.glAttachShader(self._program, vertex)
-        gl.glAttachShader(self._program, fragment)
-        gl.glLinkProgram(self._program)
-        _check_log(self._program, gl.glGetProgramInfoLog)
-
-        gl.glDetachShader(self._program, vertex)
-        gl.glDetachShader(self._program, fragment)
-        gl.glUseProgram(self._program)
-
-        # Prepare buffers and bind attributes
-        loc = gl.glGetUniformLocation(self._program, b'u_view')
-        view = ec.window_size_pix
-        view = np.diag([2. / view[0], 2. / view[1], 1., 1.])
-        view[-1, :2] = -1
-        view = view.astype(np.float32).ravel()
-        gl.glUniformMatrix4fv(loc, 1, False, (c_float * 16)(*view))
+        self._program = _get_program(tri_vert, tri_frag)
+        self._program.set_view(ec.window_size_pix)
+        self._context = gl.current_context
 
+        self._version = 0  # incremented on changes, used by DrawBatch
+        self._scale = np.ones(2, np.float32)  # transform applied to points
+        self._offset = np.zeros(2, np.float32)
         self._counts = dict()
         self._colors = dict()
         self._buffers = dict()
+        self._nbytes = dict()  # allocated buffer sizes
         self._points = dict()
         self._tris = dict()
         for kind in ('line', 'fill'):
@@ -226,11 +362,23 @@ class _Triangular(object):
             gl.glGenBuffers(1, pointer(self._buffers[kind]['array']))
         self._buffers['fill']['index'] = gl.GLuint()
         gl.glGenBuffers(1, pointer(self._buffers['fill']['index']))
-        gl.glUseProgram(0)
 
         self.set_fill_color(fill_color)
         self.set_line_color(line_color)
 
+    def __del__(self):
+        # buffers are freed along with a destroyed context, otherwise
+        # pyglet deletes them once the context is current again
+        try:
+            from pyglet import gl
+        except ImportError:  # interpreter shutdown
+            return
+        context = getattr(self, '_context', None)
+        if context is not None and gl.current_context is not None:
+            for buffers in self._buffers.values():
+                for buf in buffers.values():
+                    context.delete_buffer(buf.value)
+
     def _set_points(self, points, kind, tris):
         """Helper to set fill and line points"""
         from pyglet import gl
@@ -246,27 +394,36 @@ class _Triangular(object):
             assert tris.ndim == 1 and tris.size % 3 == 0
             tris.shape = (-1, 3)
             assert (tris < len(points)).all()
+            old_tris = self._tris.get(kind)
             self._tris[kind] = tris
             del tris
         self._points[kind] = points
+        self._version += 1
         del points
 
-        gl.glUseProgram(self._program)
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffers[kind]['array'])
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, self._points[kind].size * 4,
-                        self._points[kind].tostring(),
-                        gl.GL_STATIC_DRAW)
+        self._nbytes[kind] = _upload(gl.GL_ARRAY_BUFFER, self._points[kind],
+                                     self._nbytes.get(kind))
         if kind == 'line':
             self._counts[kind] = array_count
         if kind == 'fill':
             self._counts[kind] = self._tris[kind].size
-            gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER,
-                            self._buffers[kind]['index'])
-            gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER,
-                            self._tris[kind].size * 4,
-                            self._tris[kind].tostring(),
-                            gl.GL_STATIC_DRAW)
-        gl.glUseProgram(0)
+            if not np.array_equal(self._tris[kind], old_tris):
+                gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER,
+                                self._buffers[kind]['index'])
+                self._nbytes['index'] = _upload(
+                    gl.GL_ELEMENT_ARRAY_BUFFER, self._tris[kind],
+                    self._nbytes.get('index'))
+
+    def _set_transform(self, scale, offset):
+        """Set the scale and offset (in pixels) applied to the points"""
+        self._scale = np.array(scale, np.float32)
+        self._offset = np.array(offset, np.float32)
+        self._version += 1
+
+    def _get_points(self, kind):
+        """Get the transformed points (in pixels)"""
+        return self._points[kind] * self._scale + self._offset
 
     def _set_fill_points(self, points, tris):
         self._set_points(points, 'fill', tris)
@@ -283,6 +440,7 @@ class _Triangular(object):
             The fill color. Use None for no fill.
         """
         self._colors['fill'] = _convert_color(fill_color, byte=False)
+        self._version += 1
 
     def set_line_color(self, line_color):
         """Set the object color
@@ -293,6 +451,7 @@ class _Triangular(object):
             The fill color. Use None for no fill.
         """
         self._colors['line'] = _convert_color(line_color, byte=False)
+        self._version += 1
 
     def set_line_width(self, line_width):
         """Set the line width in pixels
@@ -307,11 +466,16 @@ class _Triangular(object):
         if not (0.0 <= line_width <= 10.0):
             raise ValueError('line_width must be between 0 and 10')
         self._line_width = line_width
+        self._version += 1
 
     def draw(self):
         """Draw the object to the display buffer"""
         from pyglet import gl
-        gl.glUseProgram(self._program)
+        gl.glUseProgram(self._program.id)
+        loc_pos = self._program.attrib('a_position')
+        loc_col = self._program.uniform('u_color')
+        gl.glUniform2f(self._program.uniform('u_scale'), *self._scale)
+        gl.glUniform2f(self._program.uniform('u_offset'), *self._offset)
         for kind in ('fill', 'line'):
             if self._counts[kind] > 0:
                 if kind == 'line':
@@ -330,11 +494,9 @@ class _Triangular(object):
                                   self._counts[kind], gl.GL_UNSIGNED_INT, 0)
                 gl.glBindBuffer(gl.GL_ARRAY_BUFFER,
                                 self._buffers[kind]['array'])
-                loc_pos = gl.glGetAttribLocation(self._program, b'a_position')
                 gl.glEnableVertexAttribArray(loc_pos)
                 gl.glVertexAttribPointer(loc_pos, 2, gl.GL_FLOAT, gl.GL_FALSE,
                                          0, 0)
-                loc_col = gl.glGetUniformLocation(self._program, b'u_color')
                 gl.glUniform4f(loc_col, *self._colors[kind])
                 cmd()
                 # The following line is probably only necessary because
@@ -565,6 +727,21 @@ class Diamond(_Triangular):
         self._set_line_points(points)
 
 
+_unit_circles = dict()
+
+
+def _unit_circle(n_edges):
+    """Get (cached) unit circle points (center first) and triangulation"""
+    if n_edges not in _unit_circles:
+        arg = 2 * np.pi * (np.arange(n_edges) / float(n_edges))
+        points = np.r_[[[0., 0.]], np.array([np.cos(arg), np.sin(arg)]).T]
+        tris = np.array([[0, ii + 1, ii + 2] for ii in range(n_edges)])
+        tris[-1, -1] = 1  # fix wrap for last triangle
+        _unit_circles[n_edges] = (np.ascontiguousarray(points, np.float32),
+                                  tris.ravel())
+    return _unit_circles[n_edges]
+
+
 class Circle(_Triangular):
     """A circle or ellipse
 
@@ -606,11 +783,11 @@ class Circle(_Triangular):
             raise ValueError('n_edges must be >= 4 for a reasonable circle')
         self._n_edges = n_edges
 
-        # construct triangulation (never changes so long as n_edges is fixed)
-        tris = [[0, ii + 1, ii + 2] for ii in range(n_edges)]
-        tris = np.concatenate(tris)
-        tris[-1] = 1  # fix wrap for last triangle
-        self._orig_tris = tris
+        # the unit circle is uploaded once, and positioned and scaled by
+        # the transform
+        points, tris = _unit_circle(n_edges)
+        self._set_fill_points(points, tris)
+        self._set_line_points(points[1:])  # omit center point for lines
 
         # need to set a dummy value here so recalculation doesn't fail
         self._radius = np.array([1., 1.])
@@ -663,16 +840,8 @@ class Circle(_Triangular):
         self._recalculate()
 
     def _recalculate(self):
-        """Helper to recalculate point coordinates"""
-        edges = self._n_edges
-        arg = 2 * np.pi * (np.arange(edges) / float(edges))
-        points = np.array([self._radius[0] * np.cos(arg),
-                           self._radius[1] * np.sin(arg)])
-        points = np.c_[np.zeros((2, 1)), points]  # prepend the center
-        points += np.array(self._pos[:2], dtype=float)[:, np.newaxis]
-        points = points.T
-        self._set_fill_points(points, self._orig_tris)
-        self._set_line_points(points[1:])  # omit center point for lines
+        """Helper to update the transform of the unit circle"""
+        self._set_transform(self._radius, self._pos[:2])
 
 
 class ConcentricCircles(object):
@@ -824,9 +993,197 @@ class FixationDot(ConcentricCircles):
         self.set_radius(1, 1, units='pix')
 
 
+##############################################################################
+# Batched drawing
+
+batch_vert = """
+#version 120
+
+attribute vec2 a_position;
+attribute vec4 a_color;
+uniform mat4 u_view;
+varying vec4 v_color;
+
+void main()
+{
+    gl_Position = u_view * vec4(a_position, 0.0, 1.0);
+    v_color = a_color;
+}
+"""
+
+batch_frag = """
+#version 120
+
+varying vec4 v_color;
+
+void main()
+{
+    gl_FragColor = v_color;
+}
+"""
+
+
+class DrawBatch(object):
+    """Draw many shapes using a few draw calls
+
+    Parameters
+    ----------
+    ec : instance of ExperimentController
+        Parent EC.
+    objects : list
+        Shapes (e.g., ``Circle``, ``Rectangle``, ``Line``, or
+        ``ConcentricCircles``) to draw.
+
+    Returns
+    -------
+    batch : instance of DrawBatch
+        The batch object.
+
+    Notes
+    -----
+    The geometry and colors of all shapes are packed into shared vertex
+    and index buffers. All fills are drawn with a single call, followed by
+    all lines (one call per distinct line width), so a shape's line is drawn
+    over later shapes' fills. Shapes can still be modified after being
+    added; the buffers are repacked on the next draw.
+    """
+    def __init__(self, ec, objects=()):
+        from pyglet import gl
+        self._ec = ec
+        self._program = _get_program(batch_vert, batch_frag)
+        self._program.set_view(ec.window_size_pix)
+        self._context = gl.current_context
+        self._buffers = dict(array=gl.GLuint(), index=gl.GLuint())
+        for buf in self._buffers.values():
+            gl.glGenBuffers(1, pointer(buf))
+        self._objects = list()
+        self._versions = None
+        self._n_fill = 0
+        self._lines = list()  # (line_width, first, count)
+        for obj in objects:
+            self.add(obj)
+
+    def __del__(self):
+        try:
+            from pyglet import gl
+        except ImportError:  # interpreter shutdown
+            return
+        context = getattr(self, '_context', None)
+        if context is not None and gl.current_context is not None:
+            for buf in self._buffers.values():
+                context.delete_buffer(buf.value)
+
+    def __len__(self):
+        return len(self._objects)
+
+    def add(self, obj):
+        """Add a shape to the batch
+
+        Parameters
+        ----------
+        obj : instance of _Triangular | instance of ConcentricCircles
+            The shape to add. It is drawn after the shapes already added.
+        """
+        if isinstance(obj, ConcentricCircles):
+            objs = obj._circles
+        elif isinstance(obj, _Triangular):
+            objs = [obj]
+        else:
+            raise TypeError('obj must be a shape (e.g., Circle), not {0}'
+                            ''.format(type(obj)))
+        self._objects.extend(objs)
+        self._versions = None
+
+    def _pack(self):
+        """Pack the geometry and colors of all shapes into the buffers"""
+        from pyglet import gl
+        fill_verts, fill_tris, line_verts = list(), list(), dict()
+        n_fill = 0
+        for obj in self._objects:
+            if obj._counts['fill'] > 0 and obj._colors['fill'][3] > 0:
+                points = obj._get_points('fill')
+                colors = np.tile(obj._colors['fill'], (len(points), 1))
+                fill_verts.append(np.c_[points, colors])
+                fill_tris.append(obj._tris['fill'].ravel() + n_fill)
+                n_fill += len(points)
+            if obj._counts['line'] > 1 and obj._line_width > 0 and \
+                    obj._colors['line'][3] > 0:
+                points = obj._get_points('line')
+                idx = np.arange(len(points))
+                idx = np.c_[idx, np.roll(idx, -1)]
+                if not obj._line_loop:
+                    idx = idx[:-1]
+                colors = np.tile(obj._colors['line'], (idx.size, 1))
+                verts = np.c_[points[idx.ravel()], colors]
+                line_verts.setdefault(obj._line_width, []).append(verts)
+        verts = fill_verts
+        self._lines = list()
+        first = n_fill
+        for width in sorted(line_verts):
+            count = sum(len(v) for v in line_verts[width])
+            self._lines.append((width, first, count))
+            verts.extend(line_verts[width])
+            first += count
+        verts = (np.concatenate(verts) if len(verts) else
+                 np.zeros((0, 6))).astype(np.float32)
+        tris = (np.concatenate(fill_tris) if len(fill_tris) else
+                np.zeros(0)).astype(np.uint32)
+        self._n_fill = len(tris)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffers['array'])
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, verts.size * 4, verts.tostring(),
+                        gl.GL_DYNAMIC_DRAW)
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self._buffers['index'])
+        gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, tris.size * 4,
+                        tris.tostring(), gl.GL_DYNAMIC_DRAW)
+
+    def draw(self):
+        """Draw the shapes to the display buffer"""
+        from pyglet import gl
+        versions = [obj._version for obj in self._objects]
+        if versions != self._versions:
+            self._pack()
+            self._versions = versions
+        if self._n_fill == 0 and len(self._lines) == 0:
+            return
+        gl.glUseProgram(self._program.id)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffers['array'])
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self._buffers['index'])
+        locs = [self._program.attrib('a_position'),
+                self._program.attrib('a_color')]
+        for loc, size, offset in zip(locs, (2, 4), (0, 8)):
+            gl.glEnableVertexAttribArray(loc)
+            gl.glVertexAttribPointer(loc, size, gl.GL_FLOAT, gl.GL_FALSE,
+                                     24, offset)
+        if self._n_fill > 0:
+            gl.glDrawElements(gl.GL_TRIANGLES, self._n_fill,
+                              gl.GL_UNSIGNED_INT, 0)
+        for width, first, count in self._lines:
+            gl.glLineWidth(width)
+            gl.glDrawArrays(gl.GL_LINES, first, count)
+        # see _Triangular.draw for why this is necessary
+        for loc in locs:
+            gl.glDisableVertexAttribArray(loc)
+        gl.glUseProgram(0)
+
+
 ##############################################################################
 # Image display
 
+def _check_image(image_buffer, ndim=3):
+    """Helper to get a contiguous uint8 image (copying only if necessary)"""
+    image_buffer = np.ascontiguousarray(image_buffer)
+    if image_buffer.dtype not in (np.float64, np.uint8):
+        raise TypeError('image_buffer must be np.float64 or np.uint8')
+    if image_buffer.dtype == np.float64:
+        if image_buffer.max() > 1 or image_buffer.min() < 0:
+            raise ValueError('all float values must be between 0 and 1')
+        image_buffer = (image_buffer * 255).astype('uint8')
+    if not image_buffer.ndim == ndim or image_buffer.shape[-1] not in [3, 4]:
+        raise RuntimeError('image_buffer incorrect size: {}'
+                           ''.format(image_buffer.shape))
+    return image_buffer
+
+
 class RawImage(object):
     """Create image from array for on-screen display
 
@@ -867,16 +1224,7 @@ class RawImage(object):
             ``np.uint8`` is slightly more efficient.
         """
         from pyglet import image, sprite
-        image_buffer = np.ascontiguousarray(image_buffer)
-        if image_buffer.dtype not in (np.float64, np.uint8):
-            raise TypeError('image_buffer must be np.float64 or np.uint8')
-        if image_buffer.dtype == np.float64:
-            if image_buffer.max() > 1 or image_buffer.min() < 0:
-                raise ValueError('all float values must be between 0 and 1')
-            image_buffer = (image_buffer * 255).astype('uint8')
-        if not image_buffer.ndim == 3 or image_buffer.shape[2] not in [3, 4]:
-            raise RuntimeError('image_buffer incorrect size: {}'
-                               ''.format(image_buffer.shape))
+        image_buffer = _check_image(image_buffer)
         # add alpha channel if necessary
         dims = image_buffer.shape
         fmt = 'RGB' if dims[2] == 3 else 'RGBA'
@@ -934,6 +1282,657 @@ class RawImage(object):
         self._sprite.draw()
 
 
+tex_vert = """
+#version 120
+
+attribute vec2 a_position;
+attribute vec2 a_texcoord;
+uniform mat4 u_view;
+uniform vec2 u_scale;
+uniform vec2 u_offset;
+varying vec2 v_texcoord;
+
+void main()
+{
+    gl_Position = u_view * vec4(a_position * u_scale + u_offset, 0.0, 1.0);
+    v_texcoord = a_texcoord;
+}
+"""
+
+tex_frag = """
+#version 120
+
+uniform sampler2D u_texture;
+varying vec2 v_texcoord;
+
+void main()
+{
+    gl_FragColor = texture2D(u_texture, v_texcoord);
+}
+"""
+
+# unit quad (x, y, u, v); the first image row is at the top
+_quad = np.array([[-0.5, -0.5, 0., 1.],
+                  [0.5, -0.5, 1., 1.],
+                  [0.5, 0.5, 1., 0.],
+                  [-0.5, 0.5, 0., 0.]], np.float32)
+
+
+def _quad_buffer():
+    """Helper to create a vertex buffer containing the unit quad"""
+    from pyglet import gl
+    buf = gl.GLuint()
+    gl.glGenBuffers(1, pointer(buf))
+    gl.glBindBuffer(gl.GL_ARRAY_BUFFER, buf)
+    gl.glBufferData(gl.GL_ARRAY_BUFFER, _quad.nbytes, _quad.tostring(),
+                    gl.GL_STATIC_DRAW)
+    return buf
+
+
+class TextureImage(object):
+    """Image (or sequence of images) stored in textures updated in place
+
+    Parameters
+    ----------
+    ec : instance of ExperimentController
+        Parent EC.
+    image_buffer : array
+        N x M x 3 (or 4) array, or P x N x M x 3 (or 4) array of P images
+        to preload for fast switching with ``set_frame``. Color values
+        should range between 0 and 1 for ``np.float64``, or use
+        ``np.uint8``.
+    pos : array-like
+        2-element array-like with X, Y (center) arguments.
+    scale : float
+        The scale factor. 1 is native size (pixel-to-pixel), 2 is twice as
+        large, etc.
+    units : str
+        Units to use for the position. See ``check_units`` for options.
+
+    Returns
+    -------
+    img : instance of TextureImage
+        The image object.
+
+    Notes
+    -----
+    Unlike ``RawImage``, each image is stored in a texture that is
+    allocated once. ``set_image`` with an image of the same size updates the
+    texture in place, directly from the array memory if it is a contiguous
+    ``np.uint8`` array. With a sequence of images, switching frames only
+    changes which texture is drawn.
+    """
+    def __init__(self, ec, image_buffer, pos=(0, 0), scale=1., units='norm'):
+        from pyglet import gl
+        self._ec = ec
+        self._program = _get_program(tex_vert, tex_frag)
+        self._program.set_view(ec.window_size_pix)
+        self._context = gl.current_context
+        self._buffer = _quad_buffer()
+        image_buffer = np.asarray(image_buffer)
+        if image_buffer.ndim == 3:
+            image_buffer = image_buffer[np.newaxis]
+        image_buffer = _check_image(image_buffer, ndim=4)
+        self._textures = [gl.GLuint() for _ in range(len(image_buffer))]
+        self._shapes = [None] * len(self._textures)
+        for tex in self._textures:
+            gl.glGenTextures(1, pointer(tex))
+        for idx, image in enumerate(image_buffer):
+            self.set_image(image, idx)
+        self._frame = 0
+        self.set_pos(pos, units)
+        self.set_scale(scale)
+
+    def __del__(self):
+        try:
+            from pyglet import gl
+        except ImportError:  # interpreter shutdown
+            return
+        context = getattr(self, '_context', None)
+        if context is not None and gl.current_context is not None:
+            context.delete_buffer(self._buffer.value)
+            for tex in self._textures:
+                context.delete_texture(tex.value)
+
+    @property
+    def n_frames(self):
+        """The number of images"""
+        return len(self._textures)
+
+    @property
+    def frame(self):
+        """The index of the image that is drawn"""
+        return self._frame
+
+    def set_frame(self, idx):
+        """Set which image to draw
+
+        Parameters
+        ----------
+        idx : int
+            The index of the image.
+        """
+        idx = int(idx)
+        if not 0 <= idx < self.n_frames:
+            raise IndexError('idx must be between 0 and {0}, got {1}'
+                             ''.format(self.n_frames - 1, idx))
+        self._frame = idx
+
+    def set_image(self, image_buffer, idx=0):
+        """Set image buffer data
+
+        Parameters
+        ----------
+        image_buffer : array
+            N x M x 3 (or 4) array. Can be type ``np.float64`` or
+            ``np.uint8``. If ``np.float64``, color values must range between
+            0 and 1. Contiguous ``np.uint8`` arrays are uploaded without
+            copying.
+        idx : int
+            The index of the image to replace.
+        """
+        from pyglet import gl
+        image_buffer = _check_image(image_buffer)
+        shape = image_buffer.shape
+        fmt = gl.GL_RGB if shape[2] == 3 else gl.GL_RGBA
+        data = image_buffer.ctypes.data
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self._textures[idx])
+        # rows are tightly packed (restore the alignment for other uploads)
+        alignment = c_int()
+        gl.glGetIntegerv(gl.GL_UNPACK_ALIGNMENT, pointer(alignment))
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        try:
+            if self._shapes[idx] == shape:
+                gl.glTexSubImage2D(gl.GL_TEXTURE_2D, 0, 0, 0, shape[1],
+                                   shape[0], fmt, gl.GL_UNSIGNED_BYTE, data)
+            else:
+                for param in (gl.GL_TEXTURE_MIN_FILTER,
+                              gl.GL_TEXTURE_MAG_FILTER):
+                    gl.glTexParameteri(gl.GL_TEXTURE_2D, param, gl.GL_LINEAR)
+                for param in (gl.GL_TEXTURE_WRAP_S, gl.GL_TEXTURE_WRAP_T):
+                    gl.glTexParameteri(gl.GL_TEXTURE_2D, param,
+                                       gl.GL_CLAMP_TO_EDGE)
+                gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, fmt, shape[1], shape[0],
+                                0, fmt, gl.GL_UNSIGNED_BYTE, data)
+                self._shapes[idx] = shape
+        finally:
+            gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, alignment.value)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+    def set_pos(self, pos, units='norm'):
+        """Set image position
+
+        Parameters
+        ----------
+        pos : array-like
+            2-element array-like with X, Y (center) arguments.
+        units : str
+            Units to use. See ``check_units`` for options.
+        """
+        pos = np.array(pos, float)
+        if pos.ndim != 1 or pos.size != 2:
+            raise ValueError('pos must be a 2-element array')
+        pos = np.reshape(pos, (2, 1))
+        self._pos = self._ec._convert_units(pos, units, 'pix').ravel()
+
+    @property
+    def bounds(self):
+        """L, B, W, H (in pixels) of the current image"""
+        size = self._size()
+        bounds = np.concatenate((self._pos - size / 2., self._pos + size / 2.))
+        return bounds[[0, 2, 1, 3]]
+
+    @property
+    def scale(self):
+        return self._scale
+
+    def set_scale(self, scale):
+        """Set the image scale
+
+        Parameters
+        ----------
+        scale : float
+            The scale factor. 1 is native size (pixel-to-pixel), 2 is twice as
+            large, etc.
+        """
+        self._scale = float(scale)
+
+    def _size(self):
+        shape = self._shapes[self._frame]
+        return self._scale * np.array([shape[1], shape[0]], float)
+
+    def draw(self):
+        """Draw the image to the buffer"""
+        from pyglet import gl
+        gl.glUseProgram(self._program.id)
+        gl.glUniform2f(self._program.uniform('u_scale'), *self._size())
+        gl.glUniform2f(self._program.uniform('u_offset'), *self._pos)
+        gl.glUniform1i(self._program.uniform('u_texture'), 0)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self._textures[self._frame])
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffer)
+        locs = [self._program.attrib('a_position'),
+                self._program.attrib('a_texcoord')]
+        for loc, offset in zip(locs, (0, 8)):
+            gl.glEnableVertexAttribArray(loc)
+            gl.glVertexAttribPointer(loc, 2, gl.GL_FLOAT, gl.GL_FALSE, 16,
+                                     offset)
+        gl.glDrawArrays(gl.GL_TRIANGLE_FAN, 0, 4)
+        # see _Triangular.draw for why this is necessary
+        for loc in locs:
+            gl.glDisableVertexAttribArray(loc)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        gl.glUseProgram(0)
+
+
+##############################################################################
+# Procedural stimuli
+
+proc_vert = """
+#version 120
+
+attribute vec2 a_position;
+uniform mat4 u_view;
+uniform vec2 u_scale;
+uniform vec2 u_offset;
+varying vec2 v_pos;
+
+void main()
+{
+    v_pos = a_position * u_scale;
+    gl_Position = u_view * vec4(v_pos + u_offset, 0.0, 1.0);
+}
+"""
+
+_envelope_frag = """
+#version 120
+
+uniform int u_envelope;
+uniform float u_sigma;
+uniform vec2 u_scale;
+varying vec2 v_pos;
+
+float envelope(vec2 pos)
+{
+    if (u_envelope == 1)
+        return exp(-dot(pos, pos) / (2.0 * u_sigma * u_sigma));
+    if (u_envelope == 2)
+        return float(length(2.0 * pos / u_scale) <= 1.0);
+    return 1.0;
+}
+"""
+
+grating_frag = _envelope_frag + """
+uniform float u_sf;
+uniform float u_ori;
+uniform float u_phase;
+uniform float u_contrast;
+
+void main()
+{
+    float x = v_pos.x * cos(u_ori) + v_pos.y * sin(u_ori);
+    float lum = 0.5 + 0.5 * u_contrast * sin(6.283185307 *
+                                             (u_sf * x + u_phase));
+    gl_FragColor = vec4(lum, lum, lum, envelope(v_pos));
+}
+"""
+
+noise_frag = _envelope_frag + """
+uniform float u_check;
+uniform float u_seed;
+uniform float u_contrast;
+
+void main()
+{
+    vec2 cell = floor(v_pos / u_check);
+    float rand = fract(sin(dot(cell + u_seed, vec2(12.9898, 78.233))) *
+                       43758.5453);
+    float lum = 0.5 + 0.5 * u_contrast * (2.0 * rand - 1.0);
+    gl_FragColor = vec4(lum, lum, lum, envelope(v_pos));
+}
+"""
+
+_envelopes = dict(none=0, gaussian=1, circle=2)
+
+
+class _Procedural(object):
+    """Super class for stimuli computed on the GPU by a fragment shader
+
+    The stimulus is drawn as a rectangle, so moving it or changing its
+    parameters only changes uniforms.
+    """
+    _frag = None
+
+    def __init__(self, ec, pos, size, units, contrast, envelope, sigma):
+        from pyglet import gl
+        self._ec = ec
+        self._program = _get_program(proc_vert, self._frag)
+        self._program.set_view(ec.window_size_pix)
+        self._context = gl.current_context
+        self._buffer = _quad_buffer()
+        self._uniforms = dict()
+        self._spatial = dict()  # uniform: (value in units of size, power)
+        self._pix_per_unit = 1.
+        self._sigma = None
+        self.set_pos(pos, units)
+        self.set_size(size, units)
+        self.set_contrast(contrast)
+        self.set_envelope(envelope, sigma)
+
+    def __del__(self):
+        try:
+            from pyglet import gl
+        except ImportError:  # interpreter shutdown
+            return
+        context = getattr(self, '_context', None)
+        if context is not None and gl.current_context is not None:
+            context.delete_buffer(self._buffer.value)
+
+    def set_pos(self, pos, units='norm'):
+        """Set the center position
+
+        Parameters
+        ----------
+        pos : array-like
+            2-element array-like with X, Y (center) arguments.
+        units : str
+            Units to use. See ``check_units`` for options.
+        """
+        pos = np.array(pos, float)
+        if pos.ndim != 1 or pos.size != 2:
+            raise ValueError('pos must be a 2-element array')
+        pos = self._ec._convert_units(pos[:, np.newaxis], units, 'pix')
+        self._pos_pix = pos[:, 0]
+        self._uniforms['u_offset'] = tuple(self._pos_pix)
+
+    def set_size(self, size, units='norm'):
+        """Set the width and height of the stimulus
+
+        Parameters
+        ----------
+        size : array-like
+            2-element array-like with the width and height (around the
+            current position).
+        units : str
+            Units to use. See ``check_units`` for options.
+
+        Notes
+        -----
+        Spatial parameters (e.g., the spatial frequency, sigma, and check
+        size) are interpreted in the units of the size, and are converted
+        to pixels again using the horizontal pixel-per-unit ratio of the
+        new size. A default sigma stays one sixth of the width.
+        """
+        size = np.array(size, float)
+        if size.ndim != 1 or size.size != 2 or (size <= 0).any():
+            raise ValueError('size must be a 2-element array of positive '
+                             'values')
+        pos = self._ec._convert_units(self._pos_pix[:, np.newaxis], 'pix',
+                                      units)[:, 0]
+        corners = np.array([pos - size / 2., pos + size / 2.]).T
+        corners = self._ec._convert_units(corners, units, 'pix')
+        size_pix = corners[:, 1] - corners[:, 0]
+        self._pix_per_unit = size_pix[0] / size[0]
+        self._uniforms['u_scale'] = tuple(size_pix)
+        for name, (value, power) in self._spatial.items():
+            self._uniforms[name] = (value * self._pix_per_unit ** power,)
+        if self._sigma is None:
+            self._uniforms['u_sigma'] = (size_pix[0] / 6.,)
+
+    def _set_spatial(self, name, value, power=1):
+        """Set a uniform given in the units of the size"""
+        self._spatial[name] = (value, power)
+        self._uniforms[name] = (value * self._pix_per_unit ** power,)
+
+    def set_contrast(self, contrast):
+        """Set the contrast
+
+        Parameters
+        ----------
+        contrast : float
+            Michelson contrast (between 0 and 1) around mid-gray.
+        """
+        contrast = float(contrast)
+        if not 0 <= contrast <= 1:
+            raise ValueError('contrast must be between 0 and 1')
+        self._uniforms['u_contrast'] = (contrast,)
+
+    def set_envelope(self, envelope, sigma=None):
+        """Set the envelope (transparency mask) of the stimulus
+
+        Parameters
+        ----------
+        envelope : str
+            ``'none'``, ``'gaussian'``, or ``'circle'`` (an ellipse inscribed
+            in the stimulus rectangle).
+        sigma : float | None
+            Standard deviation of the Gaussian envelope (in the units of the
+            size). None uses one sixth of the width.
+        """
+        if envelope not in _envelopes:
+            raise ValueError('envelope must be one of {0}, got {1}'
+                             ''.format(sorted(_envelopes), envelope))
+        if sigma is not None:
+            sigma = float(sigma)
+            if sigma <= 0:
+                raise ValueError('sigma must be positive')
+        self._envelope = envelope
+        self._sigma = sigma
+        if sigma is None:
+            self._spatial.pop('u_sigma', None)
+            self._uniforms['u_sigma'] = (self._uniforms['u_scale'][0] / 6.,)
+        else:
+            self._set_spatial('u_sigma', sigma)
+
+    def draw(self):
+        """Draw the stimulus to the display buffer"""
+        from pyglet import gl
+        gl.glUseProgram(self._program.id)
+        gl.glUniform1i(self._program.uniform('u_envelope'),
+                       _envelopes[self._envelope])
+        for name, val in self._uniforms.items():
+            func = gl.glUniform1f if len(val) == 1 else gl.glUniform2f
+            func(self._program.uniform(name), *val)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self._buffer)
+        loc = self._program.attrib('a_position')
+        gl.glEnableVertexAttribArray(loc)
+        gl.glVertexAttribPointer(loc, 2, gl.GL_FLOAT, gl.GL_FALSE, 16, 0)
+        gl.glDrawArrays(gl.GL_TRIANGLE_FAN, 0, 4)
+        # see _Triangular.draw for why this is necessary
+        gl.glDisableVertexAttribArray(loc)
+        gl.glUseProgram(0)
+
+
+class Grating(_Procedural):
+    """A sinusoidal grating computed on the GPU
+
+    Parameters
+    ----------
+    ec : instance of ExperimentController
+        Parent EC.
+    pos : array-like
+        2-element array-like with X, Y center position.
+    size : array-like
+        2-element array-like with the width and height.
+    sf : float
+        Spatial frequency (cycles per unit).
+    ori : float
+        Orientation in degrees. 0 gives vertical bars, and positive values
+        rotate counterclockwise.
+    phase : float
+        Phase (in cycles) at the center.
+    contrast : float
+        Michelson contrast (between 0 and 1) around mid-gray.
+    envelope : str
+        ``'none'``, ``'gaussian'``, or ``'circle'``.
+    sigma : float | None
+        Standard deviation of the Gaussian envelope. None uses one sixth of
+        the width.
+    units : str
+        Units to use. These will apply to all spatial aspects of the drawing.
+        See ``check_units`` for options.
+
+    Returns
+    -------
+    grating : instance of Grating
+        The grating object.
+
+    Notes
+    -----
+    To drift the grating, call ``set_phase`` before each flip.
+    """
+    _frag = grating_frag
+
+    def __init__(self, ec, pos=(0, 0), size=(0.5, 0.5), sf=10., ori=0.,
+                 phase=0., contrast=1., envelope='none', sigma=None,
+                 units='norm'):
+        super(Grating, self).__init__(ec, pos, size, units, contrast,
+                                      envelope, sigma)
+        self.set_sf(sf)
+        self.set_ori(ori)
+        self.set_phase(phase)
+
+    def set_sf(self, sf):
+        """Set the spatial frequency
+
+        Parameters
+        ----------
+        sf : float
+            Spatial frequency (cycles per unit of the size).
+        """
+        self._set_spatial('u_sf', float(sf), -1)
+
+    def set_ori(self, ori):
+        """Set the orientation
+
+        Parameters
+        ----------
+        ori : float
+            Orientation in degrees.
+        """
+        self._uniforms['u_ori'] = (np.deg2rad(float(ori)),)
+
+    def set_phase(self, phase):
+        """Set the phase
+
+        Parameters
+        ----------
+        phase : float
+            Phase (in cycles) at the center.
+        """
+        self._uniforms['u_phase'] = (float(phase) % 1.,)
+
+
+class Gabor(Grating):
+    """A Gabor patch (grating in a Gaussian envelope) computed on the GPU
+
+    Parameters
+    ----------
+    ec : instance of ExperimentController
+        Parent EC.
+    pos : array-like
+        2-element array-like with X, Y center position.
+    size : array-like
+        2-element array-like with the width and height.
+    sf : float
+        Spatial frequency (cycles per unit).
+    ori : float
+        Orientation in degrees. 0 gives vertical bars, and positive values
+        rotate counterclockwise.
+    phase : float
+        Phase (in cycles) at the center.
+    contrast : float
+        Michelson contrast (between 0 and 1) around mid-gray.
+    sigma : float | None
+        Standard deviation of the Gaussian envelope. None uses one sixth of
+        the width.
+    units : str
+        Units to use. These will apply to all spatial aspects of the drawing.
+        See ``check_units`` for options.
+
+    Returns
+    -------
+    gabor : instance of Gabor
+        The Gabor object.
+    """
+    def __init__(self, ec, pos=(0, 0), size=(0.5, 0.5), sf=10., ori=0.,
+                 phase=0., contrast=1., sigma=None, units='norm'):
+        super(Gabor, self).__init__(ec, pos, size, sf, ori, phase, contrast,
+                                    'gaussian', sigma, units)
+
+
+class NoisePatch(_Procedural):
+    """A patch of white noise checks computed on the GPU
+
+    Parameters
+    ----------
+    ec : instance of ExperimentController
+        Parent EC.
+    pos : array-like
+        2-element array-like with X, Y center position.
+    size : array-like
+        2-element array-like with the width and height.
+    check_size : float
+        Size of each (square) noise check.
+    contrast : float
+        Contrast (between 0 and 1) of the noise around mid-gray.
+    seed : int
+        Seed of the noise pattern.
+    envelope : str
+        ``'none'``, ``'gaussian'``, or ``'circle'``.
+    sigma : float | None
+        Standard deviation of the Gaussian envelope. None uses one sixth of
+        the width.
+    units : str
+        Units to use. These will apply to all spatial aspects of the drawing.
+        See ``check_units`` for options.
+
+    Returns
+    -------
+    noise : instance of NoisePatch
+        The noise object.
+
+    Notes
+    -----
+    The noise values are generated by a hash function of the check
+    position and the seed, so they are not drawn from numpy's generator.
+    For dynamic noise, call ``set_seed`` with a new seed before each flip.
+    """
+    _frag = noise_frag
+
+    def __init__(self, ec, pos=(0, 0), size=(0.5, 0.5), check_size=0.01,
+                 contrast=1., seed=0, envelope='none', sigma=None,
+                 units='norm'):
+        super(NoisePatch, self).__init__(ec, pos, size, units, contrast,
+                                         envelope, sigma)
+        self.set_check_size(check_size)
+        self.set_seed(seed)
+
+    def set_check_size(self, check_size):
+        """Set the size of the noise checks
+
+        Parameters
+        ----------
+        check_size : float
+            Size of each (square) check in the units of the size.
+        """
+        check_size = float(check_size)
+        if check_size <= 0:
+            raise ValueError('check_size must be positive')
+        self._set_spatial('u_check', check_size)
+
+    def set_seed(self, seed):
+        """Set the seed of the noise pattern
+
+        Parameters
+        ----------
+        seed : int
+            The seed.
+        """
+        # keep the value small to preserve the precision of the hash
+        self._uniforms['u_seed'] = (float(int(seed) % 10007),)
+
+
 class Video(object):
     """Read video file and draw it to the screen
 
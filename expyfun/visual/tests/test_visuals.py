@@ -1,6 +1,7 @@
+from ctypes import c_int, pointer
 import warnings
 import numpy as np
-from nose.tools import assert_raises, assert_equal
+from nose.tools import assert_raises, assert_equal, assert_true
 
 from expyfun import ExperimentController, visual, fetch_data_file
 from expyfun._utils import _hide_window, requires_opengl21
@@ -22,6 +23,11 @@ def test_visuals():
         assert_raises(ValueError, visual.Circle, ec, n_edges=3)
         circ = visual.Circle(ec)
         circ.draw()
+        # moving only changes the transform of the cached unit circle
+        points = circ._points['fill']
+        circ.set_pos([0.5, 0.5], units='pix')
+        assert_true(circ._points['fill'] is points)
+        assert_true(np.allclose(circ._get_points('fill')[0], [0.5, 0.5]))
         assert_raises(ValueError, circ.set_radius, [1, 2, 3])
         assert_raises(ValueError, circ.set_pos, [1])
         assert_raises(ValueError, visual.Triangle, ec, [5, 6])
@@ -51,6 +57,9 @@ def test_visuals():
         assert_raises(IndexError, fix.set_radius, 0.1, 3)
         assert_raises(ValueError, fix.set_radii, [0.1, 0.2])
         fix.draw()
+        # all primitives share one program per context
+        for obj in fix._circles + [tri, rect, diamond]:
+            assert_true(obj._program is circ._program)
         fix_2 = visual.FixationDot(ec)
         fix_2.draw()
         assert_raises(ValueError, rect.set_pos, [0, 1, 2])
@@ -58,6 +67,60 @@ def test_visuals():
         print(img.bounds)  # test bounds
         assert_equal(img.scale, 1)
         img.draw()
+        from pyglet import gl
+        alignment = c_int()
+        gl.glGetIntegerv(gl.GL_UNPACK_ALIGNMENT, pointer(alignment))
+        old_alignment = alignment.value
+        tex = visual.TextureImage(ec, np.ones((2, 3, 3, 4)), scale=2.)
+        assert_equal(tex.n_frames, 2)
+        tex.draw()
+        tex.set_frame(1)
+        assert_equal(tex.frame, 1)
+        tex.draw()
+        assert_raises(IndexError, tex.set_frame, 2)
+        assert_raises(TypeError, tex.set_image, np.ones((3, 3, 3), int))
+        tex.set_image(np.zeros((3, 3, 4), np.uint8), 1)  # in place
+        tex.set_image(np.zeros((4, 5, 3), np.uint8), 1)  # reallocated
+        gl.glGetIntegerv(gl.GL_UNPACK_ALIGNMENT, pointer(alignment))
+        assert_equal(alignment.value, old_alignment)  # restored
+        assert_equal(tex.bounds[1] - tex.bounds[0], 10)
+        tex.draw()
+        grating = visual.Grating(ec, sf=5, ori=45, envelope='circle')
+        grating.draw()
+        grating.set_phase(0.25)
+        grating.set_ori(90)
+        grating.set_pos([0.1, 0.1])
+        grating.draw()
+        assert_raises(ValueError, grating.set_contrast, 2)
+        assert_raises(ValueError, grating.set_envelope, 'foo')
+        assert_raises(ValueError, grating.set_size, [1, -1])
+        gabor = visual.Gabor(ec, size=(2, 2), sigma=0.5, units='deg')
+        gabor.draw()
+        # a default sigma follows the width, others keep their units
+        gabor = visual.Gabor(ec, size=(0.5, 0.5), sf=4)
+        sf = gabor._uniforms['u_sf'][0]
+        gabor.set_size([1., 1.])
+        assert_true(np.allclose(gabor._uniforms['u_sigma'][0],
+                                gabor._uniforms['u_scale'][0] / 6.))
+        assert_true(np.allclose(gabor._uniforms['u_sf'][0], sf))
+        gabor.set_envelope('gaussian', 0.1)
+        sigma = gabor._uniforms['u_sigma'][0]
+        gabor.set_size([0.5, 0.5])
+        assert_true(np.allclose(gabor._uniforms['u_sigma'][0], sigma))
+        # sizes are built around the position whatever units it was set in
+        gabor.set_pos([10., 5.], units='pix')
+        gabor.set_size([1., 1.], units='deg')
+        scale = gabor._uniforms['u_scale']
+        gabor.set_pos(ec._convert_units([[10.], [5.]], 'pix', 'deg')[:, 0],
+                      units='deg')
+        gabor.set_size([1., 1.], units='deg')
+        assert_true(np.allclose(gabor._uniforms['u_scale'], scale))
+        assert_true(np.allclose(gabor._uniforms['u_offset'], [10., 5.]))
+        noise = visual.NoisePatch(ec, check_size=0.05, envelope='gaussian')
+        noise.draw()
+        noise.set_seed(1)
+        noise.draw()
+        assert_raises(ValueError, noise.set_check_size, 0)
         line = visual.Line(ec, [[0, 1], [1, 0]])
         line.draw()
         assert_raises(ValueError, line.set_line_width, 100)
@@ -65,6 +128,14 @@ def test_visuals():
         line.draw()
         assert_raises(ValueError, line.set_coords, [0])
         line.set_coords([0, 1])
+        batch = visual.DrawBatch(ec, [circ, tri, rect, line])
+        batch.add(fix)
+        assert_equal(len(batch), 7)
+        assert_raises(TypeError, batch.add, img)
+        batch.draw()
+        rect.set_pos([0.5, 0.5, 0.1, 0.1])  # triggers repacking
+        batch.draw()
+        assert_equal(batch._versions[2], rect._version)
         ec.set_background_color('black')
         text = visual.Text(ec, 'Hello {color (255 0 0 255)}Everybody!',
                            pos=[0, 0], color=[1, 1, 1], wrap=False)
@@ -76,6 +147,17 @@ def test_visuals():
         text.draw()
         text.set_color('red')
         text.draw()
+        assert_raises(ValueError, text.set_pos, [0])
+        text.set_pos([0.5, 0.5])
+        # cached layouts are reused and moved / recolored
+        cache = visual._TextCache(ec, n_max=2)
+        text = cache.get('foo', attr=False)
+        assert_true(cache.get('foo', [0.1, 0], 'red', attr=False) is text)
+        assert_equal(text._color, visual._convert_color('red'))
+        attr_text = cache.get('foo')
+        assert_true(cache.get('foo', color='red') is not attr_text)
+        assert_equal(len(cache), 2)
+        assert_true(cache.get('foo', attr=False) is not text)  # evicted
 
     # test video
     std_kwargs.update(dict(enable_video=True, window_size=(640, 480)))